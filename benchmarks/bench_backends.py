@@ -0,0 +1,88 @@
+# Comparison of the Decimal and float numeric backends for PhysNum,
+# on the calc_n pipeline from the lab3 example (applied to many sets of measurements)
+#
+# Usage: (with src/ on PYTHONPATH)
+#	python bench_backends.py [N]
+
+import sys
+import time
+import random
+import math
+
+from phystools import *
+
+##################################
+# Pipeline (same formulas as examples/lab3_sampledata_calcs.py)
+
+mDim= MetreLengthUnit();
+mmDim= MillimetreLengthUnit();
+gDim= GramMassUnit();
+kgDim= KilogramMassUnit();
+sDim= SecondTimeUnit();
+
+P= PhysNum;
+
+def calc_SphereInertia (mass, diameter):
+	mass= mass.changeUnits(kgDim);
+	diameter= diameter.changeUnits(mDim);
+	radius= diameter / 2;
+	return (mass * radius**2) * (P(2) / P(5));
+
+def calc_T (t_values):
+	T_values = [t/20 for t in t_values];
+	return phys_average(T_values);
+
+def calc_n (Inertia, Slope, radius):
+	return (Inertia * (P(8) * P(math.pi))) / (Slope * radius**4);
+
+# generate N sets of raw measurements (as plain numbers, so that they can be turned into PhysNums by each backend)
+def make_datasets (N):
+	rand= random.Random(42);
+	datasets= [];
+	for i in xrange(N):
+		datasets.append({
+			'mass': rand.uniform(350, 370),
+			'diameter': rand.uniform(44, 45),
+			'wire': rand.uniform(0.37, 0.38),
+			'times': [rand.uniform(67.5, 68.0) for j in xrange(3)],
+		});
+	return datasets;
+
+# run the pipeline over all the datasets, returning the values of n
+def run_pipeline (datasets):
+	S= P(4.6, 0.1, DummyUnit());
+	results= [];
+	for data in datasets:
+		I= calc_SphereInertia(P(data['mass'], 0.1, gDim), P(data['diameter'], 0.03, mmDim));
+		T= calc_T([P(t, 0.05, sDim) for t in data['times']]);
+		r= P(data['wire'], 0.0005, mmDim).changeUnits(mDim) / 2;
+		n= calc_n(I, S, r) * T;
+		results.append(n);
+	return results;
+
+##################################
+
+if __name__ == '__main__':
+	N= int(sys.argv[1]) if len(sys.argv) > 1 else 10000;
+	datasets= make_datasets(N);
+
+	print "calc_n pipeline over %d datasets" % (N)
+
+	timings= {};
+	results= {};
+	for name in ("decimal", "float"):
+		with numericBackend(name):
+			t0= time.time();
+			results[name]= run_pipeline(datasets);
+			timings[name]= time.time() - t0;
+
+		print "\t%-8s: %7.3fs (%6.1f us/dataset)" % (name, timings[name], timings[name] * 1e6 / N)
+
+	# agreement between the backends
+	maxDiff= 0.0;
+	for dn, fn in zip(results["decimal"], results["float"]):
+		maxDiff= max(maxDiff, abs(float(dn.getValue()) - fn.getValue()) / abs(fn.getValue()),
+				     abs(float(dn.getUncertainty_Absolute()) - fn.getUncertainty_Absolute()) / abs(fn.getUncertainty_Absolute()));
+
+	print "\tspeedup : %.1fx" % (timings["decimal"] / timings["float"])
+	print "\tmax relative difference between backends: %.3g" % (maxDiff)
@@ -0,0 +1,165 @@
+# Memory/allocation comparison between the current (immutable, __slots__) PhysNum
+# and the original classic-class PhysNum, on a 10^6 element workload
+#
+# Usage: (with src/ on PYTHONPATH)
+#	python bench_memory.py [N]
+
+import sys
+import os
+import gc
+import time
+import subprocess
+
+from decimal import Decimal as D
+from phystools import *
+
+##################################
+# Original PhysNum layout, for comparison
+#	- classic class with per-instance __dict__
+#	- arithmetic converts the operands in place, and copies via eval(repr())
+
+class LegacyPhysNum:
+	v= None;
+	e= None;
+	units= None;
+
+	def __init__ (self, value, uncertainty=0, units=None):
+		self.v= PhysNum._validateNumArg(value);
+		self.e= PhysNum._validateNumArg(uncertainty);
+		self.units= units;
+
+	def __repr__ (self):
+		return "LegacyPhysNum(%s, %s, %s)" % (self.v, self.e, repr(self.units));
+
+	def _validateArithArg (self, arg):
+		if type(arg) in (int, float, D):
+			arg= LegacyPhysNum(arg, 0, self.getUnits());
+		return arg;
+
+	def getValue (self):
+		return self.v;
+
+	def getUncertainty_Absolute (self):
+		return self.e;
+
+	def getUncertainty_Fractional (self):
+		if self.v == 0:
+			return D('0');
+		else:
+			return +(self.e / self.v);
+
+	def getUnits (self):
+		return self.units;
+
+	def changeUnits (self, newUnits):
+		ownUnits = self.getUnits();
+		if not (ownUnits or newUnits):
+			return;
+		if ownUnits.sameMeasurement(newUnits) == False:
+			return;
+		if repr(ownUnits) == repr(newUnits):
+			return;
+
+		convFac = newUnits.conversionFactor(ownUnits);
+		self.v *= convFac;
+		self.e *= convFac;
+		self.units= newUnits;
+
+	def __add__ (self, other):
+		other= self._validateArithArg(other);
+		units= self.getUnits();
+		other.changeUnits(units);
+
+		val= self.getValue() + other.getValue();
+		err= self.getUncertainty_Absolute() + other.getUncertainty_Absolute();
+		return LegacyPhysNum(val, err, units);
+
+	def __mul__ (self, other):
+		other= self._validateArithArg(other);
+		units= self.getUnits();
+		other.changeUnits(units);
+
+		val= self.getValue() * other.getValue();
+		err= (self.getUncertainty_Fractional() + other.getUncertainty_Fractional()) * val;
+		return LegacyPhysNum(val, err, units);
+
+	def __pow__ (self, other):
+		# original behaviour for the trivial case: defensive copy
+		# (units are reattached afterwards, as their repr() cannot be evaluated)
+		result= eval("LegacyPhysNum(D('%s'), D('%s'))" % (self.v, self.e));
+		result.units= self.units;
+		return result;
+
+##################################
+# Measurements
+
+# get the resident set size of this process (in kB)
+def get_rss ():
+	try:
+		f= open("/proc/self/status");
+		for line in f:
+			if line.startswith("VmRSS:"):
+				return int(line.split()[1]);
+	except IOError:
+		pass;
+
+	# fallback - peak usage only
+	import resource
+	return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss;
+
+# get the size of a single instance (including its __dict__, if it has one)
+def instance_size (obj):
+	size= sys.getsizeof(obj);
+	if hasattr(obj, '__dict__'):
+		size += sys.getsizeof(obj.__dict__);
+	return size;
+
+# run the workload for the given class, returning a dict of measurements
+def run_workload (cls, N):
+	units= MetreLengthUnit();
+	results= {};
+
+	gc.collect();
+	rss0= get_rss();
+
+	# allocation of N numbers
+	t0= time.time();
+	nums= [cls(i + 1, 1, units) for i in xrange(N)];
+	results['create_time']= time.time() - t0;
+	results['rss_kb']= get_rss() - rss0;
+	results['instance_bytes']= instance_size(nums[0]);
+
+	# pairwise arithmetic over the numbers
+	t0= time.time();
+	for i in xrange(N - 1):
+		nums[i] * nums[i+1] + nums[i];
+	results['arith_time']= time.time() - t0;
+
+	# copying (legacy class only - the current class never needs to copy)
+	t0= time.time();
+	if cls is LegacyPhysNum:
+		for num in nums:
+			num ** 1;
+	results['copy_time']= time.time() - t0;
+
+	return results;
+
+##################################
+
+if __name__ == '__main__':
+	N= int(sys.argv[1]) if len(sys.argv) > 1 else 10**6;
+
+	# each workload is run in its own process, so that memory usage can be measured separately
+	if len(sys.argv) > 2:
+		cls= {'legacy': LegacyPhysNum, 'current': PhysNum}[sys.argv[2]];
+		print repr(run_workload(cls, N));
+		sys.exit(0);
+
+	print "PhysNum memory/allocation comparison (N = %d)" % (N)
+	for name in ('legacy', 'current'):
+		out= subprocess.check_output([sys.executable, __file__, str(N), name], env=os.environ);
+		res= eval(out);
+
+		print "\t%-8s: %4d bytes/instance, RSS +%7.1f MB (%5.1f bytes/number), create %.2fs, arithmetic %.2fs, copy %.2fs" % \
+			(name, res['instance_bytes'], res['rss_kb'] / 1024.0, res['rss_kb'] * 1024.0 / N,
+			 res['create_time'], res['arith_time'], res['copy_time'])
@@ -0,0 +1,320 @@
+# Benchmark suite for PhysNum - construction, arithmetic, units, aggregation and calcFunc,
+# over a range of sizes and decimal precisions (and the float backend)
+#
+# Results are saved as JSON, so that runs can be compared against a baseline to catch regressions.
+#
+# Usage: (with src/ on PYTHONPATH)
+#	python bench_suite.py [options]
+#		-o results.json				save the results
+#		-b baseline.json			compare against a previous run (exit status is 1 if anything got slower)
+#		-s 100,10000				sizes to run (default: 10^2 to 10^6)
+#		-p 10,28,50					decimal precisions to run (default: 10, 28, 50)
+#		-k add,mul					only run the benchmarks whose names start with these
+#
+#	i.e.
+#		python bench_suite.py -o baseline.json
+#		... make changes ...
+#		python bench_suite.py -b baseline.json
+
+import sys
+import os
+import math
+import time
+import json
+import timeit
+import platform
+import optparse
+
+from phystools import *
+
+##################################
+# Benchmarks
+
+# all benchmarks, in the order they were defined
+#	(name, setup func) - setup(N) returns a function which does the work being timed
+_benchmarks = [];
+
+# decorator - add a benchmark
+def benchmark (name):
+	def register (setup):
+		_benchmarks.append((name, setup));
+		return setup;
+	return register;
+
+# ---
+
+mmDim= MillimetreLengthUnit();
+mDim= MetreLengthUnit();
+kgDim= KilogramMassUnit();
+sDim= SecondTimeUnit();
+
+# get N numbers with 'lab-like' values
+def _nums (N, units=mmDim):
+	return [PhysNum(D(i % 997 + 1) / 7, D('0.05'), units) for i in xrange(N)];
+
+# construction
+@benchmark("construct_int")
+def bench_construct_int (N):
+	values= range(1, N+1);
+	return lambda: [PhysNum(v, 1, mmDim) for v in values];
+
+@benchmark("construct_float")
+def bench_construct_float (N):
+	values= [i * 0.25 for i in xrange(N)];
+	return lambda: [PhysNum(v, 0.05, mmDim) for v in values];
+
+@benchmark("construct_str")
+def bench_construct_str (N):
+	values= [str(i * 0.25) for i in xrange(N)];
+	return lambda: [PhysNum(v, "0.05", mmDim) for v in values];
+
+@benchmark("construct_decimal")
+def bench_construct_decimal (N):
+	values= [D(i) / 4 for i in xrange(N)];
+	err= D('0.05');
+	return lambda: [PhysNum(v, err, mmDim) for v in values];
+
+# arithmetic
+@benchmark("add")
+def bench_add (N):
+	a, b = _nums(N), _nums(N);
+	return lambda: [x + y for x, y in zip(a, b)];
+
+@benchmark("sub")
+def bench_sub (N):
+	a, b = _nums(N), _nums(N);
+	return lambda: [x - y for x, y in zip(a, b)];
+
+@benchmark("mul")
+def bench_mul (N):
+	a, b = _nums(N), _nums(N, sDim);
+	return lambda: [x * y for x, y in zip(a, b)];
+
+@benchmark("div")
+def bench_div (N):
+	a, b = _nums(N), _nums(N, sDim);
+	return lambda: [x / y for x, y in zip(a, b)];
+
+@benchmark("mul_mixed_units")
+def bench_mul_mixed (N):
+	a, b = _nums(N), _nums(N, mDim);
+	return lambda: [x * y for x, y in zip(a, b)];
+
+@benchmark("pow_int")
+def bench_pow_int (N):
+	a= _nums(N);
+	return lambda: [x ** 4 for x in a];
+
+@benchmark("pow_real")
+def bench_pow_real (N):
+	a= _nums(N);
+	return lambda: [x ** 0.5 for x in a];
+
+# units
+@benchmark("convertUnits")
+def bench_convertUnits (N):
+	a= _nums(N);
+	return lambda: [x.convertUnits(mDim) for x in a];
+
+@benchmark("changeUnits")
+def bench_changeUnits (N):
+	a= _nums(N, mDim);
+	return lambda: [x.changeUnits(mmDim) for x in a];
+
+@benchmark("convertAll")
+def bench_convertAll (N):
+	a= _nums(N, mDim);
+	plan= ConversionPlan(mmDim);
+	return lambda: plan.convert(a);
+
+@benchmark("normalizeToSI")
+def bench_normalizeToSI (N):
+	a= _nums(N, mmDim);
+	return lambda: normalizeToSI(a);
+
+@benchmark("CombinedUnits.addUnit")
+def bench_addUnit (N):
+	units= CombinedUnits([kgDim, MeasurementUnit(mDim, 2)]);
+	others= [MeasurementUnit(sDim, -(i % 3 + 1)) for i in xrange(N)];
+	return lambda: [units.addUnit(u) for u in others];
+
+# parsing printed numbers
+@benchmark("parse")
+def bench_parse (N):
+	from physparse import parse_physnums
+	lines= [str(x) for x in _nums(N)];
+	return lambda: parse_physnums(lines);
+
+# transfer to other processes (round trip)
+@benchmark("pickle")
+def bench_pickle (N):
+	import cPickle
+	a= _nums(N);
+	return lambda: cPickle.loads(cPickle.dumps(a, 2));
+
+@benchmark("pickle_packed")
+def bench_pickle_packed (N):
+	import cPickle
+	from physio import pack_physnums
+	a= _nums(N);
+	return lambda: cPickle.loads(cPickle.dumps(pack_physnums(a), 2)).unpack();
+
+# aggregation
+@benchmark("phys_sum")
+def bench_phys_sum (N):
+	a= _nums(N);
+	return lambda: phys_sum(a);
+
+@benchmark("phys_average")
+def bench_phys_average (N):
+	a= _nums(N);
+	return lambda: phys_average(a);
+
+# functions
+@benchmark("calcFunc_known")
+def bench_calcFunc_known (N):
+	a= _nums(N, None);
+	return lambda: [x.calcFunc(math.sin) for x in a];
+
+@benchmark("calcFunc_unknown")
+def bench_calcFunc_unknown (N):
+	a= _nums(N, None);
+	func= lambda v: v * v;
+	return lambda: [x.calcFunc(func) for x in a];
+
+##################################
+# Running
+
+# get the number of times to repeat a benchmark of the given size (keeping the total time reasonable)
+def _repeats (N, repeat):
+	return max(1, min(repeat, 10**5 // N));
+
+# run a single benchmark
+#	< returns: (dict) timings
+def run_benchmark (setup, N, backend, precision, repeat=3):
+	# run under its own context, so the precision doesn't leak into the other benchmarks
+	with CalcContext(backend, prec=(precision or None)):
+		func= setup(N);
+		times= timeit.repeat(func, number=1, repeat=_repeats(N, repeat));
+
+	best= min(times);
+	return {
+		'best': best,
+		'mean': sum(times) / len(times),
+		'per_item_us': best * 1e6 / N,
+	};
+
+# get the key used to store the results of a benchmark
+def result_key (name, N, backend, precision):
+	config= ("%s-%d" % (backend, precision)) if precision else backend;
+	return "%s/N=%d/%s" % (name, N, config);
+
+# run all the (selected) benchmarks
+#	< returns: (dict) key : timings
+def run_suite (sizes, precisions, backends, names=None, repeat=3, verbose=True):
+	configs= [];
+	for backend in backends:
+		if backend == "decimal":
+			configs.extend([(backend, prec) for prec in precisions]);
+		else:
+			configs.append((backend, None));
+
+	results= {};
+	for name, setup in _benchmarks:
+		if names and not [n for n in names if name.startswith(n)]:
+			continue;
+
+		for N in sizes:
+			for backend, precision in configs:
+				key= result_key(name, N, backend, precision);
+				results[key]= res= run_benchmark(setup, N, backend, precision, repeat);
+
+				if verbose:
+					print "\t%-50s %10.4fs %10.2f us/item" % (key, res['best'], res['per_item_us'])
+					sys.stdout.flush();
+
+	return results;
+
+# compare the results against a baseline
+#	threshold: (float) fraction slower than the baseline which counts as a regression
+#	< returns: (list) (key, baseline time, new time, ratio) for each regression
+def compare_results (results, baseline, threshold=0.1, verbose=True):
+	regressions= [];
+
+	if verbose:
+		print "\nComparison against baseline (ratio = new / baseline):"
+
+	for key in sorted(results.keys()):
+		if key not in baseline:
+			continue;
+
+		old= baseline[key]['best'];
+		new= results[key]['best'];
+		ratio= (new / old) if old else float('inf');
+
+		if ratio > 1 + threshold:
+			regressions.append((key, old, new, ratio));
+			flag= "SLOWER";
+		elif ratio < 1 - threshold:
+			flag= "faster";
+		else:
+			flag= "";
+
+		if verbose:
+			print "\t%-50s %10.4fs -> %10.4fs  %5.2fx %s" % (key, old, new, ratio, flag)
+
+	return regressions;
+
+# get information about the environment the benchmarks were run in
+def environment ():
+	return {
+		'python': platform.python_version(),
+		'implementation': platform.python_implementation(),
+		'platform': platform.platform(),
+		'machine': platform.machine(),
+		'date': time.strftime("%Y-%m-%d %H:%M:%S"),
+	};
+
+##################################
+
+if __name__ == '__main__':
+	parser= optparse.OptionParser(usage="%prog [options]");
+	parser.add_option("-o", "--output", help="file to save the results to (JSON)");
+	parser.add_option("-b", "--baseline", help="results of a previous run to compare against (JSON)");
+	parser.add_option("-s", "--sizes", default="100,1000,10000,100000,1000000",
+					  help="comma-separated list of sizes (default: %default)");
+	parser.add_option("-p", "--precisions", default="10,28,50",
+					  help="comma-separated list of decimal precisions (default: %default)");
+	parser.add_option("--backends", default="decimal,float",
+					  help="comma-separated list of numeric backends (default: %default)");
+	parser.add_option("-k", "--names", default="",
+					  help="comma-separated list of (prefixes of) the benchmarks to run (default: all)");
+	parser.add_option("-r", "--repeat", type="int", default=3,
+					  help="number of times to repeat each benchmark, taking the best (default: %default)");
+	parser.add_option("-t", "--threshold", type="float", default=0.1,
+					  help="fraction slower than the baseline counted as a regression (default: %default)");
+	options, args = parser.parse_args();
+
+	sizes= [int(x) for x in options.sizes.split(",")];
+	precisions= [int(x) for x in options.precisions.split(",")];
+	backends= options.backends.split(",");
+	names= [x for x in options.names.split(",") if x];
+
+	print "PhysNum benchmark suite"
+	results= run_suite(sizes, precisions, backends, names, options.repeat);
+
+	if options.output:
+		f= open(options.output, 'w');
+		json.dump({'environment': environment(), 'results': results}, f, indent=1, sort_keys=True);
+		f.close();
+		print "\nResults saved to", options.output
+
+	if options.baseline:
+		f= open(options.baseline);
+		baseline= json.load(f)['results'];
+		f.close();
+
+		regressions= compare_results(results, baseline, options.threshold);
+		if regressions:
+			print "\n%d benchmarks slower than the baseline (by more than %d%%)" % (len(regressions), options.threshold * 100)
+			sys.exit(1);
@@ -0,0 +1,307 @@
+# Batch version of the Lab3 calculations (lab3_sampledata_calcs.py), for processing
+# many groups' datasets at once, without any user input.
+#
+# Each dataset file in the given directory is evaluated through the same calc_* pipeline
+# in a pool of worker processes (one per core by default), writing the usual LaTeX/gnuplot
+# outputs for each dataset into its own directory, followed by a summary of all the results.
+#
+# Usage: (with src/ on PYTHONPATH)
+#	python lab3_batch.py [-j JOBS] [-t] [-o OUTDIR] DATADIR
+#
+# With -t, a pool of threads in this process is used instead (each one doing its calculations
+# with the same settings - see CalcContext), which avoids starting up the worker processes.
+#
+# Dataset files (*.lab3) contain "key = values" lines (# starts a comment):
+#	wire_diameters_mm = 0.378 0.378 0.379 0.375 0.380
+#	wire_uncertainty_mm = 0.0005			(optional - default 0.0005)
+#	sphere_mass_g = 359.9 0.1				(value, uncertainty)
+#	sphere_diameter_mm = 44.48 0.03			(value, uncertainty)
+#	length_uncertainty_mm = 1				(optional - default 1)
+#	time_uncertainty_s = 0.05				(optional - default 0.05)
+#	sphere = 612 67.72 67.62 67.80			(one line per length: L, t1, t2, t3)
+#	heart = 202 99.41 99.24 99.16			(L, t1, t2, t3)
+#	slope = 0.5 0.9							(optional - value, uncertainty of T^2 vs L slope)
+#
+# If no slope is given, it is found from a least-squares fit weighted by the uncertainties of the points.
+
+import sys
+import os
+import time
+import glob
+import optparse
+import multiprocessing
+import multiprocessing.pool
+
+from phystools import *
+from lab3_sampledata_calcs import *
+from physfit import fit_linear
+
+##################################
+# Dataset Files
+
+# extension of dataset files
+DATASET_EXT = ".lab3";
+
+# read the given dataset file
+#	< returns: (dict) key : list of values (or list of lists of values for the 'sphere' and 'heart' entries)
+def read_dataset (fileN):
+	data= {'sphere': [], 'heart': []};
+
+	f= file(fileN, 'r');
+	for lineNo, line in enumerate(f):
+		# strip comments and whitespace
+		line= line.split('#')[0].strip();
+		if not line:
+			continue;
+
+		if '=' not in line:
+			raise ValueError, "%s:%d: expected 'key = values'" % (fileN, lineNo+1);
+		key, vals= [x.strip() for x in line.split('=', 1)];
+
+		try:
+			vals= [D(x) for x in vals.split()];
+		except decimal.InvalidOperation:
+			raise ValueError, "%s:%d: invalid number" % (fileN, lineNo+1);
+
+		if key in ('sphere', 'heart'):
+			if len(vals) != 4:
+				raise ValueError, "%s:%d: expected length and 3 times" % (fileN, lineNo+1);
+			data[key].append(vals);
+		else:
+			data[key]= vals;
+	f.close();
+
+	# check that we've got everything
+	for key in ('wire_diameters_mm', 'sphere_mass_g', 'sphere_diameter_mm', 'sphere', 'heart'):
+		if not data.get(key):
+			raise ValueError, "%s: missing '%s'" % (fileN, key);
+
+	return data;
+
+# get the name of the dataset from its filename
+def dataset_name (fileN):
+	return os.path.splitext(os.path.basename(fileN))[0];
+
+##################################
+# Calculations
+
+# units of the slope of T^2 vs L
+SLOPE_UNITS = divideUnits(powerUnits(sDim, 2), mDim)[0];
+
+# estimate the slope of T^2 vs L from the data (weighted least-squares fit, see physfit)
+def estimate_slope (T_vals):
+	if len(T_vals) < 2:
+		raise ValueError, "Need at least 2 points to find the slope";
+
+	return fit_linear([entry['L'] for entry in T_vals], [entry['T^2'] for entry in T_vals]).slope;
+
+# calculate T and T^2 for each set of measurements (length, 3 times), as done in lab3_sampledata_calcs
+def calc_TValues (rows):
+	T_vals= [];
+	for row in normalizeToSI(rows):
+		T_valD= {'L': row[0]};
+		T_valD['T']= calc_T(row[1:]);
+		T_valD['T^2']= T_valD['T'] ** 2;
+		T_vals.append(T_valD);
+	return T_vals;
+
+# LaTeX formatting for results tables
+def format_L_3T (entry):
+	return [x.toStr(latex=True) for x in entry[0:4]];
+
+def format_T2_L (entry):
+	return [entry['L'].toStr(latex=True), entry['T^2'].toStr(latex=True)];
+
+def format_wire (entry):
+	return ["$%s$" % (str(entry).replace("+/-", "\\pm"))];
+
+# process a single dataset, writing its outputs to the given directory
+#	< returns: (dict) results of the calculations
+def process_dataset (data, outDir):
+	if not os.path.isdir(outDir):
+		os.makedirs(outDir);
+	out= lambda fileN: os.path.join(outDir, fileN);
+
+	results= {};
+
+	# uncertainties of raw measurements
+	dWire= data.get('wire_uncertainty_mm', [D('0.0005')])[0];
+	dL= data.get('length_uncertainty_mm', [D(1)])[0];
+	dt= data.get('time_uncertainty_s', [D('0.05')])[0];
+
+	def measurements (row):
+		return [P(row[0], dL, mmDim)] + [P(t, dt, sDim) for t in row[1:]];
+
+	# wire thickness
+	wire_diameters= [P(d, dWire, mmDim) for d in data['wire_diameters_mm']];
+	results['r']= calc_AverageWireRadius(wire_diameters);
+	write_latex_results(out("wireResults"),
+		["Diameter (mm)"],
+		format_wire, wire_diameters,
+		"Raw data for wire diameters");
+
+	# inertia of solid sphere
+	mass, dMass = data['sphere_mass_g'][0:2];
+	diameter, dDiameter = data['sphere_diameter_mm'][0:2];
+	results['Is']= calc_SphereInertia(P(mass, dMass, gDim), P(diameter, dDiameter, mmDim));
+
+	# results for solid sphere
+	sphere_data= [measurements(row) for row in data['sphere']];
+	T_vals= calc_TValues(sphere_data);
+
+	write_gnuplot_datafile(out("T2_vs_L"), T_vals);
+	write_latex_results(out("sphereResults"),
+		["L (m)", "$t_1 (s)$", "$t_2 (s)$", "$t_3 (s)$"],
+		format_L_3T, normalizeToSI(sphere_data),
+		"Raw data");
+	write_latex_results(out("sphereResultsA"),
+		["L (m)", "$T^2 (s^2)$"],
+		format_T2_L, T_vals,
+		"Processed data");
+
+	# modulus of rigidity
+	if 'slope' in data:
+		results['S']= P(data['slope'][0], data['slope'][1] if len(data['slope']) > 1 else 0, SLOPE_UNITS);
+	else:
+		results['S']= estimate_slope(T_vals);
+	results['n']= calc_n(results['Is'], results['S'], results['r']);
+
+	# heart-shaped disk - uses the shortest length of the sphere data as reference
+	hdisk_data= [measurements(row) for row in data['heart']];
+	T_valH= calc_TValues(hdisk_data)[0];
+	T_ref= min(T_vals, key=lambda entry: entry['L'].getValue());
+	results['Ih']= calc_HeartInertia(results['Is'], T_ref['T^2'], T_valH['T^2']);
+
+	write_latex_results(out("heatResults"),
+		["L (m)", "$t_1 (s)$", "$t_2 (s)$", "$t_3 (s)$"],
+		format_L_3T, normalizeToSI(hdisk_data),
+		"Raw data for Heart-Shaped disk");
+
+	return results;
+
+##################################
+# Batch Processing
+
+# set up each worker process
+def _initWorker (precision):
+	# same precision as the interactive version
+	decimal.getcontext().prec = precision;
+
+# process the given dataset file, catching any errors so that the rest of the batch can continue
+#	< returns: (name, results, error, time taken)
+def run_dataset (args):
+	fileN, outDir = args;
+	name= dataset_name(fileN);
+
+	t0= time.time();
+	try:
+		results= process_dataset(read_dataset(fileN), os.path.join(outDir, name));
+		error= None;
+	except Exception, e:
+		results= None;
+		error= "%s: %s" % (e.__class__.__name__, e);
+
+	return name, results, error, time.time() - t0;
+
+# process all the given dataset files
+#	jobs: (int) number of worker processes - if 1, everything is done in this process
+#	threads: (bool) use worker threads (in this process) instead of worker processes
+#	< returns: (list) (name, results, error, time) for each dataset, in the same order as the files
+def run_batch (files, outDir, jobs=None, precision=10, verbose=True, threads=False):
+	tasks= [(fileN, outDir) for fileN in files];
+
+	# the precision is only used for the calculations here (the caller's settings are left alone)
+	context= CalcContext(prec=precision);
+
+	if jobs == 1:
+		outputs= (context.run(run_dataset, task) for task in tasks);
+	elif threads:
+		pool= multiprocessing.pool.ThreadPool(jobs);
+		outputs= pool.imap_unordered(context.wrap(run_dataset), tasks);
+	else:
+		pool= multiprocessing.Pool(jobs, _initWorker, (precision,));
+		outputs= pool.imap_unordered(run_dataset, tasks);
+
+	done= {};
+	for name, results, error, dt in outputs:
+		done[name]= (name, results, error, dt);
+		if verbose:
+			if error:
+				print "\t%-20s FAILED (%.3fs) - %s" % (name, dt, error)
+			else:
+				print "\t%-20s %.3fs" % (name, dt)
+
+	if jobs != 1:
+		pool.close();
+		pool.join();
+
+	return [done[dataset_name(fileN)] for fileN in files];
+
+# write a summary of the results of all the datasets
+def write_summary (outDir, outputs):
+	ok= [x for x in outputs if x[2] is None];
+
+	# plain-text version
+	f= file(os.path.join(outDir, "summary.txt"), 'w');
+	f.write("# dataset | time (s) | I (sphere) | S | n | I (heart)\n");
+	for name, results, error, dt in outputs:
+		if error:
+			f.write("%s | %.3f | FAILED: %s\n" % (name, dt, error));
+		else:
+			f.write("%s | %.3f | %s | %s | %s | %s\n" % (name, dt, results['Is'], results['S'], results['n'], results['Ih']));
+	f.close();
+
+	# LaTeX version
+	def __doformat_summary (entry):
+		name, results, error, dt = entry;
+		return [name.replace("_", "\\_")] + [results[key].toStr(latex=True) for key in ('Is', 'S', 'n', 'Ih')];
+	if ok:
+		write_latex_results(os.path.join(outDir, "summary"),
+			["Dataset", "$I_s (kg.m^2)$", "$S$", "$n$", "$I_h (kg.m^2)$"],
+			__doformat_summary, ok,
+			"Summary of results for all datasets");
+
+##################################
+
+if __name__ == '__main__':
+	parser= optparse.OptionParser(usage="%prog [options] DATADIR");
+	parser.add_option("-j", "--jobs", type="int", default=None,
+					  help="number of worker processes (default: number of cores)");
+	parser.add_option("-t", "--threads", action="store_true", default=False,
+					  help="use worker threads instead of processes");
+	parser.add_option("-o", "--output", default="lab3_results",
+					  help="directory to write results to (default: %default)");
+	parser.add_option("-p", "--precision", type="int", default=10,
+					  help="decimal precision for calculations (default: %default)");
+	options, args = parser.parse_args();
+
+	if len(args) != 1:
+		parser.error("expected a directory of dataset files");
+
+	files= sorted(glob.glob(os.path.join(args[0], "*" + DATASET_EXT)));
+	if not files:
+		parser.error("no dataset files (*%s) found in '%s'" % (DATASET_EXT, args[0]));
+
+	jobs= options.jobs or multiprocessing.cpu_count();
+	if not os.path.isdir(options.output):
+		os.makedirs(options.output);
+
+	workers= "threads" if options.threads else "processes";
+	print "Phys113 Lab 3 Batch Calculations - %d datasets, %d %s \n" % (len(files), jobs, workers)
+
+	t0= time.time();
+	outputs= run_batch(files, options.output, jobs, options.precision, threads=options.threads);
+	wallTime= time.time() - t0;
+
+	write_summary(options.output, outputs);
+
+	# timing report
+	times= [x[3] for x in outputs];
+	failed= len([x for x in outputs if x[2]]);
+	print "\nProcessed %d datasets (%d failed) in %.3fs" % (len(outputs), failed, wallTime)
+	print "\tper dataset: min %.3fs, mean %.3fs, max %.3fs" % (min(times), sum(times) / len(times), max(times))
+	print "\teffective parallelism: %.2f (on %d %s)" % (sum(times) / wallTime, jobs, workers)
+	print "\tsummary written to", os.path.join(options.output, "summary.txt")
+
+	if failed:
+		sys.exit(1);
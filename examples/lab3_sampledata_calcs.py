@@ -4,6 +4,7 @@
 import sys
 import os
 from phystools import *
+from physreport import write_latex_table
 
 ##################################
 # globals 
@@ -31,11 +32,7 @@ def calc_AverageWireRadius (values):
 	
 	# convert from diameter to radius
 	wire_radii = [];
-	for val in values:
-		# firstly, make sure we're in standard units
-		val.changeUnits(mDim);
-		
-		# now append to list
+	for val in convertAll(values, mDim): # firstly, make sure we're in standard units
 		wire_radii.append(val/2);
 	
 	# return the average
@@ -46,8 +43,7 @@ def calc_SphereInertia (mass, diameter):
 	global mDim, kgDim;
 	
 	# convert values to SI-units
-	mass.changeUnits(kgDim);
-	diameter.changeUnits(mDim);
+	mass, diameter = normalizeToSI([mass, diameter]);
 	
 	# convert diameter to radius
 	radius= diameter / 2;
@@ -76,7 +72,7 @@ def calc_T (t_values):
 # calculate value of n - modulus of rigidity
 def calc_n (Inertia, Slope, radius):
 	# n = (8PI I) / (S r4)
-	return (Inertia * ( D(8)*D(str(math.pi)) )) / (Slope * radius**4);
+	return (Inertia * ( D(8)*DTools.pi() )) / (Slope * radius**4);
 
 ##################################
 
@@ -97,29 +93,7 @@ def Run_Program (str, cmd):
 
 # write latex file of the raw data
 def write_latex_results (fileN, labels, format, data, caption):
-	# open the nominated file for datafile writing
-	f= file(fileN+".tex", 'w');
-	
-	# write prefactory stuff
-	f.write("\\begin{table}[h]\n");
-	f.write("\\begin{tabular}{ %s }\n" % ( " | ".join(["c" for x in labels]) ));
-	f.write("%s \\\\ \hline \n" % ( " & ".join(labels) ));
-	
-	# loop over data, adding the specific columns we require
-	for entry in data:	
-		f.write( " & ".join(format(entry)) );
-		if entry != data[-1]:
-			f.write("\\\\ \n");
-		else:
-			f.write("\n");
-	
-	# write finishing stuff
-	f.write("\\end{tabular}\n");
-	if caption: f.write("\\caption{%s}\n" % (caption));
-	f.write("\\end{table}\n");
-	
-	# close the file now
-	f.close();
+	write_latex_table(fileN+".tex", labels, data, format, caption);
 	
 # ----
 	
@@ -232,14 +206,15 @@ if __name__ == '__main__':
 	[P(202, 1, mmDim),	P(39.50, 0.05, sDim), P(39.32, 0.05, sDim), P(32.29, 0.05, sDim)]
 	]
 	
+	# 	lengths need to be in SI-units (all rows at once)
+	sphere_data = normalizeToSI(sphere_data);
+	
 	# 	calculate T values, and print those
 	print "\t L |", "T |", "T^2 "
 	T_vals = [];
 	for sdata in sphere_data:
 		# for each set of measurements, store the calculated results as dict
-		# 	length first - convert units to SI-units
 		T_valD = {'L':sdata[0]};
-		T_valD['L'].changeUnits(mDim);
 		# 	calculate T-Values, and store as separate 
 		T_valD['T']= calc_T(sdata[1:]); # strip off the length var to get the data
 		T_valD['T^2']= T_valD['T'] ** 2;	# square T value
@@ -278,8 +253,14 @@ if __name__ == '__main__':
 		__doformat_T2_L, T_vals,
 		"Processed data");
 	
-	# 	wait for user to input the necessary data (slope value)
-	S = ui_GetSlope();
+	# 	get slope of the graph - from a weighted fit to the points,
+	#	or from the user reading it off the graph if --manual was given
+	if "--manual" in sys.argv[1:]:
+		S = ui_GetSlope();
+	else:
+		# (needs NumPy, so only imported here)
+		from physfit import fit_linear
+		S = fit_linear([x['L'] for x in T_vals], [x['T^2'] for x in T_vals]).slope;
 	print "\tSlope of T^2 vs L is ", S
 	n = calc_n(sphere_inertia, S, wire_average);
 	print "\tModulus of Rigidity of Wire, n, is ", n, "\n"
@@ -291,8 +272,8 @@ if __name__ == '__main__':
 	
 	# do calculations
 	# 	length first - convert units to SI-units
+	hdisk_data= normalizeToSI(hdisk_data);
 	T_valH = {'L':hdisk_data[0][0]};
-	T_valH['L'].changeUnits(mDim);
 	# 	calculate T-Values, and store as separate 
 	T_valH['T']= calc_T(hdisk_data[0][1:]); # strip off the length var to get the data
 	T_valH['T^2']= T_valH['T'] ** 2;	# square T value
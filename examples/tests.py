@@ -51,8 +51,326 @@ def test_unitMatching ():
 def test_NoUnits ():
 	pass;
 
+# array (column-based) tests
+def test_arrays ():
+	from physarray import PhysNumArray
+	
+	print "Doing array tests:"
+	a = PhysNumArray([2, 3, 4], 0.1, MetreLengthUnit());
+	print "\tOriginal a: ", a
+	print "\ta * P(2, 0.1): ", a * PhysNum(2, 0.1, MetreLengthUnit())
+	print "\tP(1, 0.1, mm) + a: ", PhysNum(1, 0.1, MillimetreLengthUnit()) + a
+	print "\ta in mm: ", a.convertUnits(MillimetreLengthUnit())
+	print "\tSum/average of a: ", phys_sum(a), phys_average(a)
+	
+	# whole-array version of a function, registered along with its derivative
+	import numpy
+	def cube (x):
+		return x * x * x;
+	registerDerivative(cube, lambda x: 3 * x * x, lambda x: numpy.power(x, 3), lambda x: 3 * numpy.square(x));
+	print "\tcube(a), sin(a): ", a.calcFunc(cube), a.calcFunc(math.sin)
+
+# combined (derived) units tests
+def test_combinedUnits ():
+	print "Doing combined units tests:"
+	a = PhysNum(2, 0.1, MetreLengthUnit());
+	b = PhysNum(500, 1, MillimetreLengthUnit());
+	t = PhysNum(4, 0.1, SecondTimeUnit());
+	
+	print "\ta * b: ", a * b
+	print "\ta / t^2: ", a / t**2
+	print "\t(a * b) / a: ", (a * b) / a
+	print "\t1 / t: ", 1 / t
+
+# deferred evaluation tests
+def test_lazy ():
+	from physlazy import lazy, getDefaultGraph
+	
+	print "Doing deferred evaluation tests:"
+	T = lazy(PhysNum(3, 0.1, SecondTimeUnit()));
+	x = (T**2 * 2) + (T**2 * 3);
+	print "\t(T^2 * 2) + (T^2 * 3): ", x
+	print "\tGraph: ", getDefaultGraph(), "- nodes reused: ", getDefaultGraph().reused
+	
+	# unhashable functions still work (their nodes just aren't shared)
+	class Scale (object):
+		__hash__= None;
+		def __call__ (self, v):
+			return v * 3;
+	print "\tUnhashable calcFunc: ", T.calcFunc(Scale()).evaluate()
+
+# streaming statistics tests
+def test_accumulator ():
+	print "Doing accumulator tests:"
+	sDim = SecondTimeUnit();
+	
+	a = PhysAccumulator(PhysNum(t, 0.05, sDim) for t in (67.72, 67.62, 67.80));
+	b = PhysAccumulator([PhysNum(67.75, 0.05, sDim)]);
+	a.merge(b);
+	
+	print "\tCount: ", a.getCount()
+	print "\tAverage: ", a.getAverage()
+	print "\tStatistical mean: ", a.getStatisticalMean()
+	print "\tMin/Max: ", a.getMin(), a.getMax()
+
+# calcFunc() result caching tests
+def test_funcCache ():
+	print "Doing function cache tests:"
+	cache= enableFuncCache(2);
+	
+	@pure
+	def double (x):
+		return x * 2;
+	
+	a= PhysNum(0.5, 0.01).calcFunc(double);
+	b= PhysNum(0.5, 0.01).calcFunc(double);
+	print "\tResult: ", a, " (cached: %s)" % (a is b)
+	
+	PhysNum(1, 0.01).calcFunc(double);
+	PhysNum(2, 0.01).calcFunc(double);
+	print "\tStats: ", cache.getStats()
+	
+	# unhashable callables just aren't cached
+	class Scale (object):
+		__hash__= None;
+		def __call__ (self, x):
+			return x * 3;
+	print "\tUnhashable: ", PhysNum(0.5, 0.01).calcFunc(Scale())
+	
+	disableFuncCache();
+
+# analytic uncertainty propagation tests
+def test_derivatives ():
+	print "Doing function derivative tests:"
+	x= PhysNum(0.5, 0.01);
+	
+	print "\tsin(x): ", x.calcFunc(math.sin)
+	print "\tx^3: ", x.calcFunc(powerFunc(3))
+	print "\tunknown (bounds): ", x.calcFunc(lambda v: v * v)
+	
+	registerDerivative(math.asin, lambda v: 1 / math.sqrt(1 - v*v));
+	print "\tasin(x): ", x.calcFunc(math.asin)
+
+# profiling tests
+def test_profile ():
+	from physprofile import Profiler
+	print "Doing profiling tests:"
+	mmDim= MillimetreLengthUnit();
+	mDim= MetreLengthUnit();
+	
+	with Profiler() as prof:
+		a= PhysNum(10, 1, mmDim) + PhysNum(1, 0.1, mDim);
+		b= a * 2;
+		c= b.calcFunc(math.sqrt);
+		
+		# other threads' operations aren't counted
+		import threading
+		other= threading.Thread(target=lambda: [a * 3 for i in xrange(100)]);
+		other.start();
+		other.join();
+	prof.report(limit=5);
+	print "\tCounted '*': ", prof.getTotals()["*"][0]
+
+# curve fitting tests
+def test_fit ():
+	from physfit import fit_linear, fit_polynomial, fit_power_law
+	print "Doing curve fitting tests:"
+	mDim= MetreLengthUnit();
+	sDim= SecondTimeUnit();
+	
+	x= [PhysNum(L, 0.001, mDim) for L in (0.202, 0.322, 0.481, 0.612)];
+	y= [PhysNum(t, 0.05, sDim) for t in (1.98, 3.17, 4.70, 6.01)];
+	fit= fit_linear(x, y);
+	print "\tLinear: ", fit
+	print "\tSlope: ", fit.slope
+	
+	print "\tPolynomial: ", fit_polynomial([0, 1, 2, 3, 4], [1, 2, 5, 10, 17], 2)
+	print "\tPower law: ", fit_power_law([1, 2, 3, 4], [3, 12, 27, 48])
+
+# monte carlo propagation tests
+def _mc_formula (a, b):
+	return a * b / (b - a) ** 2;
+
+def _mc_floorDiv (a):
+	from physarray import PhysNumArray
+	import numpy
+	# a rounded down is exactly 0 for some of the samples
+	return a / PhysNumArray(numpy.floor(a.v));
+
+def test_montecarlo ():
+	from physmc import monte_carlo
+	print "Doing Monte Carlo tests:"
+	a= PhysNum(2, 0.1);
+	b= PhysNum(3, 0.1);
+	
+	print "\tLinear bounds: ", _mc_formula(a, b)
+	result= monte_carlo(_mc_formula, [a, b], samples=10**5, processes=1, seed=1);
+	print "\tMonte Carlo: ", result
+	print "\tAs PhysNum: ", result.toPhysNum()
+	
+	# samples where the formula isn't finite are left out
+	result= monte_carlo(_mc_floorDiv, [PhysNum(1, 0.5)], samples=10**4, chunkSize=10**3, processes=1, seed=1);
+	print "\tNon-finite: ", result.nonfinite, "of", result.count + result.nonfinite
+	for samples, args in ((10**3, [PhysNum(1, 0.1), PhysNum(0, 0)]), (0, [a, b])):
+		try:
+			monte_carlo(lambda x, y: x / y, args, samples=samples, processes=1, seed=1);
+		except ValueError, err:
+			print "\tError: ", err
+
+# correlated uncertainty tests
+def test_correlated ():
+	from physcorr import TrackedPhysNum, correlation
+	print "Doing correlated uncertainty tests:"
+	mmDim= MillimetreLengthUnit();
+	
+	x= TrackedPhysNum(10, 0.5, mmDim, "x");
+	y= TrackedPhysNum(4, 0.1, mmDim, "y");
+	print "\tx - x: ", x - x, " (untracked: %s)" % (PhysNum(10, 0.5, mmDim) - PhysNum(10, 0.5, mmDim))
+	
+	a= x * y;
+	b= x / y;
+	print "\tx*y, x/y: ", a, ",", b
+	print "\tCorrelation: ", correlation(a, b)
+	print "\tContributions to x*y: ", [(m.name, str(c)) for m, c in a.getContributions()]
+	
+	# separate measurements with the same readings stay separate (also in deferred expressions)
+	from physlazy import deferred
+	mDim= MetreLengthUnit();
+	a= TrackedPhysNum(2, 0.1, mDim, "a");
+	b= TrackedPhysNum(2, 0.1, mDim, "b");
+	print "\ta - b: ", a - b, ", deferred: ", deferred(lambda x, y: x - y)(a, b), ", distinct: ", len(set([a, b]))
+	print "\tAverage: ", phys_average([x, y, x])
+
+# compiled formula tests
+def test_compiled ():
+	from physkernel import compiled
+	from physarray import PhysNumArray
+	print "Doing compiled formula tests:"
+	sDim= SecondTimeUnit();
+	
+	@compiled
+	def calc_T (t1, t2, t3):
+		return phys_average([t1, t2, t3]) / 20;
+	
+	t1= PhysNumArray([67.72, 60.28], 0.05, sDim);
+	t2= PhysNumArray([67.62, 60.21], 0.05, sDim);
+	t3= PhysNumArray([67.80, 60.28], 0.05, sDim);
+	print "\tCompiled: ", calc_T(t1, t2, t3)
+	print "\tKernels: ", calc_T.kernels.values()
+	print "\tScalar: ", calc_T(t1[0], t2[0], t3[0])
+	
+	# the kernel doesn't depend on the data (here, log(0) in the first entry)
+	@compiled
+	def calc_log (x, scale=1):
+		return x.calcFunc(math.log) * scale;
+	
+	import numpy
+	with numpy.errstate(divide='ignore', invalid='ignore'):
+		print "\tlog: ", calc_log(PhysNumArray([0.0, 1.0], 0.01), scale=2)
+	print "\tUnhashable constant: ", calc_log(PhysNumArray([1.0, 2.0], 0.01), scale=numpy.array([1.0, 2.0]))
+
+def _threads_formula (x, t):
+	y= (x.calcFunc(DTools.sin) * x ** 2) / t.changeUnits(SecondTimeUnit());
+	return (y + x.sqrt() * x / t) ** 0.5;
+	
+def test_threads ():
+	import sys
+	import multiprocessing.pool
+	print "Doing thread-safety tests:"
+	mmDim= MillimetreLengthUnit();
+	minDim= MinuteTimeUnit();
+	
+	enableFuncCache(64);	# smaller than the number of different tasks, so that there are plenty of evictions
+	
+	# each task uses its own settings (each one is done twice in a row, so there are some cache hits too)
+	tasks= [];
+	for i in [i // 2 for i in xrange(200)]:
+		context= CalcContext(backend=("float" if i % 5 == 0 else "decimal"), prec=(8 + i % 23));
+		x= context.run(PhysNum, D(i % 17 + 1) / 7, D("0.001") * (i % 3 + 1), mmDim);
+		t= context.run(PhysNum, D(i % 11 + 2) / 3, D("0.01"), minDim);
+		tasks.append((context, x, t));
+	
+	def run (task):
+		context, x, t = task;
+		result= context.run(_threads_formula, x, t);
+		return repr(result.getValue()), repr(result.getUncertainty_Absolute()), str(result.getUnits());
+		
+	expected= map(run, tasks);
+	
+	# switch threads as often as possible, to catch any races
+	oldInterval= sys.getcheckinterval();
+	sys.setcheckinterval(1);
+	try:
+		pool= multiprocessing.pool.ThreadPool(8);
+		mismatches= 0;
+		for attempt in xrange(10):
+			results= pool.map(run, tasks, chunksize=1);
+			mismatches += len([1 for a, b in zip(expected, results) if a != b]);
+		pool.close();
+		pool.join();
+	finally:
+		sys.setcheckinterval(oldInterval);
+		
+	print "\tResults: ", len(tasks) * 10
+	print "\tMismatches: ", mismatches
+	print "\tPrecision here: ", decimal.getcontext().prec
+	print "\tCache: ", getFuncCache()
+
+def test_convertAll ():
+	print "Doing bulk conversion tests:"
+	mmDim= MillimetreLengthUnit();
+	gDim= GramMassUnit();
+	minDim= MinuteTimeUnit();
+	
+	rows= [[PhysNum(612, 1, mmDim), PhysNum(1.5, 0.1, minDim)], [PhysNum(481, 1, mmDim), PhysNum(2, 0.1, minDim)]];
+	print "\tIn metres: ", convertAll(rows, MetreLengthUnit())
+	print "\tSI: ", normalizeToSI(rows)
+	print "\tSI units of g.min^-2: ", siUnits(parseUnits("g.min^-2"))
+	
+	plan= ConversionPlan(MetreLengthUnit());
+	print "\tPlan: ", plan.convert(PhysNum(2, 1, mmDim)), plan
+
+def test_packed ():
+	import cPickle
+	from physio import pack_physnums, PackedPhysNums
+	print "Doing packed collection tests:"
+	mmDim= MillimetreLengthUnit();
+	sDim= SecondTimeUnit();
+	
+	values= [PhysNum(612, 1, mmDim), PhysNum(D(-1) / 3, D("0.05"), sDim), PhysNum(2, 0, None)];
+	packed= pack_physnums(values);
+	print "\tPacked: ", packed
+	print "\tRound trip: ", PackedPhysNums.fromBytes(packed.toBytes()).unpack()
+	print "\tPickled: ", cPickle.loads(cPickle.dumps(packed, 2)).unpack() == values
+
+def test_parse ():
+	from physparse import parse_physnum, parse_physnums
+	print "Doing parsing tests:"
+	
+	x= PhysNum(D(1) / 3, D("0.05"), parseUnits("kg.m^2"));
+	print "\tPrinted: ", parse_physnum(str(x)) == x
+	print "\tLaTeX: ", parse_physnum(x.toStr(latex=True, withUnits=True)) == x
+	print "\tPlus-minus sign: ", parse_physnum("67.72 \xc2\xb1 0.05 s")
+	print "\tMixed units: ", parse_physnum("1.2m +/- 3mm")
+	print "\tLines: ", parse_physnums(["# comment", "67.72s +/- 0.05s", "", "612mm"])
+
 #############################
 
 # uncomment the tests we want to perform...
 #test_units();
 test_unitMatching();
+#test_arrays();
+#test_combinedUnits();
+#test_lazy();
+#test_accumulator();
+#test_funcCache();
+#test_derivatives();
+#test_profile();
+#test_fit();
+#test_montecarlo();
+#test_correlated();
+#test_compiled();
+#test_threads();
+#test_convertAll();
+#test_packed();
+#test_parse();
@@ -1,95 +1,300 @@
 # Some Utilities for the Decimal Module
 # from the Python Manual
+#
+# Extended with caching of constants (per precision), argument reduction, and the
+# ln/log10/atan/sqrt functions, so that full precision is reached in bounded time
+# whatever the size of the argument.
+#
+# Decimal arguments give Decimal results (to the current precision). Other argument
+# types (float, complex) are passed on to the math/cmath versions of the functions.
+#
+# Each function also takes an optional decimal context to use instead of the current one.
+# Any extra precision needed along the way is only used in a local copy of the context,
+# so the caller's context is never modified (and each thread can safely use its own).
 
 from decimal import *
+import math
+import cmath
 
 #########################
+# Constants
 
-def pi():
-    """Compute Pi to the current precision.
+# cached constants
+#   (name, precision) : Decimal
+_constants = {}
+
+# get the named constant at the precision of the given (or current) context, computing it if needed
+#   compute: (function) function to calculate the constant (at the current precision)
+def _constant(name, compute, context=None):
+    key = (name, (context or getcontext()).prec)
+    try:
+        return _constants[key]
+    except KeyError:
+        pass
+
+    with localcontext(context):
+        value = +compute()
+
+    # if another thread got there first, its value is identical anyway
+    _constants[key] = value
+    return value
+
+# round x to the given context (or the current one)
+def _round(x, context=None):
+    if context is None:
+        return +x
+    return context.plus(x)
+
+# arctan(1/n) as a fixed-point integer (scaled by 'one')
+def _arctanInverse(n, one):
+    n2 = n * n
+    term = one // n
+    total, k, sign = term, 1, -1
+    while term:
+        term //= n2
+        k += 2
+        total += sign * (term // k)
+        sign = -sign
+    return total
+
+def _computePi():
+    # Machin's formula (pi/4 = 4.atan(1/5) - atan(1/239)), using integer arithmetic
+    digits = getcontext().prec + 10
+    one = 10 ** digits
+    value = 4 * (4 * _arctanInverse(5, one) - _arctanInverse(239, one))
+    return Decimal(value).scaleb(-digits)
+
+def pi(context=None):
+    """Compute Pi to the current precision (or that of the given context).
 
     >>> print pi()
     3.141592653589793238462643383
-    
+    >>> print pi(Context(prec=10))
+    3.141592654
+
     """
-    getcontext().prec += 2  # extra digits for intermediate steps
-    three = Decimal(3)      # substitute "three=3.0" for regular floats
-    lasts, t, s, n, na, d, da = 0, three, 3, 1, 0, 0, 24
+    return _constant('pi', _computePi, context)
+
+def ln2(context=None):
+    """Compute the natural logarithm of 2 to the current precision (or that of the given context).
+
+    >>> print ln2()
+    0.6931471805599453094172321215
+
+    """
+    return _constant('ln2', lambda: Decimal(2).ln(), context)
+
+#########################
+# Helpers
+
+# number of extra digits of precision needed to reduce the given argument
+# (by multiples of pi/2) without losing any digits of the remainder
+def _reductionDigits(x):
+    return max(x.adjusted(), 0) + 4
+
+# reduce x by the nearest multiple of pi/2
+#   < returns: (r, n) - where x = r + n.pi/2, and |r| <= pi/4
+def _reduce(x):
+    halfPi = pi() / 2
+    n = (x / halfPi).to_integral_value(rounding=ROUND_HALF_EVEN)
+    return x - n * halfPi, int(n) % 4
+
+# Taylor series for sin/cos (for small arguments)
+#   start: 0 for cos, 1 for sin
+def _sinCosSeries(x, start):
+    i, lasts, fact, sign = start, 0, 1, 1
+    s = num = (x if start else Decimal(1))
+    x2 = x * x
     while s != lasts:
         lasts = s
-        n, na = n+na, na+8
-        d, da = d+da, da+32
-        t = (t * n) / d
-        s += t
-    getcontext().prec -= 2
-    return +s               # unary plus applies the new precision
-
-def exp(x):
+        i += 2
+        fact *= i * (i-1)
+        num *= x2
+        sign *= -1
+        s += num / fact * sign
+    return s
+
+#########################
+# Functions
+
+def exp(x, context=None):
     """Return e raised to the power of x.  Result type matches input type.
 
     >>> print exp(Decimal(1))
     2.718281828459045235360287471
     >>> print exp(Decimal(2))
     7.389056098930650227230427461
+    >>> print exp(Decimal(1000))
+    1.970071114017046993888879352E+434
     >>> print exp(2.0)
     7.38905609893
     >>> print exp(2+0j)
     (7.38905609893+0j)
-    
+
     """
-    getcontext().prec += 2
-    i, lasts, s, fact, num = 0, 0, 1, 1, 1
-    while s != lasts:
-        lasts = s    
-        i += 1
-        fact *= i
-        num *= x     
-        s += num / fact   
-    getcontext().prec -= 2        
-    return +s
-
-def cos(x):
+    if isinstance(x, Decimal):
+        # Decimal's own version does its own argument reduction, and is correctly rounded
+        return x.exp(context)
+    elif isinstance(x, complex):
+        return cmath.exp(x)
+    else:
+        return math.exp(x)
+
+def ln(x, context=None):
+    """Return the natural logarithm of x.  Result type matches input type.
+
+    >>> print ln(Decimal(2))
+    0.6931471805599453094172321215
+    >>> print ln(Decimal('1E+100'))
+    230.2585092994045684017991455
+    >>> print ln(2.0)
+    0.69314718056
+
+    """
+    if isinstance(x, Decimal):
+        return x.ln(context)
+    elif isinstance(x, complex):
+        return cmath.log(x)
+    else:
+        return math.log(x)
+
+def log10(x, context=None):
+    """Return the base-10 logarithm of x.  Result type matches input type.
+
+    >>> print log10(Decimal(2))
+    0.3010299956639811952137388947
+    >>> print log10(100.0)
+    2.0
+
+    """
+    if isinstance(x, Decimal):
+        return x.log10(context)
+    elif isinstance(x, complex):
+        return cmath.log10(x)
+    else:
+        return math.log10(x)
+
+def sqrt(x, context=None):
+    """Return the square root of x.  Result type matches input type.
+
+    >>> print sqrt(Decimal(2))
+    1.414213562373095048801688724
+    >>> print sqrt(2.0)
+    1.41421356237
+
+    """
+    if isinstance(x, Decimal):
+        return x.sqrt(context)
+    elif isinstance(x, complex):
+        return cmath.sqrt(x)
+    else:
+        return math.sqrt(x)
+
+def cos(x, context=None):
     """Return the cosine of x as measured in radians.
 
     >>> print cos(Decimal('0.5'))
     0.8775825618903727161162815826
+    >>> print cos(Decimal(100))
+    0.8623188722876839341019385140
     >>> print cos(0.5)
     0.87758256189
     >>> print cos(0.5+0j)
-    (0.87758256189+0j)
-    
+    (0.87758256189-0j)
+
     """
-    getcontext().prec += 2
-    i, lasts, s, fact, num, sign = 0, 0, 1, 1, 1, 1
-    while s != lasts:
-        lasts = s    
-        i += 2
-        fact *= i * (i-1)
-        num *= x * x
-        sign *= -1
-        s += num / fact * sign 
-    getcontext().prec -= 2        
-    return +s
+    if not isinstance(x, Decimal):
+        return (cmath if isinstance(x, complex) else math).cos(x)
+    if not x.is_finite():
+        return Decimal('NaN')
+
+    with localcontext(context) as ctx:
+        ctx.prec += 2 + _reductionDigits(x)
+        r, n = _reduce(x)
+        if n % 2:
+            s = _sinCosSeries(r, 1)
+        else:
+            s = _sinCosSeries(r, 0)
+        if n in (1, 2):
+            s = -s
+    return _round(s, context)
 
-def sin(x):
+def sin(x, context=None):
     """Return the sine of x as measured in radians.
 
     >>> print sin(Decimal('0.5'))
     0.4794255386042030002732879352
+    >>> print sin(Decimal(100))
+    -0.5063656411097587936565576105
+    >>> print sin(Decimal(100), Context(prec=10))
+    -0.5063656411
     >>> print sin(0.5)
     0.479425538604
     >>> print sin(0.5+0j)
     (0.479425538604+0j)
-    
+
     """
-    getcontext().prec += 2
-    i, lasts, s, fact, num, sign = 1, 0, x, 1, x, 1
-    while s != lasts:
-        lasts = s    
-        i += 2
-        fact *= i * (i-1)
-        num *= x * x
-        sign *= -1
-        s += num / fact * sign 
-    getcontext().prec -= 2        
-    return +s
+    if not isinstance(x, Decimal):
+        return (cmath if isinstance(x, complex) else math).sin(x)
+    if not x.is_finite():
+        return Decimal('NaN')
+
+    with localcontext(context) as ctx:
+        ctx.prec += 2 + _reductionDigits(x)
+        r, n = _reduce(x)
+        if n % 2:
+            s = _sinCosSeries(r, 0)
+        else:
+            s = _sinCosSeries(r, 1)
+        if n in (2, 3):
+            s = -s
+    return _round(s, context)
+
+def atan(x, context=None):
+    """Return the arc tangent of x, in radians.  Result type matches input type.
+
+    >>> print atan(Decimal(1))
+    0.7853981633974483096156608458
+    >>> print atan(Decimal('1E+20'))
+    1.570796326794896619221321692
+    >>> print atan(Decimal(1), Context(prec=10))
+    0.7853981634
+    >>> print atan(0.5)
+    0.463647609001
+
+    """
+    if not isinstance(x, Decimal):
+        return (cmath if isinstance(x, complex) else math).atan(x)
+    if x.is_nan():
+        return x
+    if x.is_infinite():
+        with localcontext(context):
+            return (pi() / 2).copy_sign(x)
+
+    with localcontext(context) as ctx:
+        ctx.prec += 4
+        # atan(x) = pi/2 - atan(1/x), for large x
+        inverted = abs(x) > 1
+        y = (1 / abs(x)) if inverted else abs(x)
+
+        # halve the angle until the series converges quickly:
+        #   atan(y) = 2.atan(y / (1 + sqrt(1 + y^2)))
+        doublings = 0
+        while y > Decimal('0.1'):
+            y = y / (1 + (1 + y * y).sqrt())
+            doublings += 1
+
+        # Taylor series
+        i, lasts, s, num, sign = 1, 0, y, y, 1
+        y2 = y * y
+        while s != lasts:
+            lasts = s
+            i += 2
+            num *= y2
+            sign *= -1
+            s += num / i * sign
+        s *= 2 ** doublings
+
+        if inverted:
+            s = pi() / 2 - s
+    return _round(s.copy_sign(x), context)
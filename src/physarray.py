@@ -0,0 +1,393 @@
+# Column-based (array) version of PhysNum for bulk processing of measurements
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Requires NumPy
+
+import numpy
+import math
+from fractions import Fraction
+from decimal import Decimal as D
+import decimaltools as DTools
+from phystools import *
+
+###################################
+# Helper Utilities
+
+# get the factor needed to convert values from the 'fromUnits' to the 'toUnits'
+# (following the same rules as PhysNum.changeUnits(), so mismatched measurement types are left alone)
+def _unitFactor (fromUnits, toUnits):
+	if not (fromUnits and toUnits):
+		return 1.0;
+	if fromUnits.sameMeasurement(toUnits) == False:
+		return 1.0;
+	if fromUnits == toUnits:
+		return 1.0;
+
+	return float(toUnits.conversionFactor(fromUnits));
+
+# get the fractional uncertainties of a pair of value/uncertainty columns
+#	- entries with zero value are given zero fractional uncertainty, as in PhysNum
+def _fractional (v, e):
+	frac = numpy.zeros(numpy.broadcast(v, e).shape);
+	mask = (v != 0);
+	numpy.divide(e, v, out=frac, where=mask);
+	return frac;
+
+# register the NumPy (whole-array) versions of the known functions (see phystools.registerDerivative()), and their derivatives
+#	- the Decimal versions are the same for arrays, and NumPy's own functions can be used directly too
+for _funcs, _arrayFunc, _arrayDerivative in (
+	((math.sin, DTools.sin, numpy.sin), numpy.sin, numpy.cos),
+	((math.cos, DTools.cos, numpy.cos), numpy.cos, lambda x: -numpy.sin(x)),
+	((math.tan, numpy.tan), numpy.tan, lambda x: 1 / numpy.cos(x)**2),
+	((math.atan, DTools.atan, numpy.arctan), numpy.arctan, lambda x: 1 / (1 + x*x)),
+	((math.exp, DTools.exp, numpy.exp), numpy.exp, numpy.exp),
+	((math.log, DTools.ln, numpy.log), numpy.log, lambda x: 1 / x),
+	((math.log10, DTools.log10, numpy.log10), numpy.log10, lambda x: 1 / (x * math.log(10))),
+	((math.sqrt, DTools.sqrt, numpy.sqrt), numpy.sqrt, lambda x: 0.5 / numpy.sqrt(x)),
+):
+	for _func in _funcs:
+		# NumPy's functions work on single values too, so they get the same derivative as the math version
+		registerDerivative(_func, getDerivative(_func) or getDerivative(_funcs[0]), _arrayFunc, _arrayDerivative);
+
+# check if NumPy floating point errors of the given kind ('divide' or 'invalid') should raise exceptions,
+# as they do for PhysNum - otherwise (inside numpy.errstate(<kind>='ignore'), as used by physmc) the 
+# affected entries just become inf/nan
+def _raises (kind):
+	return numpy.geterr()[kind] != 'ignore';
+
+# apply the given function to all the values in the array
+#	- functions which work on whole arrays are called once, otherwise it is called for each value
+def _applyFunc (func, values):
+	try:
+		result= func(values);
+		if isinstance(result, numpy.ndarray) and (result.shape == values.shape):
+			return result.astype(numpy.float64);
+	except (TypeError, ValueError):
+		pass;
+
+	# one value at a time
+	return numpy.fromiter((float(func(x)) for x in values.tolist()), numpy.float64, len(values));
+
+###################################
+# Physics Number Array
+
+# Array of PhysNums, stored as two contiguous columns (values + absolute uncertainties),
+# which all share a single set of units.
+#
+# All operators work on whole columns at once, and follow the same uncertainty propagation
+# rules as PhysNum. Scalar operands (PhysNum, or plain numbers) are broadcast over the array.
+class PhysNumArray(object):
+	# make sure NumPy defers to our operators when mixed with numpy scalars/arrays
+	__array_priority__ = 1000;
+
+	# helper utility functions for class ---------------
+
+	# validate the other arg given to an arithmetic operator, returning (values, uncertainties, units)
+	# 	- plain numbers are treated as having no uncertainty
+	#	sameUnits: (bool) plain numbers are assumed to have the same units as us (i.e. for addition),
+	#			   otherwise they are treated as having no units (i.e. for multiplication)
+	def _validateArithArg (self, arg, sameUnits=True):
+		units= self.units if sameUnits else None;
+		
+		if isinstance(arg, PhysNumArray):
+			return arg.v, arg.e, arg.units;
+		elif isinstance(arg, PhysNum):
+			return float(arg.getValue()), float(arg.getUncertainty_Absolute()), arg.getUnits();
+		elif isinstance(arg, (int, long, float, D, numpy.number)):
+			return float(arg), 0.0, units;
+		elif isinstance(arg, numpy.ndarray):
+			return arg.astype(numpy.float64), 0.0, units;
+		else:
+			return None;
+
+	# class stuff ----------------------------------
+
+	# constructor
+	#	values: (sequence/ndarray) values for each entry
+	#	uncertainties: (sequence/ndarray/number) absolute uncertainties for each entry (or for all of them)
+	#	units: (Unit) units shared by all entries
+	def __init__ (self, values, uncertainties=0, units=None):
+		self.v= numpy.ascontiguousarray(values, dtype=numpy.float64);
+		self.e= numpy.ascontiguousarray(numpy.broadcast_to(numpy.asarray(uncertainties, dtype=numpy.float64), self.v.shape));
+		self.units= units;
+
+	# create an array from a list of PhysNums, converting them to common units as we go
+	#	units: (Unit) units to use. If not given, the units of the first number are used
+	@staticmethod
+	def fromPhysNums (nums, units=None):
+		# get the units to use
+		if (units is None) and len(nums):
+			units= nums[0].getUnits();
+
+		# fill the columns
+		N= len(nums);
+		v= numpy.fromiter((float(num.v) for num in nums), numpy.float64, N);
+		e= numpy.fromiter((float(num.e) for num in nums), numpy.float64, N);
+
+		# convert any entries in other units (only working out the factor once for each set of units)
+		factors= {};
+		for num in nums:
+			if num.units not in factors:
+				factors[num.units]= _unitFactor(num.units, units);
+
+		if [fac for fac in factors.itervalues() if fac != 1.0]:
+			fac= numpy.fromiter((factors[num.units] for num in nums), numpy.float64, N);
+			v *= fac;
+			e *= fac;
+
+		return PhysNumArray(v, e, units);
+
+	# console representation
+	def __repr__ (self):
+		return "PhysNumArray(%s, %s, %s)" % (repr(self.v), repr(self.e), repr(self.units));
+
+	# user-output representation
+	def __str__ (self):
+		return "[%s]" % (", ".join([str(x) for x in self]));
+
+	# sequence protocol ----------------------------
+
+	def __len__ (self):
+		return len(self.v);
+
+	# get a single entry (as a PhysNum), or a slice of the array (as PhysNumArray)
+	def __getitem__ (self, index):
+		if isinstance(index, (int, long, numpy.integer)):
+			return PhysNum(float(self.v[index]), float(self.e[index]), self.units);
+		else:
+			return PhysNumArray(self.v[index], self.e[index], self.units);
+
+	def __iter__ (self):
+		for i in xrange(len(self.v)):
+			yield self[i];
+
+	# get a list of PhysNums for each of the entries
+	def toPhysNums (self):
+		return list(self);
+
+	# getters --------------------------------------
+
+	# Get the values column
+	def getValue (self):
+		return self.v;
+
+	# Get the absolute uncertainties column
+	def getUncertainty_Absolute (self):
+		return self.e;
+
+	# Get the fractional uncertainties column
+	def getUncertainty_Fractional (self):
+		return _fractional(self.v, self.e);
+
+	# Get the percentage uncertainties column
+	def getUncertainty_Percentage (self):
+		return self.getUncertainty_Fractional() * 100;
+
+	# Get the units shared by all entries
+	def getUnits (self):
+		return self.units;
+
+	# assorted number ops ---------------------------
+
+	# make a copy of this array with the units changed to the specified ones
+	#	- returns this array if no conversion is needed
+	def convertUnits (self, newUnits):
+		fac= _unitFactor(self.units, newUnits);
+		if fac == 1.0:
+			return self;
+
+		return PhysNumArray(self.v * fac, self.e * fac, newUnits);
+
+	# change the units of all the entries to the specified units
+	#	- as with PhysNum, this returns the converted array instead of modifying this one
+	changeUnits = convertUnits;
+
+	# apply the given function (of a single value) to all the values in the array
+	#	- as for PhysNum.calcFunc(), the uncertainties are found from the derivative of the
+	#	  function if it is known, otherwise from the bounds f(v+e) and f(v-e)
+	def calcFunc (self, func):
+		arrayFuncs= getArrayFunc(func);
+		if arrayFuncs:
+			f, df = arrayFuncs;
+			return PhysNumArray(f(self.v), numpy.abs(df(self.v)) * self.e, self.units);
+
+		derivative= getDerivative(func);
+		if derivative is not None:
+			val= _applyFunc(func, self.v);
+			err= numpy.abs(_applyFunc(derivative, self.v)) * self.e;
+			return PhysNumArray(val, err, self.units);
+
+		val= _applyFunc(func, self.v);
+		ubound= _applyFunc(func, self.v + self.e);
+		lbound= _applyFunc(func, self.v - self.e);
+		return PhysNumArray(val, (ubound - lbound) / 2, self.units);
+
+	# whole-column reductions ----------------------
+
+	# sum of all the entries (as a PhysNum), adding absolute uncertainties as phys_sum() does
+	def sum (self):
+		return PhysNum(float(self.v.sum()), float(self.e.sum()), self.units);
+
+	# average of all the entries (as a PhysNum), with uncertainty reduced by sqrt(N) as phys_average() does
+	def average (self):
+		N= len(self.v);
+		return PhysNum(float(self.v.sum()) / N, float(self.e.sum()) / math.sqrt(N), self.units);
+
+	# hooks used by phys_sum() and phys_average()
+	_phys_sum = sum;
+	_phys_average = average;
+
+	# element-wise average, when this is the sum of N arrays
+	def _phys_meanOf (self, N):
+		return PhysNumArray(self.v / N, self.e / math.sqrt(N), self.units);
+
+	# unary arithmetic operators -------------------------
+
+	# absolute value operator - same as doing getValue()
+	__abs__ = getValue;
+
+	# pos operator - upper values allowed by the uncertainties
+	def __pos__ (self):
+		return self.v + self.e;
+
+	# neg operator - lower values allowed by the uncertainties
+	def __neg__ (self):
+		return self.v - self.e;
+
+	# invert the values (i.e. 1/val)
+	def __invert__ (self):
+		if _raises('divide') and numpy.any(self.v == 0):
+			raise ZeroDivisionError;
+
+		val= 1.0 / self.v;
+		err= _fractional(self.v, self.e) * val;
+		return PhysNumArray(val, err, powerUnits(self.units, -1));
+
+	# arithmetic operators ---------------------------
+	
+	# get the operands for a binary operator as (lv, le, rv, re, units), with the right operand 
+	# converted into the units of the left operand (which are also used for the result)
+	#	reflected: (bool) if True, 'other' is the left operand
+	def _binaryOperands (self, other, reflected=False):
+		other= self._validateArithArg(other);
+		if other is None:
+			return None;
+		ov, oe, ounits = other;
+		
+		if reflected:
+			fac= _unitFactor(self.units, ounits);
+			return ov, oe, self.v*fac, self.e*fac, ounits;
+		else:
+			fac= _unitFactor(ounits, self.units);
+			return self.v, self.e, ov*fac, oe*fac, self.units;
+	
+	# addition - add absolute uncertainties
+	def _add (self, other, reflected=False):
+		ops= self._binaryOperands(other, reflected);
+		if ops is None:
+			return NotImplemented;
+		lv, le, rv, re, units = ops;
+		
+		return PhysNumArray(lv + rv, le + re, units);
+		
+	# subtraction - subtract values, but add absolute uncertainties
+	def _sub (self, other, reflected=False):
+		ops= self._binaryOperands(other, reflected);
+		if ops is None:
+			return NotImplemented;
+		lv, le, rv, re, units = ops;
+		
+		return PhysNumArray(lv - rv, le + re, units);
+		
+	# get the operands for a multiplicative operator as (lv, le, lunits, rv, re, runits) - no unit conversions are done
+	#	reflected: (bool) if True, 'other' is the left operand
+	def _productOperands (self, other, reflected=False):
+		other= self._validateArithArg(other, False);
+		if other is None:
+			return None;
+		ov, oe, ounits = other;
+		
+		if reflected:
+			return ov, oe, ounits, self.v, self.e, self.units;
+		else:
+			return self.v, self.e, self.units, ov, oe, ounits;
+	
+	# multiplication - add fractional uncertainties
+	def _mul (self, other, reflected=False):
+		ops= self._productOperands(other, reflected);
+		if ops is None:
+			return NotImplemented;
+		lv, le, lunits, rv, re, runits = ops;
+		
+		units, convFac = multiplyUnits(lunits, runits);
+		
+		val= lv * rv * float(convFac);
+		err= (_fractional(lv, le) + _fractional(rv, re)) * val;
+		return PhysNumArray(val, err, units);
+		
+	# division - divide values, but add fractional uncertainties
+	def _div (self, other, reflected=False):
+		ops= self._productOperands(other, reflected);
+		if ops is None:
+			return NotImplemented;
+		lv, le, lunits, rv, re, runits = ops;
+		
+		if _raises('divide') and numpy.any(rv == 0):
+			raise ZeroDivisionError;
+		
+		units, convFac = divideUnits(lunits, runits);
+		
+		val= lv / rv * float(convFac);
+		err= (_fractional(lv, le) + _fractional(rv, re)) * val;
+		return PhysNumArray(val, err, units);
+	
+	# LHS operators
+	def __add__ (self, other):
+		return self._add(other);
+	def __sub__ (self, other):
+		return self._sub(other);
+	def __mul__ (self, other):
+		return self._mul(other);
+	def __div__ (self, other):
+		return self._div(other);
+	__truediv__ = __div__;
+	
+	# RHS operators
+	def __radd__ (self, other):
+		return self._add(other, True);
+	def __rsub__ (self, other):
+		return self._sub(other, True);
+	def __rmul__ (self, other):
+		return self._mul(other, True);
+	def __rdiv__ (self, other):
+		return self._div(other, True);
+	__rtruediv__ = __rdiv__;
+	
+	# power operator - raise values to the given (integer or real) power
+	#	- as for PhysNum, the fractional uncertainty is simply |n| times the original
+	def __pow__ (self, other, modulo=None):
+		if type(other) not in (int, long):
+			if other == int(other):
+				other= int(other);
+			elif _raises('invalid') and numpy.any(self.v < 0):
+				raise ValueError, "Cannot raise negative value to non-integer power";
+		
+		if other == 0:
+			return PhysNumArray(numpy.ones_like(self.v), 0, None);
+		elif (other < 0) and _raises('divide') and numpy.any(self.v == 0):
+			raise ZeroDivisionError;
+		
+		n= float(other) if isinstance(other, D) else other;
+		val= self.v ** n;
+		err= numpy.abs(n * _fractional(self.v, self.e) * val);
+		return PhysNumArray(val, err, powerUnits(self.units, other));
+		
+	# square-root of all the values
+	def sqrt (self):
+		if _raises('invalid') and numpy.any(self.v < 0):
+			raise ValueError, "Cannot take the square-root of a negative value";
+		
+		val= numpy.sqrt(self.v);
+		err= numpy.abs(_fractional(self.v, self.e) * val) / 2;
+		return PhysNumArray(val, err, powerUnits(self.units, Fraction(1, 2)));
+	
@@ -0,0 +1,405 @@
+# Correlation-aware uncertainty propagation
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# PhysNum treats the operands of every operation as independent, so shared sources of error
+# get counted more than once (i.e. x - x has twice the uncertainty of x, instead of none).
+#
+# TrackedPhysNums instead carry the (first-order) partial derivatives of their value with
+# respect to each of the original measurements they depend on. The uncertainty is then
+# found by combining the contributions of each measurement in quadrature, so that the
+# correlations between results which share measurements are handled correctly.
+#
+# The derivatives are kept in a dict, holding only the measurements which are actually
+# involved, so the cost of each operation only depends on the number of those. The
+# uncertainty itself is only worked out when it is needed (i.e. not for every partial sum).
+#
+#	i.e.
+#		I= TrackedPhysNum(0.0712, 0.0001, kgm2Dim, "I_sphere")
+#		n= calc_n(I, S, r)
+#		Ih= calc_HeartInertia(I, T1, T2)
+#		print correlation(n, Ih)
+
+from phystools import *
+
+# shortcuts for creating/initialising immutable objects
+_newObject = object.__new__;
+_setAttr = object.__setattr__;
+
+###################################
+# Measurements
+
+# An original measurement (i.e. a raw reading), which other values can depend on
+class Measurement(object):
+	__slots__ = ('sigma', 'name');
+
+	# constructor
+	#	sigma: (number) standard uncertainty of the measurement (in the units it was measured in)
+	#	name: (str) name used when reporting the contributions to uncertainties
+	def __init__ (self, sigma, name=None):
+		self.sigma= sigma;
+		self.name= name;
+
+	def __repr__ (self):
+		return "<Measurement %s +/- %s>" % (self.name or hex(id(self)), self.sigma);
+
+# ---
+
+# get sensitivities scaled by the given factor
+def _scaled (sens, factor):
+	if factor == 1:
+		return sens.copy();
+	return dict([(m, d * factor) for m, d in sens.iteritems()]);
+
+# add sensitivities (scaled by the given factor) into another set of them
+def _addInto (result, sens, factor):
+	get= result.get;
+	if factor == 1:
+		for m, d in sens.iteritems():
+			result[m]= get(m, 0) + d;
+	else:
+		for m, d in sens.iteritems():
+			result[m]= get(m, 0) + d * factor;
+
+# remove the measurements whose contributions have cancelled out exactly
+def _dropZeros (sens):
+	for m in [m for m, d in sens.iteritems() if not d]:
+		del sens[m];
+	return sens;
+
+# get the linear combination of two sets of sensitivities (a*fa + b*fb)
+#	- only the measurements in either of them are looked at
+def _combined (a, fa, b, fb):
+	# go over the smaller one
+	if len(a) < len(b):
+		a, fa, b, fb = b, fb, a, fa;
+
+	result= _scaled(a, fa);
+	_addInto(result, b, fb);
+	return _dropZeros(result);
+
+# get the uncertainty from the given sensitivities (contributions of each measurement, in quadrature)
+def _uncertainty (sens):
+	backend= getNumericBackend();
+	total= backend.zero;
+	for m, d in sens.iteritems():
+		c= d * m.sigma;
+		total += c * c;
+	return backend.sqrt(total);
+
+###################################
+# Tracked Physics Number
+
+# PhysNum which keeps track of which measurements it depends on (and how much)
+#
+# Can be used anywhere a PhysNum can. Plain PhysNums used with TrackedPhysNums are treated
+# as new (independent) measurements each time they are used - so anything which is used more
+# than once should be made into a TrackedPhysNum first (see track()).
+class TrackedPhysNum(PhysNum):
+	# sensitivities: {Measurement : partial derivative of value with respect to it}
+	__slots__ = ('sens',);
+
+	# helper utility functions for class ---------------
+
+	# create a new number directly from the parts - the uncertainty is found from the sensitivities (when needed)
+	@staticmethod
+	def _createTracked (v, sens, units):
+		num= _newObject(TrackedPhysNum);
+		_setAttr(num, 'v', v);
+		_setAttr(num, 'units', units);
+		_setAttr(num, 'sens', sens);
+		return num;
+
+	# uncertainty - found from the sensitivities the first time it is needed
+	# (and stored in the slot PhysNum uses for it)
+	def _getUncertainty (self):
+		try:
+			return _eSlot.__get__(self, TrackedPhysNum);
+		except AttributeError:
+			e= _uncertainty(self.sens);
+			_eSlot.__set__(self, e);
+			return e;
+
+	e = property(_getUncertainty);
+
+	# get the sensitivities of the given operand (as returned by PhysNum._validateArithArg())
+	@staticmethod
+	def _sensitivities (num):
+		if isinstance(num, TrackedPhysNum):
+			return num.sens;
+		elif num.e:
+			# untracked numbers with uncertainties are new measurements
+			return {Measurement(num.e): getNumericBackend().one};
+		else:
+			# constants
+			return {};
+
+	# class stuff ----------------------------------
+
+	# constructor - a new measurement
+	#	name: (str) name of the measurement (for reporting its contributions to uncertainties)
+	def __init__ (self, value, uncertainty=0, units=None, name=None):
+		e= PhysNum._validateNumArg(uncertainty);
+		_setAttr(self, 'v', PhysNum._validateNumArg(value));
+		_eSlot.__set__(self, e);
+		_setAttr(self, 'units', units);
+
+		if e:
+			_setAttr(self, 'sens', {Measurement(e, name): getNumericBackend().one});
+		else:
+			_setAttr(self, 'sens', {});
+
+	# pickling isn't supported (the measurements would no longer be shared)
+	def __reduce__ (self):
+		raise TypeError, "TrackedPhysNums cannot be pickled";
+
+	# comparisons are by identity - separate measurements with the same readings aren't the same
+	# number (i.e. a - b has an uncertainty, a - a doesn't), so they mustn't be merged by sets/dicts
+	# (such as the leaves of a deferred expression graph)
+	def __eq__ (self, other):
+		return self is other;
+
+	def __ne__ (self, other):
+		return self is not other;
+
+	def __hash__ (self):
+		return id(self);
+
+	def __repr__ (self):
+		return "TrackedPhysNum(%s, %s, %s)" % (self.v, self.e, repr(self.units));
+
+	# getters --------------------------------------
+
+	# get the contribution of each measurement to the uncertainty
+	#	< returns: (list) (measurement, contribution) - largest first
+	def getContributions (self):
+		contributions= [(m, abs(d * m.sigma)) for m, d in self.sens.iteritems()];
+		contributions.sort(key=lambda x: -x[1]);
+		return contributions;
+
+	# assorted number ops ---------------------------
+
+	# get this number with the units changed to the specified ones
+	def convertUnits (self, newUnits):
+		ownUnits = self.units;
+		if not (ownUnits and newUnits):
+			return self;
+		if ownUnits == newUnits:
+			return self;
+		if ownUnits.sameMeasurement(newUnits) == False:
+			return self;
+
+		convFac = getNumericBackend().constant(newUnits.conversionFactor(ownUnits));
+		return TrackedPhysNum._createTracked(self.v * convFac, _scaled(self.sens, convFac), newUnits);
+
+	changeUnits = convertUnits;
+
+	# unary arithmetic operators -------------------------
+
+	# invert the values (i.e. 1/val)
+	def __invert__ (self):
+		if self.v == 0:
+			raise ZeroDivisionError;
+
+		val= getNumericBackend().one / self.v;
+		return TrackedPhysNum._createTracked(val, _scaled(self.sens, -val * val), powerUnits(self.units, -1));
+
+	# arithmetic operators ---------------------------
+
+	# addition/subtraction
+	#	sign: 1 for addition, -1 for subtraction
+	#	reflected: (bool) if True, 'other' is the left operand
+	def _addSub (self, other, sign, reflected=False):
+		other= self._validateArithArg(other);
+		if other is NotImplemented:
+			return other;
+
+		# other number is converted to our units
+		units= self.units;
+		other= other.convertUnits(units);
+
+		backend= getNumericBackend();
+		one, minus = backend.one, -backend.one;
+		if sign > 0:
+			val= self.v + other.v;
+			sens= _combined(self.sens, one, TrackedPhysNum._sensitivities(other), one);
+		elif reflected:
+			val= other.v - self.v;
+			sens= _combined(self.sens, minus, TrackedPhysNum._sensitivities(other), one);
+		else:
+			val= self.v - other.v;
+			sens= _combined(self.sens, one, TrackedPhysNum._sensitivities(other), minus);
+
+		return TrackedPhysNum._createTracked(val, sens, units);
+
+	def __add__ (self, other):
+		return self._addSub(other, 1);
+
+	__radd__ = __add__;
+
+	def __sub__ (self, other):
+		return self._addSub(other, -1);
+
+	def __rsub__ (self, other):
+		return self._addSub(other, -1, True);
+
+	# multiplication
+	#	reflected: (bool) if True, 'other' is the left operand (its units take priority)
+	def _multiply (self, other, reflected=False):
+		other= self._validateArithArg(other, False);
+		if other is NotImplemented:
+			return other;
+
+		if reflected:
+			newUnits, convFac = multiplyUnits(other.units, self.units);
+		else:
+			newUnits, convFac = multiplyUnits(self.units, other.units);
+		fac= getNumericBackend().constant(convFac);
+
+		# d(ab) = b.da + a.db
+		val= self.v * other.v * fac;
+		sens= _combined(self.sens, other.v * fac, TrackedPhysNum._sensitivities(other), self.v * fac);
+		return TrackedPhysNum._createTracked(val, sens, newUnits);
+
+	def __mul__ (self, other):
+		return self._multiply(other);
+
+	def __rmul__ (self, other):
+		return self._multiply(other, True);
+
+	# division
+	#	reflected: (bool) if True, 'other' is the numerator
+	def _divide (self, other, reflected=False):
+		other= self._validateArithArg(other, False);
+		if other is NotImplemented:
+			return other;
+
+		if reflected:
+			a, aSens, b, bSens = other, TrackedPhysNum._sensitivities(other), self, self.sens;
+		else:
+			a, aSens, b, bSens = self, self.sens, other, TrackedPhysNum._sensitivities(other);
+
+		if b.v == 0:
+			raise ZeroDivisionError;
+
+		newUnits, convFac = divideUnits(a.units, b.units);
+		fac= getNumericBackend().constant(convFac);
+
+		# d(a/b) = da/b - (a/b^2).db
+		val= a.v / b.v * fac;
+		sens= _combined(aSens, fac / b.v, bSens, -val / b.v);
+		return TrackedPhysNum._createTracked(val, sens, newUnits);
+
+	def __div__ (self, other):
+		return self._divide(other);
+
+	__truediv__ = __div__;
+
+	def __rdiv__ (self, other):
+		return self._divide(other, True);
+
+	__rtruediv__ = __rdiv__;
+
+	# power operator - raise value to the given (constant) power
+	def __pow__ (self, other, modulo=None):
+		if type(other) not in (int, long):
+			n= PhysNum._validateNumArg(other);
+			if n == int(n):
+				other= int(n);
+
+		if other == 0:
+			return TrackedPhysNum._createTracked(getNumericBackend().one, {}, None);
+
+		if type(other) in (int, long):
+			n= other;
+		elif self.v < 0:
+			raise ValueError, "Cannot raise negative value to non-integer power";
+
+		# d(a^n) = n.a^(n-1).da
+		val= self.v ** n;
+		return TrackedPhysNum._createTracked(val, _scaled(self.sens, n * self.v ** (n - 1)), powerUnits(self.units, other));
+
+	# square-root
+	def sqrt (self):
+		if self.v < 0:
+			raise ValueError, "Cannot take the square-root of a negative value";
+
+		val= getNumericBackend().sqrt(self.v);
+		return TrackedPhysNum._createTracked(val, _scaled(self.sens, 1 / (2 * val)), powerUnits(self.units, Fraction(1, 2)));
+
+	# brute-force math ------------------------------
+
+	# apply the given function to this number
+	#	- uses the derivative of the function if it is known (see registerDerivative()),
+	#	  otherwise it is estimated from f(v+e) and f(v-e)
+	def calcFunc (self, func):
+		val= PhysNum._validateNumArg(func(self.v));
+
+		derivative= getDerivative(func);
+		if derivative is not None:
+			slope= PhysNum._validateNumArg(derivative(self.v));
+		elif self.e:
+			ubound= PhysNum._validateNumArg(func(self.v + self.e));
+			lbound= PhysNum._validateNumArg(func(self.v - self.e));
+			slope= (ubound - lbound) / (2 * self.e);
+		else:
+			slope= 0;
+
+		return TrackedPhysNum._createTracked(val, _scaled(self.sens, slope), self.units);
+
+	# aggregation -----------------------------------
+
+	# sum this and all the given values in one go (used by phys_sum() and phys_average())
+	# 	- adding them one at a time would copy the sensitivities for every partial sum
+	#	< returns: (sum, number of values)
+	def _phys_sumWith (self, values):
+		units= self.units;
+		val= self.v;
+		sens= self.sens.copy();
+		N= 1;
+
+		for other in values:
+			other= self._validateArithArg(other);
+			if other is NotImplemented:
+				raise TypeError, "Cannot add %s to a TrackedPhysNum" % (type(other).__name__);
+			other= other.convertUnits(units);
+
+			val += other.v;
+			_addInto(sens, TrackedPhysNum._sensitivities(other), 1);
+			N += 1;
+
+		return TrackedPhysNum._createTracked(val, _dropZeros(sens), units), N;
+
+	# average, when this is the sum of N values (used by phys_average())
+	def _phys_meanOf (self, N):
+		return self / N;
+
+# slot where the uncertainty is stored (hidden by TrackedPhysNum.e)
+_eSlot = PhysNum.__dict__['e'];
+
+###################################
+# Utilities
+
+# get a tracked version of the given number (as a new measurement)
+def track (num, name=None):
+	if isinstance(num, TrackedPhysNum):
+		return num;
+	return TrackedPhysNum(num.v, num.e, num.units, name);
+
+# get the covariance of two tracked numbers (from the measurements they share)
+def covariance (a, b):
+	total= getNumericBackend().zero;
+
+	# only the shared measurements matter, so go over the smaller set
+	aSens, bSens = a.sens, b.sens;
+	if len(aSens) > len(bSens):
+		aSens, bSens = bSens, aSens;
+	for m, d in aSens.iteritems():
+		if m in bSens:
+			total += d * bSens[m] * m.sigma * m.sigma;
+	return total;
+
+# get the correlation coefficient (-1 to 1) between two tracked numbers
+def correlation (a, b):
+	if not (a.e and b.e):
+		return getNumericBackend().zero;
+	return covariance(a, b) / (a.e * b.e);
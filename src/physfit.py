@@ -0,0 +1,229 @@
+# Fitting curves to measured data (weighted least-squares)
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Requires NumPy
+#
+# The points are weighted by their uncertainties, and the whole fit is done in a single
+# vectorised pass over the data (so millions of points are fine). Uncertainties in x are
+# included using the 'effective variance' method: var = ey^2 + (f'(x) * ex)^2, refitting
+# a few times as f'(x) depends on the fit.
+#
+#	i.e.
+#		fit= fit_linear([x['L'] for x in T_vals], [x['T^2'] for x in T_vals])
+#		print fit.slope, fit.intercept
+
+import numpy
+import math
+
+from phystools import *
+from physarray import PhysNumArray
+
+###################################
+# Helper Utilities
+
+# get the (values, uncertainties, units) columns of the given data
+#	data: (PhysNumArray, list of PhysNums, or array/list of plain numbers - with no uncertainties)
+def _fitColumns (data):
+	if isinstance(data, PhysNumArray):
+		return data.v, data.e, data.units;
+
+	if isinstance(data, numpy.ndarray) == False:
+		data= list(data);
+		if data and isinstance(data[0], PhysNum):
+			data= PhysNumArray.fromPhysNums(data);
+			return data.v, data.e, data.units;
+
+	values= numpy.asarray(data, dtype=numpy.float64);
+	return values, numpy.zeros(len(values)), None;
+
+# get the units (and the factor to convert to them) of the coefficient of x^n in a fit of y against x
+def _coefficientUnits (xUnits, yUnits, n):
+	if (n == 0) or (xUnits is None):
+		return yUnits, 1.0;
+
+	units, convFac = divideUnits(yUnits, powerUnits(xUnits, n));
+	return units, float(convFac);
+
+# solve the weighted least-squares problem for the given design matrix
+#	A: (ndarray) N x M design matrix
+#	y: (ndarray) N values
+#	var: (ndarray) N variances for the values
+#	< returns: (params, covariance, chi-squared)
+def _solve (A, y, var):
+	sw= 1.0 / numpy.sqrt(var);
+	Aw= A * sw[:, numpy.newaxis];
+	yw= y * sw;
+
+	# SVD is used instead of the normal equations, as they are badly conditioned for polynomials
+	U, s, Vt = numpy.linalg.svd(Aw, full_matrices=False);
+	if s[-1] <= s[0] * 1e-14:
+		raise ValueError, "Fit is degenerate (i.e. too few distinct x values)";
+
+	params= Vt.T.dot(U.T.dot(yw) / s);
+	covariance= (Vt.T / (s * s)).dot(Vt);
+
+	residuals= yw - Aw.dot(params);
+	return params, covariance, residuals.dot(residuals);
+
+# get the variances to weight the points by
+#	< returns: (ndarray) variances, or None if no uncertainties were given
+def _variances (ey):
+	if not ey.any():
+		return None;
+	if not ey.all():
+		raise ValueError, "Either all points or none of them should have uncertainties in y";
+	return ey * ey;
+
+###################################
+# Fit Results
+
+# Results of a fit
+class FitResult(object):
+	# class stuff ----------------------------------
+
+	# constructor
+	#	model: (str) "polynomial" or "power law"
+	#	params: (list of PhysNum) fitted parameters
+	#	covariance: (ndarray) covariance matrix of the parameters (in the units of the parameters)
+	#	chiSquared: (float) weighted sum of the squared residuals
+	#	dof: (int) degrees of freedom (points - parameters)
+	def __init__ (self, model, params, covariance, chiSquared, dof):
+		self.model= model;
+		self.params= params;
+		self.covariance= covariance;
+		self.chiSquared= chiSquared;
+		self.dof= dof;
+
+	def __str__ (self):
+		params= ", ".join([str(x) for x in self.params]);
+		return "<%s fit: %s (chi^2/dof = %g)>" % (self.model, params, self.getReducedChiSquared());
+
+	# getters --------------------------------------
+
+	# get the slope of a straight line fit
+	@property
+	def slope (self):
+		return self.params[1];
+
+	# get the intercept of a straight line fit
+	@property
+	def intercept (self):
+		return self.params[0];
+
+	# get chi-squared per degree of freedom (should be around 1 for a good fit with correct uncertainties)
+	def getReducedChiSquared (self):
+		if self.dof <= 0:
+			return float('nan');
+		return self.chiSquared / self.dof;
+
+	# get the correlation coefficient between two of the parameters
+	def getCorrelation (self, i, j):
+		cov= self.covariance;
+		return cov[i, j] / math.sqrt(cov[i, i] * cov[j, j]);
+
+	# evaluate the fitted curve at the given x values (in the same units as the x values which were fitted)
+	#	< returns: (ndarray) y values (in the same units as the y values which were fitted)
+	def evaluate (self, x):
+		x= numpy.asarray(x, dtype=numpy.float64);
+		p= self._rawParams;
+
+		if self.model == "power law":
+			return p[0] * x ** p[1];
+		else:
+			return numpy.polyval(p[::-1], x);
+
+###################################
+# Fitting
+
+# fit a polynomial (y = p0 + p1.x + p2.x^2 + ...) to the given points
+#	x, y: (PhysNumArray, list of PhysNums, or plain numbers) coordinates of the points
+#	degree: (int) degree of the polynomial
+#	xErrors: (bool) include the uncertainties in x in the weights
+#	iterations: (int) number of times to refit, when including the uncertainties in x
+#	< returns: (FitResult) with params [p0, p1, ...], each with the appropriate units
+#
+#	If no uncertainties are given, all points are weighted equally, and the uncertainties
+#	of the parameters are estimated from the scatter of the points about the fit.
+def fit_polynomial (x, y, degree, xErrors=True, iterations=3):
+	xv, xe, xUnits = _fitColumns(x);
+	yv, ye, yUnits = _fitColumns(y);
+	N= len(xv);
+	if len(yv) != N:
+		raise ValueError, "x and y must have the same number of points";
+	if N < degree + 1:
+		raise ValueError, "Need at least %d points for a fit of degree %d" % (degree + 1, degree);
+
+	A= numpy.vander(xv, degree + 1, increasing=True);
+
+	var= _variances(ye);
+	weighted= (var is not None);
+	if var is None:
+		var= numpy.ones(N);
+	params, covariance, chiSquared = _solve(A, yv, var);
+
+	# include the uncertainties in x (these are scaled by the slope of the fit at each point)
+	if xErrors and xe.any() and degree > 0:
+		baseVar= var if weighted else 0.0;
+		weighted= True;
+		dA= numpy.vander(xv, degree, increasing=True) * numpy.arange(1, degree + 1);
+
+		for i in xrange(iterations):
+			slopes= dA.dot(params[1:]);
+			var= baseVar + (slopes * xe) ** 2;
+			if not var.all():
+				raise ValueError, "Points with no uncertainty in y are on a flat part of the fit";
+			params, covariance, chiSquared = _solve(A, yv, var);
+
+	# without any uncertainties, estimate them from the scatter about the fit
+	dof= N - (degree + 1);
+	if (weighted == False) and (dof > 0):
+		covariance= covariance * (chiSquared / dof);
+
+	# express the parameters in the appropriate units for each of them
+	factors= numpy.ones(degree + 1);
+	physParams= [];
+	for n in xrange(degree + 1):
+		units, factors[n] = _coefficientUnits(xUnits, yUnits, n);
+		physParams.append(PhysNum(float(params[n] * factors[n]), float(math.sqrt(covariance[n, n]) * factors[n]), units));
+
+	result= FitResult("polynomial", physParams, covariance * numpy.outer(factors, factors), chiSquared, dof);
+	result._rawParams= params;
+	return result;
+
+# fit a straight line (y = intercept + slope.x) to the given points
+#	other args: see fit_polynomial()
+#	< returns: (FitResult) with params [intercept, slope] - also available as result.intercept and result.slope
+def fit_linear (x, y, xErrors=True, iterations=3):
+	result= fit_polynomial(x, y, 1, xErrors, iterations);
+	result.model= "linear";
+	return result;
+
+# fit a power law (y = A.x^n) to the given points, by fitting a straight line to ln(y) vs ln(x)
+#	- all the values must be positive
+#	other args: see fit_polynomial()
+#	< returns: (FitResult) with params [A, n]
+#
+#	NOTE: as the exponent is only known approximately, A only has units if x has none
+def fit_power_law (x, y, xErrors=True, iterations=3):
+	xv, xe, xUnits = _fitColumns(x);
+	yv, ye, yUnits = _fitColumns(y);
+	if (xv <= 0).any() or (yv <= 0).any():
+		raise ValueError, "Power law fits need positive values";
+
+	lnFit= fit_polynomial(PhysNumArray(numpy.log(xv), xe / xv), PhysNumArray(numpy.log(yv), ye / yv), 1, xErrors, iterations);
+	lnA, n = lnFit._rawParams;
+	cov= lnFit.covariance;
+
+	# A = e^lnA, so its uncertainty is A * (uncertainty of lnA)
+	A= math.exp(lnA);
+	J= numpy.array([A, 1.0]);
+	covariance= cov * numpy.outer(J, J);
+
+	physParams= [
+		PhysNum(A, float(math.sqrt(covariance[0, 0])), (yUnits if xUnits is None else None)),
+		PhysNum(float(n), float(math.sqrt(cov[1, 1])), None),
+	];
+
+	result= FitResult("power law", physParams, covariance, lnFit.chiSquared, lnFit.dof);
+	result._rawParams= numpy.array([A, n]);
+	return result;
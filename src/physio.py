@@ -0,0 +1,676 @@
+# Bulk loading/saving of measurements from CSV/TSV and binary files
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Requires NumPy
+#
+# Text (CSV/TSV) files have a header row naming each column, with the units in brackets,
+# followed by the uncertainties of each quantity in their own columns, i.e.
+#	L (mm), dL, t (s), +/-
+#	612, 1, 67.72, 0.05
+#
+# Uncertainty columns are named "+/-" (or "err", "error", "uncertainty") for the column
+# before them, or "d<name>"/"<name>_err" for the named column. They are assumed to be in the
+# same units as their values. Quantities without an uncertainty column get 0 uncertainty.
+#
+# Binary files store the same columns as rows of little-endian float64 (value, uncertainty)
+# pairs after a small text header, so that huge files can be memory-mapped and sliced
+# without reading all of them (see BinaryDataFile).
+#
+# Collections of PhysNums can also be packed into a compact form (see PackedPhysNums), for
+# sending them to other processes or checkpointing them, without encoding each one separately.
+
+import os
+import re
+import mmap as _mmap
+import numpy
+import decimal
+from decimal import Decimal as D
+
+from phystools import *
+from physarray import PhysNumArray
+
+try:
+	from collections import OrderedDict
+except ImportError:
+	OrderedDict = dict;
+
+###################################
+# Helper Utilities
+
+# names used for uncertainty columns which belong to the column before them
+_ERROR_NAMES = ("+/-", "\xc2\xb1", "err", "error", "uncertainty");
+
+# column header - name (units) or name [units]
+_headerRE = re.compile(r"^\s*(.*?)\s*(?:[\(\[]\s*(.*?)\s*[\)\]])?\s*$");
+
+# get the function used to split lines of text into fields
+#	delimiter: (str) field separator, or None for any whitespace
+def _splitter (delimiter):
+	if delimiter is None:
+		return lambda line: line.split();
+	else:
+		return lambda line: [field.strip() for field in line.split(delimiter)];
+
+# guess the delimiter used by a text file
+def _guessDelimiter (fileN, header):
+	if os.path.splitext(fileN)[1].lower() in (".tsv", ".tab"):
+		return "\t";
+
+	for delimiter in ("\t", ",", ";"):
+		if delimiter in header:
+			return delimiter;
+	return None;
+
+# work out which quantities are stored in which columns, from the header fields
+#	< returns: (list) (name, units, value column, uncertainty column or None) for each quantity
+def _parseHeader (fields):
+	quantities= [];
+	byName= {};
+
+	for index, field in enumerate(fields):
+		name, units = _headerRE.match(field).groups();
+
+		# find the quantity this is the uncertainty for (if any)
+		target= None;
+		if name.lower() in _ERROR_NAMES:
+			if not quantities:
+				raise ValueError, "Uncertainty column '%s' has no values column before it" % (field);
+			target= quantities[-1];
+		elif name.startswith("d") and (name[1:] in byName):
+			target= byName[name[1:]];
+		elif name.endswith("_err") and (name[:-4] in byName):
+			target= byName[name[:-4]];
+
+		if target is not None:
+			if target[3] is not None:
+				raise ValueError, "Quantity '%s' has more than one uncertainty column" % (target[0]);
+			target[3]= index;
+		else:
+			if name in byName:
+				raise ValueError, "Duplicate column '%s'" % (name);
+			quantity= [name, parseUnits(units or ""), index, None];
+			quantities.append(quantity);
+			byName[name]= quantity;
+
+	return [tuple(quantity) for quantity in quantities];
+
+# turn columns of raw values/uncertainties into a list of PhysNums
+#	- with the float backend, the numbers are used directly (instead of going via PhysNum's validation)
+def _physNumList (v, e, units):
+	create= PhysNum._create;
+	if getNumericBackend().name == "float":
+		return [create(a, b, units) for a, b in zip(v.tolist(), e.tolist())];
+	else:
+		number= getNumericBackend().number;
+		return [create(number(a), number(b), units) for a, b in zip(v.tolist(), e.tolist())];
+
+# collect the quantities from a 2D table of numbers
+#	< returns: (OrderedDict) name : PhysNumArray or list of PhysNums
+def _collectColumns (table, quantities, asArrays):
+	result= OrderedDict();
+	for name, units, vi, ei in quantities:
+		v= table[:, vi];
+		e= table[:, ei] if (ei is not None) else numpy.zeros(len(v));
+
+		if asArrays:
+			result[name]= PhysNumArray(v, e, units);
+		else:
+			result[name]= _physNumList(v, e, units);
+	return result;
+
+###################################
+# Text Files
+
+# open a text data file, and read its header
+#	< returns: (file, quantities, delimiter, split func)
+def _openText (fileN, delimiter):
+	f= open(fileN, 'rU');
+
+	# header is the first line which isn't blank or a comment
+	for header in f:
+		if header.strip() and not header.lstrip().startswith("#"):
+			break;
+	else:
+		f.close();
+		raise ValueError, "%s: no header found" % (fileN);
+
+	if delimiter is None:
+		delimiter= _guessDelimiter(fileN, header);
+	split= _splitter(delimiter);
+
+	return f, _parseHeader(split(header.strip("\r\n"))), delimiter, split;
+
+# parse the given lines of text into a 2D table of floats
+#	- the numbers are parsed in bulk by NumPy, instead of one field at a time
+def _parseLines (lines, delimiter, numColumns):
+	lines= [line for line in lines if line.strip() and not line.lstrip().startswith("#")];
+	if not lines:
+		return numpy.empty((0, numColumns));
+
+	text= "".join(lines);
+	if delimiter is not None:
+		text= text.replace(delimiter, " ");
+
+	# parsing stops at the first invalid field, so check that everything was used
+	table= numpy.fromstring(text, dtype=numpy.float64, sep=" ");
+	if len(table) != len(lines) * numColumns:
+		raise ValueError, "Invalid number, or rows with the wrong number of columns";
+	return table.reshape((len(lines), numColumns));
+
+# read all the columns from a CSV/TSV file
+#	delimiter: (str) field separator - if not given, it is guessed from the file extension/header
+#	asArrays: (bool) return PhysNumArrays if True, otherwise lists of PhysNums
+#	< returns: (OrderedDict) name : PhysNumArray (or list of PhysNums) for each quantity
+def read_text (fileN, delimiter=None, asArrays=True):
+	f, quantities, delimiter, split = _openText(fileN, delimiter);
+	try:
+		numColumns= sum([(2 if q[3] is not None else 1) for q in quantities]);
+
+		if (asArrays == False) and (getNumericBackend().name == "decimal"):
+			# keep the exact decimal values as written
+			rows= [split(line) for line in f if line.strip() and not line.lstrip().startswith("#")];
+			if [row for row in rows if len(row) != numColumns]:
+				raise ValueError, "Rows with the wrong number of columns";
+			create= PhysNum._create;
+
+			result= OrderedDict();
+			for name, units, vi, ei in quantities:
+				if ei is not None:
+					result[name]= [create(D(row[vi]), D(row[ei]), units) for row in rows];
+				else:
+					zero= D(0);
+					result[name]= [create(D(row[vi]), zero, units) for row in rows];
+			return result;
+		else:
+			return _collectColumns(_parseLines(f, delimiter, numColumns), quantities, asArrays);
+	finally:
+		f.close();
+
+# read the columns from a CSV/TSV file in chunks, so that files too large to fit in memory can be processed
+#	chunkRows: (int) number of rows to read at a time
+#	< returns: (generator) OrderedDict of name : PhysNumArray for each chunk
+def iter_text (fileN, chunkRows=100000, delimiter=None):
+	f, quantities, delimiter, split = _openText(fileN, delimiter);
+	try:
+		numColumns= sum([(2 if q[3] is not None else 1) for q in quantities]);
+
+		lines= [];
+		for line in f:
+			lines.append(line);
+			if len(lines) == chunkRows:
+				yield _collectColumns(_parseLines(lines, delimiter, numColumns), quantities, True);
+				lines= [];
+
+		if lines:
+			yield _collectColumns(_parseLines(lines, delimiter, numColumns), quantities, True);
+	finally:
+		f.close();
+
+# write the given quantities to a CSV/TSV file
+#	columns: (list of (name, PhysNumArray or list of PhysNums)) or OrderedDict of them
+def write_text (fileN, columns, delimiter=","):
+	if hasattr(columns, 'items'):
+		columns= columns.items();
+	columns= [(name, _asArray(data)) for name, data in columns];
+
+	f= open(fileN, 'w');
+
+	header= [];
+	for name, arr in columns:
+		units= arr.getUnits();
+		header.append(("%s (%s)" % (name, units)) if (units and str(units)) else name);
+		header.append("d%s" % (name));
+	f.write(delimiter.join(header) + "\n");
+
+	table= numpy.column_stack([col for name, arr in columns for col in (arr.v, arr.e)]) if columns else numpy.empty((0, 0));
+	numpy.savetxt(f, table, fmt="%r", delimiter=delimiter);
+
+	f.close();
+
+###################################
+# Binary Files
+
+# identifier at the start of binary data files
+_BINARY_MAGIC = "PHYSCOL\x01";
+
+# get the given data as a PhysNumArray
+def _asArray (data):
+	if isinstance(data, PhysNumArray):
+		return data;
+	else:
+		return PhysNumArray.fromPhysNums(list(data));
+
+# get the record type used for rows with the given number of quantities
+def _rowType (numColumns):
+	fields= [];
+	for i in xrange(numColumns):
+		fields.append(("v%d" % i, "<f8"));
+		fields.append(("e%d" % i, "<f8"));
+	return numpy.dtype(fields);
+
+# get the header for a binary file with the given quantities (padded to keep the rows aligned)
+def _binaryHeader (names, units):
+	text= "".join(["%s\t%s\n" % (name, (str(u) if u else "")) for name, u in zip(names, units)]);
+
+	size= len(_BINARY_MAGIC) + 8 + len(text);
+	text += " " * (-size % 8);
+
+	return _BINARY_MAGIC + ("%08x" % len(text)) + text;
+
+# get the rows of a binary file for the given columns
+def _binaryRows (columns):
+	arrays= [arr for name, arr in columns];
+	N= len(arrays[0]);
+	if [a for a in arrays if len(a) != N]:
+		raise ValueError, "All columns must have the same length";
+
+	rows= numpy.empty(N, dtype=_rowType(len(arrays)));
+	for i, arr in enumerate(arrays):
+		rows["v%d" % i]= arr.v;
+		rows["e%d" % i]= arr.e;
+	return rows;
+
+# write the given quantities to a binary data file
+#	columns: (list of (name, PhysNumArray or list of PhysNums)) or OrderedDict of them
+def write_binary (fileN, columns):
+	if hasattr(columns, 'items'):
+		columns= columns.items();
+	columns= [(name, _asArray(data)) for name, data in columns];
+
+	for name, arr in columns:
+		if ("\t" in name) or ("\n" in name):
+			raise ValueError, "Column names cannot contain tabs or newlines";
+
+	f= open(fileN, 'wb');
+	f.write(_binaryHeader([name for name, arr in columns], [arr.getUnits() for name, arr in columns]));
+	_binaryRows(columns).tofile(f);
+	f.close();
+
+# add more rows to the end of an existing binary data file (i.e. during data acquisition)
+#	columns: as for write_binary() - must be the same quantities, in the same order, with the same units
+def append_binary (fileN, columns):
+	if hasattr(columns, 'items'):
+		columns= columns.items();
+	columns= [(name, _asArray(data)) for name, data in columns];
+
+	data= BinaryDataFile(fileN, mmap=False, load=False);
+	if data.names != [name for name, arr in columns]:
+		raise ValueError, "Columns don't match those in the file";
+
+	# convert to the file's units where needed
+	columns= [(name, arr.convertUnits(units)) for (name, arr), units in zip(columns, data.units)];
+
+	f= open(fileN, 'ab');
+	_binaryRows(columns).tofile(f);
+	f.close();
+
+# Binary data file - column access to a binary file of measurements
+#
+# By default, the file is memory-mapped, so that only the parts of it which are used
+# get read from disk (allowing files larger than the available memory to be used).
+#
+#	i.e.
+#		data= BinaryDataFile("log.bin")
+#		t= data.column("t", 1000000, 2000000)	# PhysNumArray for those rows only
+#		first= data[:100]						# OrderedDict of PhysNumArrays
+class BinaryDataFile(object):
+	# class stuff ----------------------------------
+
+	# open the given file
+	#	mmap: (bool) memory-map the file instead of reading all of it into memory
+	#	load: (bool) set up access to the rows (otherwise, only the header is read)
+	def __init__ (self, fileN, mmap=True, load=True):
+		self.fileN= fileN;
+
+		f= open(fileN, 'rb');
+		magic= f.read(len(_BINARY_MAGIC));
+		if magic != _BINARY_MAGIC:
+			f.close();
+			raise ValueError, "%s: not a binary data file" % (fileN);
+
+		size= int(f.read(8), 16);
+		header= f.read(size);
+		f.close();
+
+		# quantities stored
+		self.names= [];
+		self.units= [];
+		for line in header.split("\n"):
+			if line.strip():
+				name, units = line.split("\t");
+				self.names.append(name);
+				self.units.append(parseUnits(units.strip()));
+		self._indices= dict([(name, i) for i, name in enumerate(self.names)]);
+
+		# rows
+		rowType= _rowType(len(self.names));
+		offset= len(_BINARY_MAGIC) + 8 + size;
+		N= (os.path.getsize(fileN) - offset) // rowType.itemsize;	# ignore any partly-written row at the end
+
+		if (load == False) or (N == 0):
+			self.rows= numpy.empty(0, dtype=rowType);
+		elif mmap:
+			self.rows= numpy.memmap(fileN, dtype=rowType, mode='r', offset=offset, shape=(N,));
+		else:
+			f= open(fileN, 'rb');
+			f.seek(offset);
+			self.rows= numpy.fromfile(f, dtype=rowType, count=N);
+			f.close();
+
+	def __repr__ (self):
+		return "<BinaryDataFile '%s' - %d rows of %s>" % (self.fileN, len(self), ", ".join(self.names));
+
+	def __len__ (self):
+		return len(self.rows);
+
+	# release the file (any arrays got from it stay valid)
+	def close (self):
+		self.rows= numpy.empty(0, dtype=self.rows.dtype);
+
+	# access ---------------------------------------
+
+	# get the given rows of a single quantity
+	#	start, stop, step: range of rows to get (as for slicing) - all of them by default
+	#	< returns: (PhysNumArray) values for those rows (copied from the file)
+	def column (self, name, start=None, stop=None, step=None):
+		try:
+			i= self._indices[name];
+		except KeyError:
+			raise KeyError, "No column '%s'" % (name);
+
+		rows= self.rows[start:stop:step];
+		return PhysNumArray(rows["v%d" % i], rows["e%d" % i], self.units[i]);
+
+	# get a single quantity by name (as PhysNumArray), or a range of rows for all of them (as OrderedDict)
+	def __getitem__ (self, key):
+		if isinstance(key, basestring):
+			return self.column(key);
+		elif isinstance(key, slice):
+			return OrderedDict([(name, self.column(name, key.start, key.stop, key.step)) for name in self.names]);
+		else:
+			raise TypeError, "Column name or slice of rows expected";
+
+	# get all the quantities
+	#	asArrays: (bool) return PhysNumArrays if True, otherwise lists of PhysNums
+	def columns (self, asArrays=True):
+		result= self[:];
+		if asArrays == False:
+			for name, arr in result.items():
+				result[name]= _physNumList(arr.v, arr.e, arr.units);
+		return result;
+
+# read all the columns from a binary data file
+#	< returns: (OrderedDict) name : PhysNumArray (or list of PhysNums) for each quantity
+def read_binary (fileN, asArrays=True):
+	return BinaryDataFile(fileN, mmap=False).columns(asArrays);
+
+# convert a CSV/TSV file into a binary data file, a chunk at a time (so it can be larger than memory)
+def text_to_binary (textFileN, binaryFileN, chunkRows=100000, delimiter=None):
+	first= True;
+	for chunk in iter_text(textFileN, chunkRows, delimiter):
+		if first:
+			write_binary(binaryFileN, chunk);
+			first= False;
+		else:
+			append_binary(binaryFileN, chunk);
+
+	if first:
+		raise ValueError, "%s: no data found" % (textFileN);
+
+###################################
+# Packed Collections
+
+# identifier at the start of packed collections
+_PACKED_MAGIC = "PHYSPAK\x01";
+
+# pad the given size up to a multiple of 8 bytes (so that the columns stay aligned)
+def _padding (size):
+	return -size % 8;
+
+# can the parts of Decimals be used directly? (only with the pure Python decimal module)
+_DECIMAL_PARTS = hasattr(D(1), '_int') and hasattr(decimal, '_dec_from_triple');
+
+# get the columns for the given Decimals - (digits, exponents), so that they can be rebuilt quickly
+#	- with the pure Python decimal module, the parts of the Decimals are used directly, as going via
+#	  strings is much slower (otherwise, as_tuple() is used)
+#	< returns: (list of str) digits (with "-" in front for negative numbers), and (ndarray) exponents
+#			   - or the numbers as text and None, if there are any special values (NaN/Infinity)
+def _decimalColumns (numbers):
+	if [x for x in numbers if not x.is_finite()]:
+		return [str(x) for x in numbers], None;
+
+	if _DECIMAL_PARTS:
+		digits= [(("-" + x._int) if x._sign else x._int) for x in numbers];
+		exps= numpy.fromiter((x._exp for x in numbers), numpy.int32, len(numbers));
+	else:
+		parts= [x.as_tuple() for x in numbers];
+		digits= [(("-" if sign else "") + "".join(map(str, d))) for sign, d, exp in parts];
+		exps= numpy.fromiter((exp for sign, d, exp in parts), numpy.int32, len(numbers));
+	return digits, exps;
+
+# get the Decimals from their columns (see _decimalColumns())
+def _decimals (digits, exps):
+	if exps is None:
+		return [D(x) for x in digits];
+
+	if _DECIMAL_PARTS:
+		make= decimal._dec_from_triple;
+		return [(make(1, x[1:], exp) if (x[0] == "-") else make(0, x, exp)) for x, exp in zip(digits, exps.tolist())];
+	else:
+		return [D("%sE%d" % (x, exp)) for x, exp in zip(digits, exps.tolist())];
+
+# Packed collection of PhysNums - compact form for sending to other processes, or saving to disk
+#
+# Instead of encoding each PhysNum (and its Decimals) separately, as pickle does, the values and
+# uncertainties are stored as columns, along with a table of the different units used, and the
+# index into that table for each number. The whole collection becomes a single string (toBytes()),
+# and the columns are used in place when it is read back (fromBytes() - no copying), so it can be
+# passed between processes (or memory-mapped from disk - see read_packed()) in one piece.
+#
+# Numbers from the float backend (and PhysNumArrays) are stored as float64 columns. Decimals are
+# stored as their digits and exponents instead, so that they are kept exactly.
+#
+# NOTE: units are stored by their symbols (as in binary data files), so dummy units become None
+#
+#	i.e.
+#		conn.send_bytes(pack_physnums(results).toBytes());
+#		...
+#		results= PackedPhysNums.fromBytes(conn.recv_bytes()).unpack();
+class PackedPhysNums(object):
+	# class stuff ----------------------------------
+
+	# constructor - see pack_physnums()
+	#	kind: (str) "float" or "decimal" - type of the numbers
+	#	units: (list) the different units used
+	#	v, e: values and uncertainties (ndarray of float64 for "float", or (digits, exponents) for
+	#		  "decimal" - see _decimalColumns())
+	#	unitIndex: (ndarray) index into units for each number - or None if they all have the first units
+	def __init__ (self, kind, units, v, e, unitIndex=None):
+		self.kind= kind;
+		self.units= units;
+		self.v= v;
+		self.e= e;
+		self.unitIndex= unitIndex;
+
+	def __repr__ (self):
+		return "<PackedPhysNums - %d %s numbers, %d units>" % (len(self), self.kind, len(self.units));
+
+	def __len__ (self):
+		if self.kind == "decimal":
+			return len(self.v[0]);
+		return len(self.v);
+
+	# pickling support - as a single string, which is used in place when unpickled
+	def __reduce__ (self):
+		return (_packedFromBytes, (self.toBytes(),));
+
+	# access ---------------------------------------
+
+	# get the units of each of the numbers
+	def _unitsList (self):
+		if self.unitIndex is None:
+			return [self.units[0]] * len(self);
+
+		units= self.units;
+		return [units[i] for i in self.unitIndex.tolist()];
+
+	# get the numbers as a list of PhysNums (using the current numeric backend)
+	def unpack (self):
+		create= PhysNum._create;
+		backend= getNumericBackend();
+		if self.kind == "float":
+			if self.unitIndex is None:
+				return _physNumList(self.v, self.e, self.units[0]);
+			v, e = self.v.tolist(), self.e.tolist();
+		else:
+			v, e = _decimals(*self.v), _decimals(*self.e);
+			if backend.name == "decimal":
+				return [create(a, b, units) for a, b, units in zip(v, e, self._unitsList())];
+
+		number= backend.number;
+		return [create(number(a), number(b), units) for a, b, units in zip(v, e, self._unitsList())];
+
+	# get the numbers as a PhysNumArray (converted to the units of the first one)
+	#	- the columns are used directly (without copying) when they are floats with the same units
+	def toArray (self):
+		if (self.kind == "float") and (self.unitIndex is None):
+			return PhysNumArray(self.v, self.e, self.units[0]);
+		return PhysNumArray.fromPhysNums(self.unpack());
+
+	# serialization --------------------------------
+
+	# get the parts of the serialized form, in order (header, then each column padded to 8 bytes)
+	def _parts (self):
+		if self.kind == "float":
+			columns= [("v", "<f8", self.v), ("e", "<f8", self.e)];
+		else:
+			columns= [];
+			for name, (digits, exps) in (("v", self.v), ("e", self.e)):
+				columns.append((name, "text", ",".join(digits)));
+				if exps is not None:
+					columns.append((name + "x", "<i4", exps));
+		if self.unitIndex is not None:
+			columns.append(("u", self.unitIndex.dtype.str, self.unitIndex));
+
+		data= [];
+		for name, dtype, column in columns:
+			if dtype != "text":
+				column= buffer(numpy.ascontiguousarray(column, dtype=dtype));
+			data.append((name, dtype, column));
+
+		text= "kind\t%s\ncount\t%d\nunits\t%s\n" % (self.kind, len(self), "\t".join([(str(u) if u else "") for u in self.units]));
+		text += "".join(["column\t%s\t%s\t%d\n" % (name, dtype, len(column)) for name, dtype, column in data]);
+		text += " " * _padding(len(_PACKED_MAGIC) + 8 + len(text));
+
+		parts= [_PACKED_MAGIC + ("%08x" % len(text)) + text];
+		for name, dtype, column in data:
+			parts.append(column);
+			parts.append("\0" * _padding(len(column)));
+		return parts;
+
+	# get the serialized form of the collection
+	#	< returns: (str)
+	def toBytes (self):
+		return "".join([str(part) for part in self._parts()]);
+
+	# get the collection from its serialized form
+	#	data: (str, buffer or mmap) - the columns are used in place, so this must not be changed afterwards
+	@staticmethod
+	def fromBytes (data):
+		if data[:len(_PACKED_MAGIC)] != _PACKED_MAGIC:
+			raise ValueError, "Not a packed collection of PhysNums";
+
+		start= len(_PACKED_MAGIC);
+		size= int(data[start:start+8], 16);
+		offset= start + 8 + size;
+
+		kind, units, columns, N = None, None, {}, 0;
+		for line in data[start+8:offset].split("\n"):
+			fields= line.split("\t");
+			if fields[0] == "kind":
+				kind= fields[1];
+			elif fields[0] == "count":
+				N= int(fields[1]);
+			elif fields[0] == "units":
+				units= [parseUnits(text.strip()) for text in fields[1:]];
+			elif fields[0] == "column":
+				name, dtype, nbytes = fields[1], fields[2], int(fields[3]);
+				if dtype == "text":
+					text= str(data[offset:offset+nbytes]);
+					columns[name]= text.split(",") if N else [];
+				else:
+					columns[name]= numpy.frombuffer(data, dtype=dtype, count=nbytes // numpy.dtype(dtype).itemsize, offset=offset);
+				offset += nbytes + _padding(nbytes);
+
+		if (kind not in ("float", "decimal")) or (units is None):
+			raise ValueError, "Packed collection is incomplete";
+		
+		v, e = columns['v'], columns['e'];
+		if kind == "decimal":
+			v, e = (v, columns.get('vx')), (e, columns.get('ex'));
+		return PackedPhysNums(kind, units, v, e, columns.get('u'));
+
+# get a packed collection from its serialized form (for unpickling)
+def _packedFromBytes (data):
+	return PackedPhysNums.fromBytes(data);
+
+# pack the given numbers into a compact collection (see PackedPhysNums)
+#	values: (PhysNumArray, or list of PhysNums)
+#	< returns: (PackedPhysNums)
+def pack_physnums (values):
+	if isinstance(values, PhysNumArray):
+		return PackedPhysNums("float", [values.units], values.v, values.e);
+
+	values= list(values);
+	N= len(values);
+
+	# table of units used
+	table= {};
+	units= [];
+	for num in values:
+		if num.units not in table:
+			table[num.units]= len(units);
+			units.append(num.units);
+
+	if len(units) > 1:
+		dtype= numpy.uint16 if (len(units) <= 0xffff) else numpy.uint32;
+		unitIndex= numpy.fromiter((table[num.units] for num in values), dtype, N);
+	else:
+		unitIndex= None;
+		if not units:
+			units= [None];
+
+	# columns
+	if N and (type(values[0].v) is D):
+		v= _decimalColumns([num.v for num in values]);
+		e= _decimalColumns([num.e for num in values]);
+		return PackedPhysNums("decimal", units, v, e, unitIndex);
+	else:
+		v= numpy.fromiter((num.v for num in values), numpy.float64, N);
+		e= numpy.fromiter((num.e for num in values), numpy.float64, N);
+		return PackedPhysNums("float", units, v, e, unitIndex);
+
+# write the given numbers to a file in packed form (see PackedPhysNums)
+#	values: (PackedPhysNums, PhysNumArray or list of PhysNums)
+def write_packed (fileN, values):
+	if isinstance(values, PackedPhysNums) == False:
+		values= pack_physnums(values);
+
+	f= open(fileN, 'wb');
+	for part in values._parts():
+		f.write(part);
+	f.close();
+
+# read numbers from a packed file
+#	mmap: (bool) memory-map the file, so that the columns are used straight from it (instead of reading it all in)
+#	< returns: (PackedPhysNums) - use unpack() or toArray() to get the numbers
+def read_packed (fileN, mmap=True):
+	f= open(fileN, 'rb');
+	try:
+		if mmap and os.path.getsize(fileN):
+			data= _mmap.mmap(f.fileno(), 0, access=_mmap.ACCESS_READ);
+		else:
+			data= f.read();
+	finally:
+		f.close();
+	return PackedPhysNums.fromBytes(data);
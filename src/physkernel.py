@@ -0,0 +1,396 @@
+# Compiling PhysNum formulas into vectorised kernels
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Requires NumPy
+#
+# A formula (i.e. calc_n) is traced once with placeholder inputs, using the deferred
+# evaluation graph from physlazy, giving the list of operations it performs. All of the
+# unit handling (result units, conversion factors) and any parts which don't depend on
+# the inputs (i.e. 8*pi) are worked out then, leaving a flat list of instructions on
+# plain value/uncertainty columns. Applying the formula to whole arrays of inputs then
+# only costs a few NumPy operations for each step (and no PhysNums are created for the
+# individual entries).
+#
+# Kernels are cached for each formula and set of input units, so the tracing is only
+# done the first time the formula is used with each of them.
+#
+#	i.e.
+#		@compiled
+#		def calc_n (Inertia, Slope, radius):
+#			return (Inertia * (D(8) * DTools.pi())) / (Slope * radius**4);
+#
+#		n= calc_n(I, S, r)		# PhysNumArrays (or lists of PhysNums) -> PhysNumArray
+#
+# NOTE: as the formula is only traced once, it must do the same operations whatever the
+#		values of its inputs (i.e. no 'if x.getValue() > 0' branches)
+
+import math
+import operator
+import functools
+
+import numpy
+
+import physlazy
+from phystools import *
+from physarray import PhysNumArray, _unitFactor, _fractional, _raises
+
+###################################
+# Kernel Operations
+#
+# Each works on registers of [values, uncertainties, fractional uncertainties or None],
+# following the same rules as the PhysNumArray operators. Fractional uncertainties are
+# kept when they are known anyway, so chains of products don't need to recalculate them.
+
+# get the fractional uncertainties for a register (working them out the first time they're needed)
+def _frac (r):
+	if r[2] is not None:
+		return r[2];
+
+	# only need to worry about zero values if there are some
+	v= r[0];
+	if numpy.all(v):
+		r[2]= r[1] / v;
+	else:
+		r[2]= _fractional(v, r[1]);
+	return r[2];
+
+# raise the values to an integer power, by repeated squaring
+#	- NumPy's own power function is much slower for these
+def _intPower (v, n):
+	if n < 0:
+		return 1.0 / _intPower(v, -n);
+
+	result= None;
+	while n:
+		if n & 1:
+			result= v if (result is None) else (result * v);
+		n >>= 1;
+		if n:
+			v= v * v;
+	return result;
+
+def _opAdd (a, b, fac):
+	if fac != 1.0:
+		return [a[0] + b[0] * fac, a[1] + b[1] * fac, None];
+	return [a[0] + b[0], a[1] + b[1], None];
+
+def _opSub (a, b, fac):
+	if fac != 1.0:
+		return [a[0] - b[0] * fac, a[1] + b[1] * fac, None];
+	return [a[0] - b[0], a[1] + b[1], None];
+
+def _opMul (a, b, fac):
+	v= a[0] * b[0];
+	if fac != 1.0:
+		v *= fac;
+	f= _frac(a) + _frac(b);
+	return [v, f * v, f];
+
+def _opDiv (a, b, fac):
+	if _raises('divide') and not numpy.all(b[0]):
+		raise ZeroDivisionError;
+
+	v= a[0] / b[0];
+	if fac != 1.0:
+		v *= fac;
+	f= _frac(a) + _frac(b);
+	return [v, f * v, f];
+
+def _opPow (a, n):
+	if (type(n) not in (int, long)) and _raises('invalid') and numpy.any(a[0] < 0):
+		raise ValueError, "Cannot raise negative value to non-integer power";
+	if (n < 0) and _raises('divide') and not numpy.all(a[0]):
+		raise ZeroDivisionError;
+
+	if type(n) in (int, long):
+		v= _intPower(a[0], n);
+	else:
+		v= a[0] ** n;
+	return [v, numpy.abs(n * _frac(a) * v), None];
+
+def _opInvert (a):
+	if _raises('divide') and not numpy.all(a[0]):
+		raise ZeroDivisionError;
+
+	v= 1.0 / a[0];
+	f= _frac(a);
+	return [v, f * v, f];
+
+def _opSqrt (a):
+	if _raises('invalid') and numpy.any(a[0] < 0):
+		raise ValueError, "Cannot take the square-root of a negative value";
+
+	v= numpy.sqrt(a[0]);
+	return [v, numpy.abs(_frac(a) * v) / 2, None];
+
+def _opConvert (a, fac):
+	return [a[0] * fac, a[1] * fac, a[2]];
+
+def _opMeanOf (a, N):
+	return [a[0] / N, a[1] / math.sqrt(N), None];
+
+def _opCalcFunc (a, func, units):
+	result= PhysNumArray(a[0], a[1], units).calcFunc(func);
+	return [result.v, result.e, None];
+
+###################################
+# Kernels
+
+# Compiled version of a formula, for one set of input units
+class Kernel(object):
+	# class stuff ----------------------------------
+
+	# constructor
+	#	numInputs: (int) number of input registers
+	#	constants: (list) registers for the constants, which follow the inputs
+	#	instructions: (list) (op, input registers, extra args) - each puts its result in the next register
+	#	outputs: (list) (register, units) for each result
+	#	multiple: (type) type of sequence the results are returned as (None for a single result)
+	def __init__ (self, numInputs, constants, instructions, outputs, multiple=None):
+		self.numInputs= numInputs;
+		self.constants= constants;
+		self.instructions= instructions;
+		self.outputs= outputs;
+		self.multiple= multiple;
+
+	def __repr__ (self):
+		return "<Kernel - %d inputs, %d instructions>" % (self.numInputs, len(self.instructions));
+
+	# evaluate the formula for the given input columns
+	#	inputs: (list) (values, uncertainties) for each input
+	#	< returns: (PhysNumArray, or sequence of them)
+	def __call__ (self, inputs):
+		registers= [[v, e, None] for v, e in inputs] + self.constants;
+		append= registers.append;
+
+		for op, args, extra in self.instructions:
+			append(op(*([registers[i] for i in args] + extra)));
+
+		# make sure any constant results are the same length as the inputs
+		shape= numpy.broadcast(*([v for v, e in inputs] + [0])).shape;
+
+		results= [];
+		for i, units in self.outputs:
+			v, e = registers[i][:2];
+			results.append(PhysNumArray(numpy.broadcast_to(v, shape), numpy.broadcast_to(e, shape), units));
+
+		if self.multiple is None:
+			return results[0];
+		return self.multiple(results);
+
+# ---
+
+# node types which can be compiled, and the kernel operation for each
+_binaryOps = {
+	operator.add: _opAdd,
+	operator.sub: _opSub,
+	operator.mul: _opMul,
+	operator.div: _opDiv,
+};
+
+# get the units of the result of a node (as found when tracing)
+def _nodeUnits (node):
+	if isinstance(node.value, PhysNum):
+		return node.value.getUnits();
+	return None;
+
+# get the register for a node which doesn't depend on any of the inputs
+def _constantRegister (value):
+	if isinstance(value, PhysNum):
+		v, e = float(value.getValue()), float(value.getUncertainty_Absolute());
+	else:
+		v, e = float(value), 0.0;
+	return [v, e, _fractional(v, e)];
+
+# get the nodes of the graph needed for the given results, inputs first
+def _nodeOrder (outputs):
+	order= [];
+	done= set();
+	stack= list(outputs);
+	while stack:
+		node= stack[-1];
+		if node in done:
+			stack.pop();
+			continue;
+
+		pending= [arg for arg in node.args if arg not in done];
+		if pending:
+			stack.extend(pending);
+			continue;
+
+		stack.pop();
+		done.add(node);
+		order.append(node);
+	return order;
+
+# compile a traced formula into a kernel
+#	placeholders: (list of LazyPhysNum) input nodes
+#	outputs: (list of LazyPhysNum) result nodes (already evaluated)
+def _compileGraph (placeholders, outputs, multiple):
+	registers= {};		# node : register index
+	dependent= set();	# nodes which depend on the inputs
+	for i, node in enumerate(placeholders):
+		registers[node]= i;
+		dependent.add(node);
+
+	order= _nodeOrder(outputs);
+
+	# constants (leaves, and anything which only depends on them) go after the inputs
+	constants= [];
+	for node in order:
+		if node in registers:
+			continue;
+		if (node.op is None) or not [arg for arg in node.args if arg in dependent]:
+			if node.op is not None:
+				# only needed for the result of this node
+				continue;
+			registers[node]= len(placeholders) + len(constants);
+			constants.append(_constantRegister(node.value));
+		else:
+			dependent.add(node);
+
+	# operations which only depend on constants are folded into constants
+	for node in order:
+		if (node not in registers) and (node not in dependent):
+			registers[node]= len(placeholders) + len(constants);
+			constants.append(_constantRegister(node.value));
+
+	# instructions for everything else
+	instructions= [];
+	nextRegister= len(placeholders) + len(constants);
+	for node in order:
+		if node in registers:
+			continue;
+
+		op= node.op;
+		args= [registers[arg] for arg in node.args];
+		if op in _binaryOps and (len(node.args) == 2):
+			a, b = node.args;
+			units= _nodeUnits(node);
+			if op in (operator.add, operator.sub):
+				fac= _unitFactor(_nodeUnits(b), _nodeUnits(a));
+			elif op is operator.mul:
+				fac= float(multiplyUnits(_nodeUnits(a), _nodeUnits(b))[1]);
+			else:
+				fac= float(divideUnits(_nodeUnits(a), _nodeUnits(b))[1]);
+			instructions.append((_binaryOps[op], args, [fac]));
+		elif op is operator.pow:
+			a, b = node.args;
+			if b in dependent:
+				raise TypeError, "Cannot compile powers which depend on the inputs";
+			n= b.value;
+			if isinstance(n, PhysNum):
+				n= n.getValue();
+			n= int(n) if (n == int(n)) else float(n);
+			instructions.append((_opPow, args[:1], [n]));
+		elif op is operator.invert:
+			instructions.append((_opInvert, args, []));
+		elif op is physlazy._meanOf:
+			instructions.append((_opMeanOf, args, [node.extra[0]]));
+		elif op is physlazy._callMethod:
+			method= node.extra[0];
+			if method == 'sqrt':
+				instructions.append((_opSqrt, args, []));
+			elif method in ('convertUnits', 'changeUnits'):
+				fac= _unitFactor(_nodeUnits(node.args[0]), node.extra[1]);
+				instructions.append((_opConvert, args, [fac]));
+			elif method == 'calcFunc':
+				instructions.append((_opCalcFunc, args, [node.extra[1], _nodeUnits(node.args[0])]));
+			else:
+				raise TypeError, "Cannot compile '%s()'" % (method);
+		else:
+			raise TypeError, "Cannot compile operation %s" % (repr(node));
+
+		registers[node]= nextRegister;
+		nextRegister += 1;
+
+	return Kernel(len(placeholders), constants, instructions, [(registers[node], _nodeUnits(node)) for node in outputs], multiple);
+
+###################################
+# API
+
+# get the (values, uncertainties, units) of an argument, if it is an input to be compiled
+#	< returns: None for other arguments (constants)
+def _inputColumns (arg):
+	if isinstance(arg, PhysNumArray):
+		return arg.v, arg.e, arg.units;
+	elif isinstance(arg, PhysNum):
+		return numpy.float64(arg.getValue()), numpy.float64(arg.getUncertainty_Absolute()), arg.getUnits();
+	elif isinstance(arg, (list, tuple)) and arg and isinstance(arg[0], PhysNum):
+		arg= PhysNumArray.fromPhysNums(arg);
+		return arg.v, arg.e, arg.units;
+	return None;
+
+# values the inputs are given when tracing - only the units of each step are needed from the trace,
+# so these just need to be somewhere the formula can be evaluated (the next is tried if it can't)
+_TRACE_VALUES = (1.0, 0.5, 2.0);
+
+# trace the given formula, and compile it for the given inputs
+#	columns: (list) (values, uncertainties, units) for each input, or None for constants
+#	kwargs: (dict) keyword arguments for the formula (constants)
+def compile_formula (func, args, columns, kwargs=None):
+	for value in _TRACE_VALUES:
+		try:
+			return _traceFormula(func, args, columns, kwargs or {}, value);
+		except (ArithmeticError, ValueError):
+			if value == _TRACE_VALUES[-1]:
+				raise;
+
+# trace the formula with all of the inputs set to the given value (without uncertainty), and compile it
+def _traceFormula (func, args, columns, kwargs, value):
+	graph= physlazy.ExprGraph();
+
+	# placeholders for the inputs (the values in them aren't used, so the kernel doesn't depend on the data)
+	placeholders= [];
+	traceArgs= [];
+	for arg, column in zip(args, columns):
+		if column is None:
+			traceArgs.append(arg);
+			continue;
+
+		node= physlazy.LazyPhysNum(graph, None, (), (), PhysNum(value, 0.0, column[2]));
+		placeholders.append(node);
+		traceArgs.append(node);
+
+	result= func(*traceArgs, **kwargs);
+
+	if isinstance(result, (tuple, list)):
+		multiple, outputs = result.__class__, list(result);
+	else:
+		multiple, outputs = None, [result];
+	outputs= [physlazy.lazy(x, graph) for x in outputs];
+
+	for node in outputs:
+		node.evaluate();
+	return _compileGraph(placeholders, outputs, multiple);
+
+# decorator - compile the given formula into vectorised kernels, for evaluating it on whole arrays at once
+#	- when called with any PhysNumArrays (or lists of PhysNums), the result(s) are PhysNumArrays
+#	- when called with only PhysNums (and constants), the original function is used as normal
+#	- keyword arguments are passed to the formula as constants
+#	- the kernels for each set of input units (and constants) are kept in the 'kernels' attribute
+#	- if any of the constants can't be hashed (i.e. lists of plain numbers), the original function is used
+def compiled (func):
+	kernels= {};
+
+	@functools.wraps(func)
+	def compiled_func (*args, **kwargs):
+		if not [arg for arg in args if isinstance(arg, (PhysNumArray, list, tuple))]:
+			return func(*args, **kwargs);
+
+		columns= [_inputColumns(arg) for arg in args];
+		signature= (tuple([(column[2] if (column is not None) else ('const', arg)) for arg, column in zip(args, columns)]),
+					tuple(sorted(kwargs.items())));
+
+		try:
+			kernel= kernels[signature];
+		except KeyError:
+			kernel= kernels[signature]= compile_formula(func, args, columns, kwargs);
+		except TypeError:
+			# kernels can't be kept for these constants
+			return func(*args, **kwargs);
+
+		return kernel([column[:2] for column in columns if column is not None]);
+
+	compiled_func.kernels= kernels;
+	return compiled_func;
@@ -0,0 +1,331 @@
+# Deferred evaluation of PhysNum expressions
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Instead of calculating each step of a formula straight away, operations on LazyPhysNums
+# build up a graph of the expression (DAG), which only gets evaluated when the result is needed.
+# Identical sub-expressions (i.e. the same operation on the same inputs) are only stored once,
+# so each distinct operation is only evaluated once, no matter how many times it was written.
+#
+# i.e.
+#	T2 = lazy(T) ** 2
+#	x = (T2 * a) + (T2 * b)		# T**2 is only calculated once
+#	print x.evaluate()
+#
+# or, for whole functions:
+#	n = deferred(calc_n)(Inertia, Slope, radius)
+
+import operator
+import functools
+import decimal
+
+import phystools
+from phystools import *
+
+###################################
+# Operations
+
+# call the named method on the given (evaluated) value
+def _callMethod (value, name, *args):
+	return getattr(value, name)(*args);
+
+# average from sum of N values - for phys_average()
+def _meanOf (total, N):
+	if hasattr(total, '_phys_meanOf'):
+		return total._phys_meanOf(N);
+	return phystools._meanOfSum(total, N);
+
+# marker for nodes which haven't been evaluated yet
+_PENDING = object();
+
+###################################
+# Expression Graph
+
+# Expression Graph - storage for the nodes of deferred expressions
+#
+# Each node is only created once for each distinct (operation, inputs) combination,
+# so that common sub-expressions are shared. The result for each node is also kept
+# after it has been evaluated, so that it can be reused by any later expressions.
+#
+# NOTE: values are not recalculated if the numeric backend or decimal precision changes,
+#		so use a new graph (or clear() this one) if those change. The default graphs are
+#		kept separately for each of these settings (see getDefaultGraph()).
+class ExprGraph(object):
+	# class stuff ----------------------------------
+
+	# constructor
+	#	maxNodes: (int) most nodes to keep for sharing - when there are more, the graph starts again
+	#			  (nodes already made still work, but new expressions can't share them). Unlimited if None
+	def __init__ (self, maxNodes=None):
+		self.maxNodes= maxNodes;
+
+		# nodes - (op, extra args, input nodes) : LazyPhysNum
+		self.nodes= {};
+
+		# number of times that an existing node was reused instead of creating a new one
+		self.reused= 0;
+
+	def __repr__ (self):
+		return "<ExprGraph - %d nodes>" % (len(self.nodes));
+
+	def __len__ (self):
+		return len(self.nodes);
+
+	# remove all nodes (and their cached values)
+	def clear (self):
+		self.nodes.clear();
+		self.reused= 0;
+
+	# nodes ----------------------------------------
+
+	# add a new node (or get the one another thread added in the meantime)
+	def _add (self, key, node):
+		if (self.maxNodes is not None) and (len(self.nodes) >= self.maxNodes):
+			self.nodes.clear();
+		return self.nodes.setdefault(key, node);
+
+	# get the leaf node representing the given (already known) value
+	#	value: (PhysNum or number)
+	def leaf (self, value):
+		if isinstance(value, PhysNum):
+			key= (None, (), value);
+		elif type(value) in (int, long, float, D):
+			# raw numbers - type is included, so that int/float/Decimal with the same value are kept separate
+			key= (None, (type(value),), value);
+		else:
+			raise TypeError, "Not a numeric type";
+
+		try:
+			node= self.nodes[key];
+			self.reused += 1;
+		except KeyError:
+			node= self._add(key, LazyPhysNum(self, None, (), (), value));
+
+		return node;
+
+	# get the node for applying the given operation on the given input nodes
+	#	op: (callable) function to evaluate this operation - op(*(input values + extra))
+	#	args: (tuple of LazyPhysNum) input nodes
+	#	extra: (tuple) extra arguments for the operation - the node is only shared if these can be hashed
+	def node (self, op, args, extra=()):
+		key= (op, extra, args);
+
+		try:
+			node= self.nodes[key];
+			self.reused += 1;
+		except KeyError:
+			node= self._add(key, LazyPhysNum(self, op, args, extra, _PENDING));
+		except TypeError:
+			# unhashable extra args (i.e. callables without __hash__) - just make a node of its own
+			node= LazyPhysNum(self, op, args, extra, _PENDING);
+
+		return node;
+
+# most nodes kept by each of the default graphs
+DEFAULT_GRAPH_SIZE = 10000;
+
+# default graphs for deferred expressions, for each of the settings values can be calculated with
+#	(backend name, decimal precision, rounding) : ExprGraph
+_defaultGraphs= {};
+
+# get the default graph for deferred expressions (for the calculation settings currently in use)
+def getDefaultGraph ():
+	context= decimal.getcontext();
+	key= (getNumericBackend().name, context.prec, context.rounding);
+	try:
+		return _defaultGraphs[key];
+	except KeyError:
+		return _defaultGraphs.setdefault(key, ExprGraph(DEFAULT_GRAPH_SIZE));
+
+###################################
+# Lazy Physics Number
+
+# Node in an expression graph, standing in for a PhysNum that will be calculated on demand
+#	- don't create these directly - use lazy() instead
+class LazyPhysNum(object):
+	__slots__ = ('graph', 'op', 'args', 'extra', 'value');
+
+	# helper utility functions for class ---------------
+
+	# get the node for the other arg given to an arithmetic operator
+	def _validateArithArg (self, arg):
+		if isinstance(arg, LazyPhysNum):
+			if arg.graph is not self.graph:
+				raise ValueError, "Cannot combine expressions from different graphs";
+			return arg;
+		elif isinstance(arg, PhysNum) or (type(arg) in (int, long, float, D)):
+			return self.graph.leaf(arg);
+		else:
+			return None;
+
+	# get the node for a binary operator
+	#	reflected: (bool) if True, 'other' is the left operand
+	def _binaryOp (self, op, other, reflected=False):
+		other= self._validateArithArg(other);
+		if other is None:
+			return NotImplemented;
+
+		if reflected:
+			return self.graph.node(op, (other, self));
+		else:
+			return self.graph.node(op, (self, other));
+
+	# class stuff ----------------------------------
+
+	# instance variables
+	#	graph: (ExprGraph) graph this node belongs to
+	#	op: (callable) function to evaluate this node (None for leaves)
+	#	args: (tuple of LazyPhysNum) input nodes
+	#	extra: (tuple) extra arguments for op
+	#	value: (PhysNum) the result, once evaluated
+
+	def __init__ (self, graph, op, args, extra, value):
+		self.graph= graph;
+		self.op= op;
+		self.args= args;
+		self.extra= extra;
+		self.value= value;
+
+	# console representation
+	def __repr__ (self):
+		if self.op is None:
+			return "lazy(%s)" % (repr(self.value));
+		else:
+			name= self.extra[0] if (self.op is _callMethod) else self.op.__name__;
+			return "<LazyPhysNum %s, %d inputs>" % (name, len(self.args));
+
+	# user-output representation - the result
+	def __str__ (self):
+		return str(self.evaluate());
+
+	# evaluation -----------------------------------
+
+	# calculate the value of this expression (if not already done)
+	#	< returns: (PhysNum) the result
+	def evaluate (self):
+		if self.value is not _PENDING:
+			return self.value;
+
+		# evaluate all the nodes needed, without recursion (so that long chains are fine),
+		# making sure the inputs of each node are done before the node itself
+		stack= [self];
+		while stack:
+			node= stack[-1];
+			if node.value is not _PENDING:
+				stack.pop();
+				continue;
+
+			pending= [arg for arg in node.args if arg.value is _PENDING];
+			if pending:
+				stack.extend(pending);
+				continue;
+
+			stack.pop();
+			node.value= node.op(*([arg.value for arg in node.args] + list(node.extra)));
+
+		return self.value;
+
+	# getters (evaluate first) ---------------------
+
+	def getValue (self, withUnits=False):
+		return self.evaluate().getValue(withUnits);
+
+	def getUncertainty_Absolute (self, withUnits=False):
+		return self.evaluate().getUncertainty_Absolute(withUnits);
+
+	def getUncertainty_Fractional (self):
+		return self.evaluate().getUncertainty_Fractional();
+
+	def getUncertainty_Percentage (self, withUnits=False):
+		return self.evaluate().getUncertainty_Percentage(withUnits);
+
+	def getUnits (self):
+		return self.evaluate().getUnits();
+
+	def toStr (self, *args, **kwargs):
+		return self.evaluate().toStr(*args, **kwargs);
+
+	# deferred number ops --------------------------
+
+	def convertUnits (self, newUnits):
+		return self.graph.node(_callMethod, (self,), ('convertUnits', newUnits));
+
+	changeUnits = convertUnits;
+
+	def calcFunc (self, func):
+		return self.graph.node(_callMethod, (self,), ('calcFunc', func));
+
+	def sqrt (self):
+		return self.graph.node(_callMethod, (self,), ('sqrt',));
+
+	# hook used by phys_average()
+	def _phys_meanOf (self, N):
+		return self.graph.node(_meanOf, (self,), (N,));
+
+	# deferred arithmetic operators ----------------
+
+	def __add__ (self, other):
+		return self._binaryOp(operator.add, other);
+	def __sub__ (self, other):
+		return self._binaryOp(operator.sub, other);
+	def __mul__ (self, other):
+		return self._binaryOp(operator.mul, other);
+	def __div__ (self, other):
+		return self._binaryOp(operator.div, other);
+	__truediv__ = __div__;
+
+	def __radd__ (self, other):
+		return self._binaryOp(operator.add, other, True);
+	def __rsub__ (self, other):
+		return self._binaryOp(operator.sub, other, True);
+	def __rmul__ (self, other):
+		return self._binaryOp(operator.mul, other, True);
+	def __rdiv__ (self, other):
+		return self._binaryOp(operator.div, other, True);
+	__rtruediv__ = __rdiv__;
+
+	def __pow__ (self, other, modulo=None):
+		return self._binaryOp(operator.pow, other);
+
+	def __invert__ (self):
+		return self.graph.node(operator.invert, (self,));
+
+###################################
+# API
+
+# get the deferred version of the given value (PhysNum, or plain number)
+#	graph: (ExprGraph) graph to add it to - the default graph is used if not given
+def lazy (value, graph=None):
+	if isinstance(value, LazyPhysNum):
+		return value;
+
+	if graph is None:
+		graph= getDefaultGraph();
+	return graph.leaf(value);
+
+# get the result of the given expression (evaluating it if deferred)
+def evaluate (value):
+	if isinstance(value, LazyPhysNum):
+		return value.evaluate();
+	return value;
+
+# decorator - make the given function evaluate its formula in deferred mode
+#	- PhysNum arguments are turned into deferred values, and the result(s)
+#	  (single value, or a tuple/list of them) are evaluated before returning
+#	graph: (ExprGraph) graph to use (to share results between calls) - otherwise each call gets a new one
+def deferred (func, graph=None):
+	@functools.wraps(func)
+	def deferred_func (*args, **kwargs):
+		g= graph if (graph is not None) else ExprGraph();
+
+		args= [(lazy(arg, g) if isinstance(arg, PhysNum) else arg) for arg in args];
+		for key, arg in kwargs.items():
+			if isinstance(arg, PhysNum):
+				kwargs[key]= lazy(arg, g);
+
+		result= func(*args, **kwargs);
+		if isinstance(result, (tuple, list)):
+			return result.__class__([evaluate(x) for x in result]);
+		else:
+			return evaluate(result);
+
+	return deferred_func;
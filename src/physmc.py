@@ -0,0 +1,259 @@
+# Monte Carlo uncertainty propagation
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Requires NumPy
+#
+# The propagation rules used by PhysNum are (worst-case) linear bounds, which can be far
+# too pessimistic (or just wrong) for very non-linear formulas. Instead, this samples each
+# of the inputs from its distribution, and evaluates the formula on whole blocks of samples
+# at once (as PhysNumArrays, so the same calc_* functions can be used, units and all),
+# giving the mean, standard deviation and percentiles of the result.
+#
+# Samples are generated in fixed-size chunks (so memory use doesn't depend on the number of
+# samples), which can be spread over several processes. Each chunk has its own seed (derived
+# from the overall seed), so the results are the same whatever the number of processes.
+#
+#	i.e.
+#		result= monte_carlo(calc_n, [sphere_inertia, S, wire_average], samples=10**7)
+#		print result.toPhysNum(), result.getInterval(95)
+
+import os
+import math
+import struct
+import multiprocessing
+
+import numpy
+
+from phystools import *
+from physarray import PhysNumArray
+
+###################################
+# Sampling
+
+# distributions that inputs can be sampled from
+#	name : function(RandomState, N) giving N samples with mean 0, scaled so that
+#		   the input's uncertainty is the standard deviation ("normal"), or the
+#		   furthest the value can be from the mean ("uniform" - i.e. worst-case bounds)
+_distributions = {
+	"normal": lambda rng, N: rng.standard_normal(N),
+	"uniform": lambda rng, N: rng.uniform(-1.0, 1.0, N),
+};
+
+# number of bins used for the histograms the percentiles are found from
+HISTOGRAM_BINS = 1 << 14;
+
+# get the samples for each of the arguments to the formula
+#	distributions: (list of str) distribution to use for each argument
+def _sampleArgs (rng, args, distributions, N):
+	samples= [];
+	for arg, dist in zip(args, distributions):
+		if isinstance(arg, PhysNum):
+			v= float(arg.getValue());
+			e= float(arg.getUncertainty_Absolute());
+			samples.append(PhysNumArray(v + e * _distributions[dist](rng, N), 0.0, arg.getUnits()));
+		else:
+			# constants are passed through unchanged
+			samples.append(arg);
+	return samples;
+
+# get the values (and units) of the result of the formula, for the given number of samples
+def _resultValues (result, N):
+	if isinstance(result, PhysNumArray):
+		return result.v, result.units;
+	elif isinstance(result, PhysNum):
+		# formula doesn't depend on anything random
+		return numpy.repeat(float(result.getValue()), N), result.units;
+	else:
+		return numpy.broadcast_to(numpy.asarray(result, dtype=numpy.float64), (N,)), None;
+
+# evaluate the formula for one chunk of samples
+#	task: (func, args, distributions, N, seed, edges)
+#	< returns: (dict) stats for the chunk
+def _runChunk (task):
+	func, args, distributions, N, seed, edges = task;
+	rng= numpy.random.RandomState(seed);
+
+	# division by zero (etc.) gives inf/nan for the affected samples, instead of stopping everything
+	with numpy.errstate(divide='ignore', invalid='ignore', over='ignore'):
+		values, units = _resultValues(func(*_sampleArgs(rng, args, distributions, N)), N);
+	values= values[numpy.isfinite(values)];
+
+	stats= {'units': units, 'count': len(values), 'nonfinite': N - len(values)};
+	if len(values):
+		stats['mean']= float(values.mean());
+		stats['M2']= float(((values - stats['mean']) ** 2).sum());
+		stats['min']= float(values.min());
+		stats['max']= float(values.max());
+	if edges is not None:
+		stats['histogram']= _histogram(values, edges);
+	else:
+		stats['values']= values;
+	return stats;
+
+# get the histogram of the given values (with the counts below/above the edges at the ends)
+def _histogram (values, edges):
+	counts= numpy.zeros(len(edges) + 1, dtype=numpy.int64);
+	bins= numpy.searchsorted(edges, values, side='right');
+	counts+= numpy.bincount(bins, minlength=len(counts));
+	return counts;
+
+# get the edges of the histogram bins, from the first chunk of samples
+#	- these cover the range of the first chunk, with as much again on either side
+def _histogramEdges (values):
+	lo, hi = float(values.min()), float(values.max());
+	span= (hi - lo) or abs(hi) or 1.0;
+	return numpy.linspace(lo - span, hi + span, HISTOGRAM_BINS + 1);
+
+###################################
+# Results
+
+# Results of a Monte Carlo simulation
+class MCResult(object):
+	# class stuff ----------------------------------
+
+	# constructor
+	#	mean, std: (float) mean and standard deviation of the samples
+	#	count: (int) number of (finite) samples
+	#	edges, counts: (ndarray) histogram of the samples (see _histogram())
+	def __init__ (self, mean, std, minimum, maximum, count, nonfinite, units, edges, counts, seed):
+		self.mean= mean;
+		self.std= std;
+		self.min= minimum;
+		self.max= maximum;
+		self.count= count;
+		self.nonfinite= nonfinite;	# samples where the formula wasn't finite (i.e. division by zero) - these are ignored
+		self.units= units;
+		self.seed= seed;			# seed used (to reproduce the results)
+
+		self.edges= edges;
+		self.counts= counts;
+		self._cumulative= numpy.cumsum(counts);
+
+	def __str__ (self):
+		lo, hi = self.getInterval(95);
+		units= self.units if self.units else "";
+		return "%g%s +/- %g%s (95%%: %g to %g%s, %d samples)" % (self.mean, units, self.std, units, lo, hi, units, self.count);
+
+	# getters --------------------------------------
+
+	# get the result as a PhysNum (mean +/- standard deviation)
+	def toPhysNum (self):
+		return PhysNum(self.mean, self.std, self.units);
+
+	# get the value which the given percentage of the samples are below
+	#	- found from the histogram, so it is accurate to within a bin width (1/HISTOGRAM_BINS of
+	#	  the range of the first chunk of samples) - unless it's further out than that range
+	def getPercentile (self, p):
+		target= self.count * p / 100.0;
+		cumulative= self._cumulative;
+
+		i= int(numpy.searchsorted(cumulative, target, side='left'));
+		if i == 0:
+			return self.min;
+		if i >= len(self.edges):
+			return self.max;
+
+		# interpolate within the bin (edges[i-1] to edges[i])
+		before= cumulative[i-1];
+		fraction= (target - before) / float(cumulative[i] - before);
+		lo, hi = self.edges[i-1], self.edges[i];
+		return float(lo + (hi - lo) * fraction);
+
+	# get the central interval containing the given percentage of the samples
+	#	< returns: (lower, upper)
+	def getInterval (self, level=95):
+		tail= (100.0 - level) / 2;
+		return self.getPercentile(tail), self.getPercentile(100.0 - tail);
+
+###################################
+# Simulation
+
+# get a new random seed
+def _newSeed ():
+	return struct.unpack("<I", os.urandom(4))[0] & 0x7fffffff;
+
+# estimate the distribution of the result of a formula by Monte Carlo sampling
+#	func: (function) formula to evaluate - taking the arguments given, and working on PhysNumArrays
+#		  (as the calc_* functions do). Must be defined at module level if more than one process is used
+#	args: (list) arguments for the formula - PhysNums are sampled from their distributions,
+#		  and anything else is passed through as a constant
+#	samples: (int) total number of samples
+#	chunkSize: (int) number of samples to evaluate at a time
+#	processes: (int) number of processes to use. If None, one per core is used
+#	seed: (int) seed for the random numbers. If None, a new one is chosen (see MCResult.seed)
+#	distribution: (str or list of str) distribution the PhysNum arguments are from (see _distributions),
+#				  or a list of them for each argument
+#	< returns: (MCResult)
+def monte_carlo (func, args, samples=10**6, chunkSize=10**5, processes=None, seed=None, distribution="normal"):
+	if isinstance(distribution, basestring):
+		distributions= [distribution] * len(args);
+	else:
+		distributions= list(distribution);
+		if len(distributions) != len(args):
+			raise ValueError, "Need a distribution for each argument";
+	for dist in distributions:
+		if dist not in _distributions:
+			raise ValueError, "Unknown distribution '%s'" % (dist);
+
+	if samples < 1:
+		raise ValueError, "Need at least one sample";
+	if chunkSize < 1:
+		raise ValueError, "Chunk size must be at least 1";
+
+	if seed is None:
+		seed= _newSeed();
+
+	# sizes and seeds for each chunk
+	numChunks= (samples + chunkSize - 1) // chunkSize;
+	sizes= [chunkSize] * numChunks;
+	sizes[-1]= samples - chunkSize * (numChunks - 1);
+	seeds= numpy.random.RandomState(seed).randint(0, 0x7fffffff, numChunks);
+
+	# first chunk is done here, to find the range of the results for the histogram
+	first= _runChunk((func, args, distributions, sizes[0], seeds[0], None));
+	if first['count'] == 0:
+		raise ValueError, "Formula was not finite for any of the samples";
+	edges= _histogramEdges(first['values']);
+	first['histogram']= _histogram(first['values'], edges);
+	del first['values'];
+
+	# rest of the chunks
+	tasks= [(func, args, distributions, sizes[i], seeds[i], edges) for i in xrange(1, numChunks)];
+	if processes is None:
+		processes= multiprocessing.cpu_count();
+
+	if (processes == 1) or (len(tasks) < 2):
+		chunks= [_runChunk(task) for task in tasks];
+	else:
+		pool= multiprocessing.Pool(min(processes, len(tasks)));
+		try:
+			chunks= pool.map(_runChunk, tasks);
+		finally:
+			pool.close();
+			pool.join();
+
+	# combine the stats for the chunks
+	# (Chan et al's method for the mean/variance of the combined samples)
+	count, mean, M2 = 0, 0.0, 0.0;
+	minimum, maximum = first['min'], first['max'];
+	nonfinite= 0;
+	counts= numpy.zeros(len(edges) + 1, dtype=numpy.int64);
+
+	for chunk in [first] + chunks:
+		nonfinite += chunk['nonfinite'];
+		if chunk['count'] == 0:
+			continue;
+
+		n= chunk['count'];
+		delta= chunk['mean'] - mean;
+		total= count + n;
+		mean += delta * n / total;
+		M2 += chunk['M2'] + delta * delta * count * n / total;
+		count= total;
+
+		minimum= min(minimum, chunk['min']);
+		maximum= max(maximum, chunk['max']);
+		counts += chunk['histogram'];
+
+	std= math.sqrt(M2 / (count - 1)) if count > 1 else 0.0;
+	return MCResult(mean, std, minimum, maximum, count, nonfinite, first['units'], edges, counts, seed);
@@ -0,0 +1,177 @@
+# Reading PhysNums back from text (i.e. printed results, instrument exports, old reports)
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# The forms that PhysNums are written in (see PhysNum.toStr()) can all be read, i.e.
+#	67.72s +/- 0.05s
+#	67.72 +/- 0.05 s				(units after the uncertainty apply to the value too)
+#	67.72 \xb1 0.05 s				(plus-minus sign, in UTF-8 or Latin-1)
+#	$(67.72 \pm 0.05)s$
+#	\physNum{67.72}{0.05}{s}
+#	67.72s							(no uncertainty)
+#
+# Units are looked up by their symbols (see parseUnits()). If the value and uncertainty are
+# given in different units for the same type of measurement, the uncertainty is converted
+# to the units of the value.
+#
+#	i.e.
+#		T= parse_physnum("67.72s +/- 0.05s");
+#		times= read_physnums("times.txt");		# one per line
+
+import re
+import decimal
+
+from phystools import *
+
+###################################
+# Grammar
+
+# number - i.e. 67.72, -1.5E-7
+_NUMBER = r"[-+]?(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?";
+
+# units - unit symbols, with powers (i.e. kg.m^2.s^-2, m/s^2, s^(1/2))
+_UNITS = r"[A-Za-z_\xb5](?:[\w./]|\^(?:\(\s*-?\d+\s*/\s*\d+\s*\)|-?\d+(?:/\d+)?))*";
+
+# plus/minus sign - ASCII, plus-minus sign (UTF-8 or Latin-1), or LaTeX
+_PLUS_MINUS = r"(?:\+/-|\+-|\xc2\xb1|\xb1|\\pm)";
+
+# value [units] [+/- uncertainty [units]], optionally as (value +/- uncertainty)units, and/or in $'s
+_physNumRE = re.compile(r"""
+	^\s* \$?\s* (?P<open>\()?\s*
+	(?P<v>%(num)s) \s* (?P<vu>%(units)s)?
+	(?: \s* %(pm)s \s* (?P<e>%(num)s) \s* (?P<eu>%(units)s)? )?
+	\s* (?(open) \)\s* (?P<u>%(units)s)? )
+	\s* \$? \s*$
+	""" % {'num': _NUMBER, 'units': _UNITS, 'pm': _PLUS_MINUS}, re.VERBOSE);
+
+# \physNum{value}{uncertainty}{units} - see PhysNum.toStr(latex=2)
+_latexMacroRE = re.compile(r"""
+	^\s* \\physNum \s*\{\s* (?P<v>%(num)s) \s*\}\s*\{\s* (?P<e>%(num)s) \s*\}\s*\{\s* (?P<u>[^}]*?) \s*\} \s*$
+	""" % {'num': _NUMBER}, re.VERBOSE);
+
+# parts of a number (as matched by _NUMBER) - sign, whole part, fractional part, exponent
+_numberPartsRE = re.compile(r"([-+]?)(\d*)\.?(\d*)(?:[eE]([-+]?\d+))?$");
+
+###################################
+# Parsing
+
+# get the Decimal for the given number (as matched by _NUMBER)
+#	- with the pure Python decimal module, it is built from its parts directly, as Decimal(text) 
+#	  is much slower there (but gives the same result)
+if hasattr(decimal, '_dec_from_triple'):
+	def _decimal (text):
+		sign, whole, frac, exp = _numberPartsRE.match(text).groups();
+		digits= (whole + frac).lstrip("0") or "0";
+		return decimal._dec_from_triple((1 if sign == "-" else 0), digits, int(exp or 0) - len(frac));
+else:
+	_decimal = decimal.Decimal;
+
+# cached units for each combination of unit strings found (see _resolveUnits())
+#	(value units, uncertainty units, common units) : (units, factor for the uncertainty - or None)
+_unitsCache = {};
+
+# get the units of a number, from the unit strings given for its parts
+#	< returns: (units, factor) - where the uncertainty needs to be multiplied by 'factor' (if not None)
+#			   to express it in 'units'
+def _resolveUnits (key):
+	try:
+		return _unitsCache[key];
+	except KeyError:
+		pass;
+
+	vText, eText, text = key;
+	if text:
+		vText= eText= text;
+
+	# units given for only one part apply to both
+	vUnits= parseUnits(vText or eText or "");
+	eUnits= parseUnits(eText or vText or "");
+
+	factor= None;
+	if vUnits != eUnits:
+		if (vUnits is None) or (eUnits is None) or (vUnits.sameMeasurement(eUnits) == False):
+			raise ValueError, "Units of value (%s) and uncertainty (%s) don't match" % (vText, eText);
+		factor= vUnits.conversionFactor(eUnits);
+
+	result= _unitsCache[key]= (vUnits, factor);
+	return result;
+
+# get the parts of the given string
+#	< returns: (value, uncertainty or None, units key for _resolveUnits())
+def _splitParts (text):
+	m= _physNumRE.match(text);
+	if m is not None:
+		v, vu, e, eu, u = m.group('v', 'vu', 'e', 'eu', 'u');
+		return v, e, (vu, eu, u);
+
+	m= _latexMacroRE.match(text);
+	if m is not None:
+		v, e, u = m.group('v', 'e', 'u');
+		return v, e, (None, None, u);
+
+	raise ValueError, "Not a PhysNum: '%s'" % (text.strip());
+
+# get the function used to turn strings into PhysNums (with the current numeric backend)
+def _makeParser ():
+	backend= getNumericBackend();
+	number= _decimal if (backend.name == "decimal") else backend.number;
+	zero= backend.zero;
+	create= PhysNum._create;
+
+	# factors to convert uncertainties to the units of their values, for the backend in use
+	#	factor : backend factor
+	factors= {};
+
+	def parse (text):
+		if isinstance(text, unicode):
+			text= text.encode('utf-8');
+
+		v, e, key = _splitParts(text);
+		units, factor = _resolveUnits(key);
+
+		if e is None:
+			return create(number(v), zero, units);
+		elif factor is None:
+			return create(number(v), number(e), units);
+		else:
+			if factor not in factors:
+				factors[factor]= backend.constant(factor);
+			return create(number(v), number(e) * factors[factor], units);
+
+	return parse;
+
+###################################
+# API
+
+# get the PhysNum written in the given string
+#	text: (str or unicode) - see the top of this file for the forms accepted
+#	< returns: (PhysNum) using the current numeric backend (so Decimals are exactly as written)
+def parse_physnum (text):
+	return _makeParser()(text);
+
+# get the PhysNums written in the given strings (i.e. the lines of a file), one per string
+#	lines: (iterable of str) - blank lines and comments (starting with #) are skipped
+#	< returns: (list of PhysNum)
+def parse_physnums (lines):
+	parse= _makeParser();
+
+	result= [];
+	for lineNum, text in enumerate(lines):
+		stripped= text.strip();
+		if (not stripped) or stripped.startswith("#"):
+			continue;
+
+		try:
+			result.append(parse(text));
+		except ValueError, err:
+			raise ValueError, "Line %d: %s" % (lineNum + 1, err);
+
+	return result;
+
+# read the PhysNums from a text file, with one on each line
+#	< returns: (list of PhysNum)
+def read_physnums (fileN):
+	f= open(fileN, 'rU');
+	try:
+		return parse_physnums(f);
+	finally:
+		f.close();
@@ -0,0 +1,261 @@
+# Instrumentation for finding out where the time goes in calculations using PhysNums
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Counts and times the PhysNum operators, unit conversions, allocations, wrapping of raw
+# numbers, and calcFunc() evaluations, grouped by the line (outside of this library)
+# which caused them.
+#
+# This is opt-in: PhysNum's methods are only replaced by instrumented versions while a
+# Profiler is running, so there is no overhead at all the rest of the time.
+#
+# NOTE: only the operations done by the thread which started the profiler are counted (other 
+#		threads just pay a little for the instrumentation). Methods overridden by subclasses of
+#		PhysNum (i.e. TrackedPhysNum) aren't instrumented, so they aren't counted either.
+#
+#	i.e.
+#		with Profiler() as prof:
+#			n= calc_n(I, S, r)
+#		prof.report()
+
+import sys
+import os
+import timeit
+import thread
+
+from phystools import *
+
+###################################
+# Instrumented Methods
+
+# PhysNum methods which get instrumented, and the names of the events they're reported as
+_methods = [
+	# operators
+	('__add__', "+"),
+	('__radd__', "+ (rhs)"),
+	('__sub__', "-"),
+	('__rsub__', "- (rhs)"),
+	('__mul__', "*"),
+	('__rmul__', "* (rhs)"),
+	('__div__', "/"),
+	('__truediv__', "/"),
+	('__rdiv__', "/ (rhs)"),
+	('__pow__', "**"),
+	('__invert__', "~"),
+	('sqrt', "sqrt()"),
+
+	# unit conversions (see _wrapSpecial())
+	('convertUnits', None),
+	('changeUnits', None),
+
+	# allocations
+	('__init__', "alloc: PhysNum()"),
+
+	# wrapping raw numbers, and function evaluations
+	('_validateArithArg', None),
+	('calcFunc', None),
+];
+
+# static methods which get instrumented
+_staticMethods = [
+	('_create', "alloc: internal"),
+];
+
+# modules whose lines aren't reported as call sites (the code being called, rather than the caller)
+_libraryModules = ('phystools', 'physarray', 'physprofile', 'decimaltools');
+
+# the profiler currently running (only one can run at a time)
+_active = None;
+
+###################################
+# Profiler
+
+# Profiler - collects counts/times of PhysNum operations while it is running
+#
+# Times are inclusive (i.e. the time for '*' includes the time taken to allocate the result),
+# and include a little overhead from the instrumentation itself.
+class Profiler(object):
+	# class stuff ----------------------------------
+
+	def __init__ (self):
+		# (event, call site) : [count, total time (s)]
+		#	call site: (filename, line number, function name)
+		self.stats= {};
+
+		# original methods, while running
+		self._originals= None;
+
+		# thread which started the profiler (the only one whose operations are recorded)
+		self._thread= None;
+
+		# cached results of _isLibrary() for each filename
+		self._libraryFiles= {};
+
+	def __enter__ (self):
+		self.start();
+		return self;
+
+	def __exit__ (self, excType, excValue, traceback):
+		self.stop();
+
+	# running ----------------------------------------
+
+	# start collecting stats (by instrumenting PhysNum)
+	def start (self):
+		global _active;
+		if _active is not None:
+			raise RuntimeError, "A Profiler is already running";
+		_active= self;
+
+		self._thread= thread.get_ident();
+		self._originals= {};
+		for attr, event in _methods:
+			func= PhysNum.__dict__[attr];
+			self._originals[attr]= func;
+			if event:
+				setattr(PhysNum, attr, self._wrap(func, event));
+			else:
+				setattr(PhysNum, attr, self._wrapSpecial(attr, func));
+
+		for attr, event in _staticMethods:
+			func= PhysNum.__dict__[attr];
+			self._originals[attr]= func;
+			setattr(PhysNum, attr, staticmethod(self._wrap(func.__get__(None, PhysNum), event)));
+
+	# stop collecting stats (restoring PhysNum to how it was)
+	def stop (self):
+		global _active;
+		if _active is not self:
+			return;
+
+		for attr, func in self._originals.iteritems():
+			setattr(PhysNum, attr, func);
+		self._originals= None;
+		_active= None;
+
+	# clear all the stats collected so far
+	def reset (self):
+		self.stats= {};
+
+	# recording --------------------------------------
+
+	# is the named file part of this library (rather than code using it)?
+	def _isLibrary (self, fileN):
+		try:
+			return self._libraryFiles[fileN];
+		except KeyError:
+			name= os.path.splitext(os.path.basename(fileN))[0];
+			result= self._libraryFiles[fileN]= (name in _libraryModules);
+			return result;
+
+	# get the call site which caused the current event
+	# (the first frame outside of this library)
+	def _callSite (self):
+		frame= sys._getframe(2);
+		while (frame is not None) and self._isLibrary(frame.f_code.co_filename):
+			frame= frame.f_back;
+
+		if frame is None:
+			return ("<unknown>", 0, "");
+		code= frame.f_code;
+		return (code.co_filename, frame.f_lineno, code.co_name);
+
+	# record an occurrence of an event
+	#	time: (float) time taken (s)
+	def _record (self, event, time):
+		if thread.get_ident() != self._thread:
+			return;
+
+		key= (event, self._callSite());
+		try:
+			stat= self.stats[key];
+			stat[0] += 1;
+			stat[1] += time;
+		except KeyError:
+			self.stats[key]= [1, time];
+
+	# get an instrumented version of the given function, reporting calls to it as the given event
+	def _wrap (self, func, event):
+		timer= timeit.default_timer;
+		record= self._record;
+
+		def wrapper (*args, **kwargs):
+			start= timer();
+			result= func(*args, **kwargs);
+			record(event, timer() - start);
+			return result;
+
+		wrapper.__name__= func.__name__;
+		wrapper.__doc__= func.__doc__;
+		return wrapper;
+
+	# get an instrumented version of a method which needs to report events depending on its arguments
+	def _wrapSpecial (self, attr, func):
+		timer= timeit.default_timer;
+		record= self._record;
+
+		if attr in ('convertUnits', 'changeUnits'):
+			# calls which didn't need to convert anything are counted separately
+			def wrapper (self, newUnits):
+				start= timer();
+				result= func(self, newUnits);
+				if result is self:
+					record("%s(): no-op" % (attr), timer() - start);
+				else:
+					record("%s(): converted" % (attr), timer() - start);
+				return result;
+		elif attr == '_validateArithArg':
+			# only interested in the raw numbers which get wrapped up as PhysNums
+			def wrapper (self, arg, sameUnits=True):
+				start= timer();
+				result= func(self, arg, sameUnits);
+				if type(arg) in (int, float, D):
+					record("wrap: %s" % (type(arg).__name__), timer() - start);
+				return result;
+		elif attr == 'calcFunc':
+			# grouped by the function being evaluated
+			def wrapper (self, f):
+				start= timer();
+				result= func(self, f);
+				record("calcFunc(%s)" % (getattr(f, '__name__', repr(f))), timer() - start);
+				return result;
+
+		wrapper.__name__= func.__name__;
+		return wrapper;
+
+	# results ----------------------------------------
+
+	# get the stats collected, per event and call site
+	#	< returns: (list) (event, (filename, line, function), count, total time) - most time first
+	def getStats (self):
+		stats= [(event, site, count, time) for (event, site), (count, time) in self.stats.iteritems()];
+		stats.sort(key=lambda x: -x[3]);
+		return stats;
+
+	# get the totals for each event (over all call sites)
+	#	< returns: (dict) event : (count, total time)
+	def getTotals (self):
+		totals= {};
+		for (event, site), (count, time) in self.stats.iteritems():
+			total= totals.get(event, (0, 0.0));
+			totals[event]= (total[0] + count, total[1] + time);
+		return totals;
+
+	# write a summary of the stats collected
+	#	out: (file) where to write the summary
+	#	limit: (int) maximum number of call sites to show
+	def report (self, out=sys.stdout, limit=20):
+		out.write("PhysNum Profile\n\n");
+
+		out.write("%-26s %10s %12s %12s\n" % ("Event", "Count", "Total (ms)", "Mean (us)"));
+		totals= sorted(self.getTotals().items(), key=lambda x: -x[1][1]);
+		for event, (count, time) in totals:
+			out.write("%-26s %10d %12.3f %12.2f\n" % (event, count, time * 1e3, time * 1e6 / count));
+
+		out.write("\n%-26s %10s %12s  %s\n" % ("Event", "Count", "Total (ms)", "Call Site"));
+		for event, (fileN, line, funcName), count, time in self.getStats()[:limit]:
+			site= "%s:%d (%s)" % (os.path.basename(fileN), line, funcName);
+			out.write("%-26s %10d %12.3f  %s\n" % (event, count, time * 1e3, site));
+
+# get the profiler currently running (or None)
+def getProfiler ():
+	return _active;
@@ -0,0 +1,327 @@
+# Writing results out for reports (LaTeX tables, gnuplot data files)
+# Copyright 2009, Joshua Leung (aligorith@gmail.com)
+#
+# Tables are written a batch of rows at a time from any iterable (so the rows never
+# need to all be in memory at once), with each batch formatted a column at a time and
+# written through a buffered file in a single write.
+#
+# Plot data is written in gnuplot's binary format straight from the value/uncertainty
+# columns (optionally downsampled first), along with the script to plot it. This needs NumPy.
+
+import itertools
+
+from phystools import *
+
+# NumPy is only needed for the plotting tools
+try:
+	import numpy
+	from physarray import PhysNumArray
+except ImportError:
+	numpy = None;
+
+###################################
+# Cell Formatting
+
+# format a column of cells (from a batch of rows) for a LaTeX table
+#	values: (list) cells for a single column - PhysNums, numbers, or (already formatted) strings
+#	< returns: (list of str) LaTeX for each cell
+def format_latex_cells (values):
+	# fast path for the common case of a column which is all PhysNums
+	# (same output as PhysNum.toStr(latex=True))
+	if all([isinstance(x, PhysNum) for x in values]):
+		return ["$(%s \\pm %s)$" % (x.v, x.e) for x in values];
+
+	cells= [];
+	for x in values:
+		if isinstance(x, PhysNum):
+			cells.append("$(%s \\pm %s)$" % (x.v, x.e));
+		elif isinstance(x, basestring):
+			cells.append(x);
+		elif hasattr(x, 'toStr'):
+			cells.append(x.toStr(latex=True));
+		else:
+			cells.append(str(x));
+	return cells;
+
+###################################
+# LaTeX Tables
+
+# LaTeX Table Writer - writes the rows of a table to a file as they are given
+#
+#	i.e.
+#		writer= LatexTableWriter("results.tex", ["L (m)", "$T^2 (s^2)$"], caption="Processed data")
+#		writer.writeRows(rows)
+#		writer.close()
+#
+# Very long tables can either be written as a 'longtable' (which LaTeX splits over as many
+# pages as needed, repeating the header on each), or split into several separate tables.
+class LatexTableWriter(object):
+	# class stuff ----------------------------------
+
+	# constructor
+	#	fileN: (str or file) name of file to write to, or an already open file
+	#	labels: (list of str) column headings
+	#	format: (function) function to get the list of cells (strings) for each row.
+	#			If not given, each row should be a sequence of cells (see format_latex_cells())
+	#	caption: (str) caption for the table
+	#	longtable: (bool) write a 'longtable', which can go over several pages (needs \usepackage{longtable})
+	#	rowsPerTable: (int) start a new table after this many rows (ignored for longtables)
+	#	batchSize: (int) number of rows to format/write at a time
+	def __init__ (self, fileN, labels, format=None, caption=None, longtable=False, rowsPerTable=None, batchSize=1000):
+		if isinstance(fileN, basestring):
+			self.f= open(fileN, 'w', 1 << 16);
+			self.ownFile= True;
+		else:
+			self.f= fileN;
+			self.ownFile= False;
+
+		self.labels= labels;
+		self.format= format;
+		self.caption= caption;
+		self.longtable= longtable;
+		self.rowsPerTable= None if longtable else rowsPerTable;
+		self.batchSize= batchSize;
+
+		self.rowCount= 0;		# rows written so far
+		self.tableRows= 0;		# rows written in the current table
+		self.tableCount= 0;		# tables started so far
+		self.inTable= False;	# a table has been started, but not finished
+		self.closed= False;
+
+		# cached bits of LaTeX
+		self._columnSpec= " | ".join(["c" for x in labels]);
+		self._header= "%s \\\\ \\hline \n" % (" & ".join(labels));
+
+	def __enter__ (self):
+		return self;
+
+	def __exit__ (self, excType, excValue, traceback):
+		self.close();
+
+	# table environments -------------------------
+
+	# get the caption for the current table
+	def _caption (self):
+		if (self.tableCount > 1) and self.caption:
+			return "%s (continued)" % (self.caption);
+		return self.caption;
+
+	# get the LaTeX to start a new table
+	def _begin (self):
+		self.tableCount += 1;
+		self.tableRows= 0;
+		self.inTable= True;
+
+		if self.longtable:
+			parts= ["\\begin{longtable}{ %s }\n" % (self._columnSpec)];
+			if self.caption:
+				parts.append("\\caption{%s} \\\\\n" % (self.caption));
+			parts.append(self._header);
+			parts.append("\\endfirsthead\n");
+			parts.append(self._header);
+			parts.append("\\endhead\n");
+			return "".join(parts);
+		else:
+			return "\\begin{table}[h]\n\\begin{tabular}{ %s }\n%s" % (self._columnSpec, self._header);
+
+	# get the LaTeX to finish the current table
+	def _end (self):
+		self.inTable= False;
+
+		# terminate the last row
+		last= "\n" if self.tableRows else "";
+
+		if self.longtable:
+			return last + "\\end{longtable}\n";
+		else:
+			parts= [last + "\\end{tabular}\n"];
+			caption= self._caption();
+			if caption:
+				parts.append("\\caption{%s}\n" % (caption));
+			parts.append("\\end{table}\n");
+			return "".join(parts);
+
+	# writing ------------------------------------
+
+	# format a batch of rows
+	#	< returns: (list of str) the LaTeX for each row (without the row terminators)
+	def _formatBatch (self, rows):
+		if self.format:
+			return [" & ".join(self.format(row)) for row in rows];
+		else:
+			# format a column at a time, then put the rows back together
+			columns= [format_latex_cells(list(column)) for column in zip(*rows)];
+			return [" & ".join(cells) for cells in zip(*columns)];
+
+	# write a batch of rows
+	def _writeBatch (self, rows):
+		lines= self._formatBatch(rows);
+
+		parts= [];
+		for line in lines:
+			if self.inTable and self.rowsPerTable and (self.tableRows >= self.rowsPerTable):
+				parts.append(self._end());
+
+			if self.inTable == False:
+				parts.append(self._begin());
+			else:
+				# terminate the row before this one
+				parts.append("\\\\ \n");
+
+			parts.append(line);
+			self.tableRows += 1;
+
+		self.rowCount += len(lines);
+		self.f.write("".join(parts));
+
+	# add a single row to the table
+	def writeRow (self, row):
+		self._writeBatch([row]);
+
+	# add all the rows from the given iterable to the table
+	def writeRows (self, rows):
+		rows= iter(rows);
+		while True:
+			batch= list(itertools.islice(rows, self.batchSize));
+			if not batch:
+				break;
+			self._writeBatch(batch);
+
+	# finish the table (and close the file, if it was opened here)
+	def close (self):
+		if self.closed:
+			return;
+		self.closed= True;
+
+		# always write a table, even if there weren't any rows
+		if self.inTable == False:
+			self.f.write(self._begin());
+		self.f.write(self._end());
+
+		if self.ownFile:
+			self.f.close();
+
+# write a whole LaTeX table to the named file
+#	rows: (iterable) rows of the table - these are only looked at once, so generators can be used
+#	other args: see LatexTableWriter
+#	< returns: (int) number of rows written
+def write_latex_table (fileN, labels, rows, format=None, caption=None, longtable=False, rowsPerTable=None):
+	writer= LatexTableWriter(fileN, labels, format, caption, longtable, rowsPerTable);
+	try:
+		writer.writeRows(rows);
+	finally:
+		writer.close();
+
+	return writer.rowCount;
+
+###################################
+# Gnuplot Plots
+
+# get the (values, uncertainties) columns of the given data, as float arrays
+#	data: (PhysNumArray, list of PhysNums, or array/list of plain numbers - with no uncertainties)
+def _plotColumns (data):
+	if numpy is None:
+		raise ImportError, "NumPy is needed for writing gnuplot data files";
+
+	if isinstance(data, PhysNumArray):
+		return data.v, data.e;
+	if isinstance(data, numpy.ndarray) == False:
+		data= list(data);
+		if data and isinstance(data[0], PhysNum):
+			data= PhysNumArray.fromPhysNums(data);
+			return data.v, data.e;
+
+	values= numpy.asarray(data, dtype=numpy.float64);
+	return values, numpy.zeros(len(values));
+
+# get the points to keep when downsampling a series to the given number of buckets
+#	- the points are split into equal-sized buckets (in the order given, i.e. time order), and
+#	  only the points with the lowest and highest values in each bucket are kept, so that the
+#	  shape of the plot (peaks and all) is kept, even though most of the points are dropped
+#	values: (ndarray) values which will be plotted on the y-axis
+#	buckets: (int) number of buckets - i.e. the width of the plot in pixels
+#	< returns: (ndarray) indices of the points to keep, in their original order
+def decimate_minmax (values, buckets):
+	N= len(values);
+	if N <= 2 * buckets:
+		return numpy.arange(N);
+
+	# bucket each point is in (these are in ascending order)
+	bucket= (numpy.arange(N) * buckets) // N;
+	starts= numpy.searchsorted(bucket, numpy.arange(buckets));
+	ends= numpy.append(starts[1:], N);
+
+	# sort the points within each bucket by value, so that the first/last in each are the min/max
+	order= numpy.lexsort((values, bucket));
+
+	return numpy.unique(numpy.concatenate((order[starts], order[ends - 1])));
+
+# get the gnuplot binary format for records of the given number of fields
+#	single: (bool) records use single-precision floats
+def _gnuplotFormat (numFields, single=False):
+	return ("%float32" if single else "%float64") * numFields;
+
+# write a series of points (with their uncertainties) to a binary data file for gnuplot
+#	- each record is: x y xdelta ydelta (little-endian floats)
+#	x, y: (PhysNumArray, list of PhysNums, or plain numbers) coordinates of the points
+#	buckets: (int) if given, downsample the points to this many min/max buckets (see decimate_minmax())
+#	single: (bool) write single-precision floats (half the size, but only ~7 significant digits)
+#	< returns: (int) number of points written
+def write_gnuplot_binary (fileN, x, y, buckets=None, single=False):
+	xv, xe = _plotColumns(x);
+	yv, ye = _plotColumns(y);
+	if len(xv) != len(yv):
+		raise ValueError, "x and y must have the same number of points";
+
+	if buckets:
+		keep= decimate_minmax(yv, buckets);
+		xv, xe, yv, ye = xv[keep], xe[keep], yv[keep], ye[keep];
+
+	records= numpy.empty((len(xv), 4), dtype=("<f4" if single else "<f8"));
+	records[:, 0]= xv;
+	records[:, 1]= yv;
+	records[:, 2]= xe;
+	records[:, 3]= ye;
+	records.tofile(fileN);
+
+	return len(records);
+
+# write a gnuplot script for plotting a binary data file written by write_gnuplot_binary()
+#	errorbars: (str) gnuplot style to plot with - "xyerrorbars", "yerrorbars", "xerrorbars", or "points"
+#	output: (str) file for gnuplot to write the plot to (if not given, gnuplot's default is used)
+#	terminal: (str) gnuplot terminal to use, i.e. "latex" or "png"
+def write_gnuplot_script (fileN, dataFileN, xlabel=None, ylabel=None, title=None,
+						  errorbars="xyerrorbars", single=False, output=None, terminal=None):
+	columns= {"xyerrorbars": "1:2:3:4", "yerrorbars": "1:2:4", "xerrorbars": "1:2:3", "points": "1:2"};
+	try:
+		using= columns[errorbars];
+	except KeyError:
+		raise ValueError, "Unknown plot style '%s'" % (errorbars);
+
+	lines= [];
+	if terminal:
+		lines.append("set terminal %s" % (terminal));
+	if output:
+		lines.append("set output \"%s\"" % (output));
+	if xlabel:
+		lines.append("set xlabel \"%s\"" % (xlabel));
+	if ylabel:
+		lines.append("set ylabel \"%s\"" % (ylabel));
+	if title:
+		lines.append("set title \"%s\"" % (title));
+	lines.append("set grid");
+	lines.append("plot '%s' binary format='%s' endian=little using %s with %s notitle" %
+				 (dataFileN, _gnuplotFormat(4, single), using, errorbars));
+
+	f= open(fileN, 'w');
+	f.write("\n".join(lines) + "\n");
+	f.close();
+
+# write a plot of y vs x for gnuplot - data goes in <fileN>.bin, and the script to plot it in <fileN>.plt
+#	other args: see write_gnuplot_binary() and write_gnuplot_script()
+#	< returns: (int) number of points written
+def write_gnuplot_plot (fileN, x, y, xlabel=None, ylabel=None, title=None, buckets=None, single=False,
+						errorbars="xyerrorbars", output=None, terminal=None):
+	count= write_gnuplot_binary(fileN + ".bin", x, y, buckets, single);
+	write_gnuplot_script(fileN + ".plt", fileN + ".bin", xlabel, ylabel, title, errorbars, single, output, terminal);
+	return count;
@@ -7,6 +7,30 @@ import decimal
 from decimal import Decimal as D
 import decimaltools as DTools
 import math
+import re
+from fractions import Fraction
+import contextlib
+import functools
+import threading
+
+# shortcuts for creating/initialising immutable objects
+_newObject = object.__new__;
+_setAttr = object.__setattr__;
+
+###################################
+# Units - Dimensions
+
+# ids for the types of measurement that units can be used for
+DIM_MASS = 0;
+DIM_LENGTH = 1;
+DIM_TIME = 2;
+
+# number of dimensions (DIM_*) that units can be combined over
+NUM_DIMENSIONS = 3;
+
+# exponents/units vectors for things without any dimensions
+_NO_DIMS = (0,) * NUM_DIMENSIONS;
+_NO_UNITS = (None,) * NUM_DIMENSIONS;
 
 ###################################
 # Units - Single
@@ -19,6 +43,11 @@ class Unit:
 	base = 10;				# size of steps for this type of unit
 	power = 1;				# how unit compares to other ones (relative to base)
 	is_SI = False;			# unit is SI unit
+	dimension = None;		# type of measurement (DIM_*) this unit is for
+	
+	# Type Information - FILLED IN BY THE UNIT REGISTRY (see registerUnit())
+	scale = D(1);			# size of unit, relative to the other units for the same dimension
+	dims = _NO_DIMS;		# exponents vector for this unit (i.e. 1 for its dimension)
 	
 	# Return string representation for console use
 	def __repr__ (self):
@@ -28,36 +57,37 @@ class Unit:
 	def __str__ (self):
 		return self.unit_symbol;
 		
+	# Units are equal if they are the same type of unit (instances carry no state of their own)
+	def __eq__ (self, other):
+		return isinstance(other, Unit) and (self.__class__ is other.__class__);
+		
+	def __ne__ (self, other):
+		return not self.__eq__(other);
+		
+	def __hash__ (self):
+		return hash(self.__class__);
+		
 	# check if the provided unit is the same type of measurement as us
 	def sameMeasurement (self, other):
 		# sanity check
-		if isinstance(other, Unit) == False:
+		try:
+			otherDim = other.dimension;
+		except AttributeError:
 			raise TypeError, "Not a unit!";
 		
-		# if base step is not equal, and/or units are of not same type of measurement
-		# no conversion needed, so conversion factor is simply 1
-		if isinstance(self, MassUnit):
-			return isinstance(other, MassUnit);
-		elif isinstance(self, LengthUnit):
-			return isinstance(other, LengthUnit);
-		elif isinstance(self, TimeUnit):
-			return isinstance(other, TimeUnit);
-			
-		# not the same type
-		return False;
+		# units without a dimension (i.e. dummy units) never match anything
+		# (and combined units only match if they're equivalent to a single unit)
+		return (self.dimension is not None) and ((self.dimension == otherDim) or (self.dims == other.dims));
 		
 	# Get conversion factor, given another unit, to convert from that unit to us
 	# XXX we may have reversed the order of the naming vs usage :/
 	def conversionFactor (self, other):
-		# check if same type of measurement
-		if self.sameMeasurement(other) == False:
-			return D(1);
-		
-		# assume valid types that need converting now (base units should be the same)
-		if self.power != other.power:
-			return D(other.base ** other.power) / D(self.base ** self.power); 
-		else:
-			return D(1); # no conversion needed...
+		# precomputed by the registry for single units
+		try:
+			return _conversionFactors[(other.__class__, self.__class__)];
+		except KeyError:
+			# combined units, or units for other types of measurement
+			return _combinedConversion(other, self);
 
 # dummy unit - placeholder which does nothing
 class DummyUnit(Unit):
@@ -70,6 +100,7 @@ class MassUnit(Unit):
 	# Type Information
 	unit_name = "Mass";		# name of unit for help info
 	base = 10;				# size of steps for this type of unit
+	dimension = DIM_MASS;	# type of measurement
 	
 
 # kilograms (SI)
@@ -94,6 +125,7 @@ class LengthUnit(Unit):
 	# Type Information
 	unit_name = "Length";	# name of unit for help info
 	base = 10;				# size of steps for this type of unit
+	dimension = DIM_LENGTH;	# type of measurement
 	
 
 # kilometres
@@ -101,7 +133,7 @@ class KilometreLengthUnit(LengthUnit):
 	# Type Information
 	unit_symbol = "km";			# 'symbol' to print beside values
 	unit_name = "Length (km)";	# name of unit for help info
-	power = 7;					# how unit compares to other ones
+	power = 6;					# how unit compares to other ones
 	
 # meters (SI)
 class MetreLengthUnit(LengthUnit):
@@ -132,10 +164,11 @@ class TimeUnit(Unit):
 	# Type Information
 	unit_name = "Time";		# name of unit for help info
 	base = 60;				# size of steps for this type of unit
+	dimension = DIM_TIME;	# type of measurement
 	
 
 # seconds (SI)
-class SecondTimeUnit(MassUnit):
+class SecondTimeUnit(TimeUnit):
 	# Type Information
 	unit_symbol = "s";			# 'symbol' to print beside values
 	unit_name = "Time (s)";		# name of unit for help info
@@ -143,12 +176,80 @@ class SecondTimeUnit(MassUnit):
 	is_SI = True;				# unit is SI unit
 	
 # minutes
-class MinuteTimeUnit(MassUnit):
+class MinuteTimeUnit(TimeUnit):
 	# Type Information
 	unit_symbol = "min";		# 'symbol' to print beside values
 	unit_name = "Time (min)";	# name of unit for help info
 	power = 1;					# how unit compares to other ones
 	
+###################################
+# Units - Registry
+
+# constant for 'no conversion needed'
+_ONE = D(1);
+
+# decimal context used for the scales of units and the conversion factors between them
+#	- these are cached and shared by all threads, so they must not depend on whatever
+#	  precision happened to be in use by the calculation which needed them first
+_UNITS_CONTEXT = decimal.Context(prec=28);
+
+# all registered unit classes
+_unitClasses = [];
+
+# conversion factors between pairs of units for the same measurement
+#	(fromClass, toClass) : Decimal
+_conversionFactors = {};
+
+# registered unit classes by their symbols (see parseUnits())
+#	symbol : unit class
+_unitSymbols = {};
+
+# SI unit for each type of measurement (see siUnits())
+#	dimension : Unit (instance)
+_siUnits = {};
+
+# register a unit class, so that conversions between it and the other units for the 
+# same type of measurement can be done via a single lookup (no need to recompute them each time)
+#	- all the standard units are registered on import, but custom units will need to be too
+def registerUnit (unitClass):
+	# sanity check
+	if issubclass(unitClass, Unit) == False:
+		raise TypeError, "Unit class must be a subclass of Unit";
+	if unitClass.dimension is None:
+		raise ValueError, "Unit class must have a dimension";
+		
+	# calculate canonical scale and exponents vector for this unit, once
+	with decimal.localcontext(_UNITS_CONTEXT):
+		unitClass.scale = D(unitClass.base) ** unitClass.power;
+	
+	dims = [0] * NUM_DIMENSIONS;
+	dims[unitClass.dimension] = 1;
+	unitClass.dims = tuple(dims);
+	
+	if unitClass not in _unitClasses:
+		_unitClasses.append(unitClass);
+	if unitClass.unit_symbol:
+		_unitSymbols[unitClass.unit_symbol] = unitClass;
+	if unitClass.is_SI:
+		_siUnits[unitClass.dimension] = unitClass();
+	
+	# no conversion needed to itself
+	_conversionFactors[(unitClass, unitClass)] = _ONE;
+	
+	# add conversions to/from all the other units for the same measurement
+	for other in _unitClasses:
+		if (other is not unitClass) and (other.dimension == unitClass.dimension):
+			_conversionFactors[(other, unitClass)] = _UNITS_CONTEXT.divide(other.scale, unitClass.scale);
+			_conversionFactors[(unitClass, other)] = _UNITS_CONTEXT.divide(unitClass.scale, other.scale);
+	
+	return unitClass;
+
+# register the standard units
+for _unitClass in (KilogramMassUnit, GramMassUnit,
+				   KilometreLengthUnit, MetreLengthUnit, CentimetreLengthUnit, MillimetreLengthUnit,
+				   SecondTimeUnit, MinuteTimeUnit):
+	registerUnit(_unitClass);
+	
 ###################################
 # Units - Combinations of them
 	
@@ -159,7 +260,7 @@ class MeasurementUnit:
 	
 	# instance vars
 	unit= None;		# unit used here
-	power= 1;		# i.e. unit^power
+	power= 1;		# i.e. unit^power (int, or Fraction for roots)
 	
 	def __init__ (self, unit, power=1):
 		# sanity checks
@@ -168,142 +269,400 @@ class MeasurementUnit:
 		else:
 			raise TypeError, "Unit provided must be an instance of Unit";
 			
-		if type(power) != int:
-			raise TypeError, "Power must be an integer";
+		if type(power) not in (int, long, Fraction):
+			raise TypeError, "Power must be an integer (or a Fraction)";
 		else:
 			self.power= power;
 		
 	# Return string representation for console use
 	def __repr__ (self):
-		return "MeasurementUnit(%s, %d)" % (repr(self.unit), self.power)
+		return "MeasurementUnit(%s, %s)" % (repr(self.unit), repr(self.power))
 		
 	# Return string representation for user output
 	def __str__ (self):
 		# unit^pow
-		return "%s^%d" % (self.unit, self.power)
-		
+		return "%s^%s" % (self.unit, self.power)
 	
-	# type-specific tools -------------------------------
+# ---	
+
+# Combined units - product of several units raised to (integer) powers, i.e. kg.m^2.s^-2
+#
+# This is stored as a fixed-length vector of exponents (one per dimension - DIM_*), along with 
+# the unit used for each of those dimensions, and the overall scale of the combination.
+#
+# Combined units are immutable and interned, so that there is only ever a single instance 
+# for each combination (allowing cheap comparisons, and for the results of operations on
+# them to be cached - see multiplyUnits(), divideUnits(), powerUnits()).
+class CombinedUnits(object):
+	__slots__ = ('dimUnits', 'dims', 'scale', 'units');
 	
-	# check if unit is combinable with measurement
-	def combinableUnit (self, unit):
-		# firstly, the measurement type test
-		if self.unit.sameMeasurement(unit) == False:
-			return False;
-			
-		# now the specific unit type test
-		if isinstance(unit, self.__class__) == False:
-			# for now, not acceptable - will form result in another measurement in vars
-			return False;
-		
-		# unit is ok
-		return True;
+	# instance variables
+	#	dimUnits: (tuple of Unit/None) unit used for each dimension
+	#	dims: (tuple of int) exponent for each dimension
+	#	scale: (Decimal) size of these units, relative to combinations of the 'scale 1' units
+	#	units: (tuple of MeasurementUnit) the non-cancelled parts of this combination, for display
 	
-	# 'add' power reference
-	def add (self, other):
-		self.power += 1;
-		
-	# 'subtract' power reference
-	def subtract (self):
-		self.power -= 1;
-		
-	# combine with another measurement
-	# 	- assumes sanity checks done
-	def combine (self, other):
-		# simply combine the powers now, since units are the same 
-		self.power += other.power;
+	# combined units are never a single type of measurement (see Unit.dimension)
+	dimension = None;
+	
+	# all the combinations created so far
+	#	((unit classes), (dims)) : CombinedUnits
+	_interned = {};
 	
-# ---	
-
-# Dummy combined unit class - just store all the provided units
-class CombinedUnits:
 	# class stuff ------------------------------
-	def __init__ (self, initialValues=[]):
-		# init storage
-		self.units = [];
+	
+	# create a combination of the provided units 
+	#	initialValues: (list of Unit/MeasurementUnit) units to multiply together
+	def __new__ (cls, initialValues=[]):
+		dimUnits= list(_NO_UNITS);
+		dims= list(_NO_DIMS);
 		
-		# store provided values
 		for val in initialValues:
-			self.addUnit(val);
+			if isinstance(val, Unit):
+				unit, power = val, 1;
+			elif isinstance(val, MeasurementUnit):
+				unit, power = val.unit, val.power;
+			else:
+				raise TypeError, "Not a unit";
+			
+			# dummy units have no effect
+			dim= unit.dimension;
+			if dim is None:
+				continue;
+				
+			# only one unit can be used for each type of measurement (there is nowhere to put conversion factors)
+			if dims[dim] and (dimUnits[dim] != unit):
+				raise ValueError, "Cannot combine different units for the same type of measurement (%s, %s)" % (repr(dimUnits[dim]), repr(unit));
+			
+			dimUnits[dim]= unit;
+			dims[dim] += power;
+		
+		return CombinedUnits._intern(dimUnits, dims);
+		
+	# get the (single) instance for the given combination
+	@staticmethod
+	def _intern (dimUnits, dims):
+		# units for cancelled-out dimensions are irrelevant
+		dimUnits= tuple([(unit if power else None) for unit, power in zip(dimUnits, dims)]);
+		dims= tuple(dims);
+		
+		key= (tuple([(unit.__class__ if unit else None) for unit in dimUnits]), dims);
+		try:
+			return CombinedUnits._interned[key];
+		except KeyError:
+			pass;
+			
+		# create a new one
+		self= _newObject(CombinedUnits);
+		_setAttr(self, 'dimUnits', dimUnits);
+		_setAttr(self, 'dims', dims);
+		
+		scale= _ONE;
+		with decimal.localcontext(_UNITS_CONTEXT):
+			for unit, power in zip(dimUnits, dims):
+				if type(power) is Fraction:
+					# roots - Decimal can't take Fractions as powers directly
+					scale *= (unit.scale ** power.numerator) ** (D(1) / D(power.denominator));
+				elif power:
+					scale *= unit.scale ** power;
+		_setAttr(self, 'scale', scale);
+		
+		_setAttr(self, 'units', tuple([MeasurementUnit(unit, power) for unit, power in zip(dimUnits, dims) if power]));
+		
+		# another thread may have created it in the meantime, and there must only be one
+		return CombinedUnits._interned.setdefault(key, self);
+		
+	# prevent modification (instances are shared)
+	def __setattr__ (self, name, value):
+		raise AttributeError, "CombinedUnits is immutable";
+		
+	# pickling support - recreate (and reintern) from the parts
+	def __reduce__ (self):
+		return (CombinedUnits, (list(self.units),));
 	
 	def __repr__ (self):
-		return "CombinedUnits(%s)" % (repr(self.units));
+		return "CombinedUnits(%s)" % (repr(list(self.units)));
 		
 	def __str__ (self):
-		# loop over measurements, getting a list of the units
-		result = "";
-		for unit in self.units:
-			# if power is 0, don't show, since something cancelled it out
-			if unit.power != 0:
-				# TODO: should we do any fancy grouping around these?
-				result += str(unit);
-			
-		return result;
+		# i.e. kg.m^2.s^-2
+		parts= [];
+		for mUnit in self.units:
+			if mUnit.power == 1:
+				parts.append(str(mUnit.unit));
+			else:
+				parts.append(str(mUnit));
+		
+		return ".".join(parts);
 	
 	# tools -------------------------------------
 	
-	# add a unit to the list (result of multiplication) 
+	# check if the provided units are the same type of measurement as us
+	def sameMeasurement (self, other):
+		# sanity check
+		try:
+			otherDims = other.dims;
+		except AttributeError:
+			raise TypeError, "Not a unit!";
+		
+		return (self.dims == otherDims) and (self.dims != _NO_DIMS);
+		
+	# Get conversion factor, given other units, to convert from those units to us
+	def conversionFactor (self, other):
+		return _combinedConversion(other, self);
+	
+	# get the units resulting from multiplying by the given unit (result of multiplication) 
 	def addUnit (self, unit):
-		if isinstance(unit, Unit):
-			# check if any existing measurement will take it
-			for mUnit in self.units:
-				# combine then finish off
-				if mUnit.combinableUnit(unit):
-					mUnit.add();
-					break;
-			else:
-				# add a new measurement, defaulting to single power
-				self.units.append(MeasurementUnit(unit));
-		elif isinstance(unit, MeasurementUnit):
-			# check if any existing measurement just needs some power adding
-			for mUnit in self.units:
-				# combine then finish off
-				if mUnit.combinableUnit(unit.unit):
-					mUnit.combine(unit);
-					break;
-			else:
-				# add the given unit
-				self.units.append(unit);
-		else:
-			raise TypeError, "Not a unit";
+		if isinstance(unit, MeasurementUnit):
+			unit= CombinedUnits([unit]);
+		
+		newUnits, convFac = multiplyUnits(self, unit);
+		if convFac != _ONE:
+			raise ValueError, "Cannot combine different units for the same type of measurement";
+		return newUnits;
 			
-	# remove a unit (result of division)
+	# get the units resulting from dividing by the given unit (result of division)
 	def remove (self, unit):
-		if isinstance(unit, Unit):
-			# check if any existing measurement will take it
-			for mUnit in self.units:
-				# combine then finish off
-				if mUnit.combinableUnit(unit):
-					mUnit.subtract();
-					break;
-			else:
-				# add a new measurement, defaulting to single negative power
-				self.units.append(MeasurementUnit(unit, -1));
-		elif isinstance(unit, MeasurementUnit):
-			# check if any existing measurement just needs some power adding
-			for mUnit in self.units:
-				# combine then finish off
-				if mUnit.combinableUnit(unit.unit):
-					mUnit.combine(unit);
-					break;
-			else:
-				# add the given unit, but make sure that it is negative
-				unit.power= -abs(unit.power);
-				self.units.append(unit);
+		if isinstance(unit, MeasurementUnit):
+			# always remove, even if the power given was negative
+			unit= CombinedUnits([MeasurementUnit(unit.unit, abs(unit.power))]);
+		
+		newUnits, convFac = divideUnits(self, unit);
+		if convFac != _ONE:
+			raise ValueError, "Cannot combine different units for the same type of measurement";
+		return newUnits;
+
+# ---
+
+# cached results of unit operations
+_multiplyCache = {};	# (a, b) : (units, factor)
+_divideCache = {};		# (a, b) : (units, factor)
+_powerCache = {};		# (a, n) : units
+_conversionCache = {};	# (from, to) : factor
+
+# get the per-dimension (units, exponents) vectors for the given units
+def _unitsVector (units):
+	if units is None:
+		return _NO_UNITS, _NO_DIMS;
+	elif isinstance(units, CombinedUnits):
+		return units.dimUnits, units.dims;
+	elif units.dimension is None:
+		# dummy units - no dimensions
+		return _NO_UNITS, _NO_DIMS;
+	else:
+		dimUnits= list(_NO_UNITS);
+		dimUnits[units.dimension]= units;
+		return tuple(dimUnits), units.dims;
+
+# get the simplest representation of the given combination of units 
+#	- None when all dimensions have cancelled out, or a single Unit when only one is left
+def _makeUnits (dimUnits, dims):
+	used= [dim for dim in xrange(NUM_DIMENSIONS) if dims[dim]];
+	
+	if len(used) == 0:
+		return None;
+	elif (len(used) == 1) and (dims[used[0]] == 1):
+		return dimUnits[used[0]];
+	else:
+		return CombinedUnits._intern(dimUnits, dims);
+
+# get the overall scale of the given units
+def _unitsScale (units):
+	if units is None:
+		return _ONE;
+	return units.scale;
+
+# get factor to convert from one set of units to another (for the same type of measurement)
+def _combinedConversion (fromUnits, toUnits):
+	key= (fromUnits, toUnits);
+	try:
+		return _conversionCache[key];
+	except KeyError:
+		pass;
+		
+	if toUnits.sameMeasurement(fromUnits):
+		convFac= _UNITS_CONTEXT.divide(fromUnits.scale, toUnits.scale);
+		if convFac == _ONE:
+			convFac= _ONE;
+	else:
+		convFac= _ONE;
+	
+	_conversionCache[key]= convFac;
+	return convFac;
+	
+# get the units resulting from multiplying values with units a and b together
+#	< returns: (units, factor) - where the product of the values needs to be multiplied by 'factor' 
+#			   to express the result in 'units' (i.e. when a and b use different units for the same measurement)
+def multiplyUnits (a, b):
+	key= (a, b);
+	try:
+		return _multiplyCache[key];
+	except KeyError:
+		pass;
+	
+	aUnits, aDims = _unitsVector(a);
+	bUnits, bDims = _unitsVector(b);
+	
+	# units from a take priority over those from b
+	dimUnits= [(aUnits[dim] if aDims[dim] else bUnits[dim]) for dim in xrange(NUM_DIMENSIONS)];
+	dims= [(aDims[dim] + bDims[dim]) for dim in xrange(NUM_DIMENSIONS)];
+	newUnits= _makeUnits(dimUnits, dims);
+	
+	convFac= _UNITS_CONTEXT.divide(_UNITS_CONTEXT.multiply(_unitsScale(a), _unitsScale(b)), _unitsScale(newUnits));
+	if convFac == _ONE:
+		convFac= _ONE;
+	
+	result= _multiplyCache[key]= (newUnits, convFac);
+	return result;
+	
+# get the units resulting from dividing values with units a by values with units b
+#	< returns: (units, factor) - as for multiplyUnits()
+def divideUnits (a, b):
+	key= (a, b);
+	try:
+		return _divideCache[key];
+	except KeyError:
+		pass;
+	
+	result= _divideCache[key]= multiplyUnits(a, powerUnits(b, -1));
+	return result;
+	
+# get the units resulting from raising values with the given units to the power n
+#	n: (int, or real number) - for non-integer powers, the exponents of the resulting units 
+#	   are stored as Fractions (i.e. s^1/2 for square-roots)
+def powerUnits (units, n):
+	key= (units, n);
+	try:
+		return _powerCache[key];
+	except KeyError:
+		pass;
+	
+	dimUnits, dims = _unitsVector(units);
+	
+	if type(n) in (int, long):
+		newDims= [(power * n) for power in dims];
+	else:
+		# keep the exponents exact, but as plain ints where possible
+		n= Fraction(str(n)).limit_denominator(1000);
+		newDims= [(power * n) for power in dims];
+		newDims= [(int(power) if (power.denominator == 1) else power) for power in newDims];
+	
+	newUnits= _powerCache[key]= _makeUnits(dimUnits, newDims);
+	return newUnits;
+
+# ---
+
+# one term of a units string - [operator] symbol [^power]
+_unitTermRE = re.compile(r"\s*([.*/]?)\s*([^\s.*/^()]+)\s*(?:\^\s*(\(\s*-?\d+\s*/\s*\d+\s*\)|-?\d+(?:/\d+)?))?\s*");
+
+# cached results of parseUnits()
+_parseCache = {};	# text : units
+
+# get the units described by the given string of (registered) unit symbols
+#	text: (str) i.e. "mm", "kg.m^2.s^-2", "m/s^2", "s^1/2". Empty strings (or "1") are for no units
+#	< returns: (Unit or CombinedUnits or None) units, in the same form as arithmetic on PhysNums gives
+def parseUnits (text):
+	try:
+		return _parseCache[text];
+	except KeyError:
+		pass;
+	
+	stripped= text.strip();
+	if stripped in ("", "1"):
+		return None;
+	
+	units= None;
+	pos= 0;
+	while pos < len(stripped):
+		match= _unitTermRE.match(stripped, pos);
+		if (match is None) or (bool(match.group(1)) != (pos > 0)):
+			raise ValueError, "Invalid units '%s'" % (text);
+		op, symbol, power = match.groups();
+		pos= match.end();
+		
+		try:
+			unit= _unitSymbols[symbol]();
+		except KeyError:
+			raise ValueError, "Unknown unit '%s'" % (symbol);
+		
+		if power:
+			power= Fraction(power.strip("() "));
+			if power.denominator == 1:
+				power= int(power);
+			unit= powerUnits(unit, power);
+		
+		if op == "/":
+			units, convFac = divideUnits(units, unit);
 		else:
-			raise TypeError, "Not a unit";
+			units, convFac = multiplyUnits(units, unit);
+		if convFac is not _ONE:
+			raise ValueError, "Cannot combine different units for the same type of measurement ('%s')" % (text);
+	
+	_parseCache[text]= units;
+	return units;
+	
+# ---
+
+# cached results of siUnits()
+_siCache = {};	# units : SI units
+
+# get the SI version of the given units (i.e. mm -> m, g.min^-2 -> kg.s^-2)
+#	- the unit for each dimension is swapped for the SI one for that type of measurement 
+#	  (and left alone if there isn't one registered)
+def siUnits (units):
+	try:
+		return _siCache[units];
+	except KeyError:
+		pass;
+	
+	dimUnits, dims = _unitsVector(units);
+	if any(dims):
+		dimUnits= [(_siUnits.get(dim, unit) if unit else None) for dim, unit in enumerate(dimUnits)];
+		result= _makeUnits(dimUnits, dims);
+	else:
+		# nothing to convert (no units, or dummy units)
+		result= units;
+	
+	_siCache[units]= result;
+	return result;
 	
 ###################################
-# Physics Number
+# Numeric Backends
 
-# Special representation of numbers as value + absolute uncertainty + units, 
-# as is required in Physics Calculations. 
-class PhysNum:
-	# helper utility functions for class ---------------
+# Numeric backend - defines the type of numbers used to store the values/uncertainties of PhysNums,
+# and how other numbers get converted to them
+#	- Decimal (default) is exact, and is best for lab reports
+#	- binary floats are much faster, for bulk processing where 28 significant digits aren't needed
+class NumericBackend(object):
+	name = "";		# name used to refer to this backend
+	zero = None;	# 0 in the backend's number type
+	one = None;		# 1 in the backend's number type
+	
+	# convert the given number (int, float, Decimal, or numeric string) to the backend's number type
+	def number (self, arg):
+		raise NotImplementedError;
+		
+	# convert a Decimal constant (i.e. unit conversion factor) to the backend's number type
+	def constant (self, arg):
+		raise NotImplementedError;
+		
+	# get the square-root of the given (non-negative) number
+	def sqrt (self, n):
+		raise NotImplementedError;
+		
+	# get a version of the given number which is cheap to hash (for use in cache keys)
+	def cacheKey (self, n):
+		return n;
+		
+	def __repr__ (self):
+		return "<%s numeric backend>" % (self.name);
 
-	# validate numeric arguments to yield 'Decimal' objects
-	@staticmethod
-	def _validateNumArg (arg):
+# Decimal backend - values are stored as Decimal()
+class DecimalBackend(NumericBackend):
+	name = "decimal";
+	zero = D(0);
+	one = D(1);
+	
+	def number (self, arg):
 		# check for decimal 
 		if type(arg) == D:
 			return arg;
@@ -322,32 +681,536 @@ class PhysNum:
 		# non numeric types can't be used!
 		raise TypeError, "Non-numeric type encountered!";
 		
+	def constant (self, arg):
+		return arg;
+		
+	def sqrt (self, n):
+		# decimal provides its own precise sqrt func
+		return D(n).sqrt();
+		
+	def cacheKey (self, n):
+		# hashing Decimals is slow, but their string forms are exact too
+		return str(n);
+
+# Float backend - values are stored as (binary) floats
+class FloatBackend(NumericBackend):
+	name = "float";
+	zero = 0.0;
+	one = 1.0;
+	
+	def number (self, arg):
+		# floats are used as-is 
+		if type(arg) == float:
+			return arg;
+		
+		# everything else numeric can be converted directly 
+		# (no need to go via strings for Decimals)
+		if type(arg) in (int, long, D, str):
+			return float(arg);
+			
+		# non numeric types can't be used!
+		raise TypeError, "Non-numeric type encountered!";
+		
+	def constant (self, arg):
+		return float(arg);
+		
+	def sqrt (self, n):
+		return math.sqrt(n);
+
+# ---
+
+# available backends
+_backends = {
+	DecimalBackend.name : DecimalBackend(),
+	FloatBackend.name : FloatBackend(),
+};
+
+# get the backend with the given name
+#	backend: (str or NumericBackend) name of backend - "decimal" or "float"
+def _lookupBackend (backend):
+	if isinstance(backend, NumericBackend):
+		return backend;
+	try:
+		return _backends[backend];
+	except KeyError:
+		raise ValueError, "Unknown numeric backend '%s'" % (backend);
+
+# settings for the calculations done by each thread (see CalcContext)
+#	- threads which haven't chosen their own backend use the one for the whole process (the class attribute)
+class _ThreadState(threading.local):
+	backend = _backends[DecimalBackend.name];
+	
+	def __init__ (self):
+		# settings to restore when leaving each active CalcContext (innermost last)
+		self.saved= [];
+		
+	# get the backend chosen by this thread only (or None if it uses the one for the whole process)
+	def getOwnBackend (self):
+		return self.__dict__.get('backend');
+		
+	# set the backend for this thread only (or None to use the one for the whole process)
+	def setOwnBackend (self, backend):
+		if backend is None:
+			self.__dict__.pop('backend', None);
+		else:
+			self.backend= backend;
+
+_state = _ThreadState();
+
+# get the numeric backend currently in use (by this thread)
+def getNumericBackend ():
+	return _state.backend;
+
+# set the numeric backend to use for all new PhysNums (for the whole process)
+#	backend: (str) name of backend - "decimal" or "float"
+#	< returns: (NumericBackend) the backend that was in use before
+#
+# NOTE: PhysNums created with one backend should not be combined with those created with another
+# NOTE: threads which are using their own backend (i.e. with numericBackend()/CalcContext) keep using it
+def setNumericBackend (backend):
+	backend= _lookupBackend(backend);
+	
+	oldBackend = _state.backend;
+	_ThreadState.backend = backend;
+	_state.setOwnBackend(None);
+	return oldBackend;
+
+# context manager to use the given numeric backend for a block of code only
+# (only for the current thread - other threads are not affected)
+#	i.e. 
+#		with numericBackend("float"):
+#			...
+@contextlib.contextmanager
+def numericBackend (backend):
+	backend= _lookupBackend(backend);
+	
+	oldBackend = _state.getOwnBackend();
+	_state.setOwnBackend(backend);
+	try:
+		yield backend;
+	finally:
+		_state.setOwnBackend(oldBackend);
+	
+###################################
+# Calculation Context
+
+# Settings for calculations - the numeric backend, and the decimal context (precision, rounding)
+#
+# These only apply to the thread using them (without changing the settings for the whole
+# process), so several threads can each do calculations with their own settings at once.
+# The same context can also be given to other threads (i.e. workers in a thread pool),
+# so that they do their calculations in exactly the same way as the thread which made it.
+#
+#	i.e.
+#		with CalcContext(prec=10):
+#			...
+#
+#		context= captureContext();
+#		results= pool.map(context.wrap(calc_n), datasets);
+class CalcContext(object):
+	# class stuff ----------------------------------
+	
+	# constructor
+	#	backend: (str or NumericBackend) numeric backend to use. If not given, the current one is used
+	#	decimalContext: (decimal.Context) decimal context to use (a copy is kept). If not given, the current one is used
+	#	prec, rounding: settings to change from those of the decimal context
+	def __init__ (self, backend=None, decimalContext=None, prec=None, rounding=None):
+		if backend is None:
+			self.backend= _state.backend;
+		else:
+			self.backend= _lookupBackend(backend);
+		
+		self.decimal= (decimalContext or decimal.getcontext()).copy();
+		self.decimal.clear_flags();
+		if prec is not None:
+			self.decimal.prec= prec;
+		if rounding is not None:
+			self.decimal.rounding= rounding;
+			
+	def __repr__ (self):
+		return "<CalcContext - %s backend, prec=%d, %s>" % (self.backend.name, self.decimal.prec, self.decimal.rounding);
+		
+	# usage ----------------------------------------
+	
+	# use these settings (for this thread) until the end of the block
+	#	- the decimal context is copied, so that threads sharing this context don't affect each other
+	def __enter__ (self):
+		localContext= decimal.localcontext(self.decimal);
+		_state.saved.append((_state.getOwnBackend(), localContext));
+		
+		_state.setOwnBackend(self.backend);
+		localContext.__enter__();
+		return self;
+		
+	def __exit__ (self, excType, excValue, traceback):
+		backend, localContext = _state.saved.pop();
+		localContext.__exit__(excType, excValue, traceback);
+		_state.setOwnBackend(backend);
+		return False;
+		
+	# call the given function using these settings
+	def run (self, func, *args, **kwargs):
+		with self:
+			return func(*args, **kwargs);
+			
+	# get a version of the given function which always uses these settings
+	# (whichever thread it ends up being called from)
+	def wrap (self, func):
+		@functools.wraps(func)
+		def wrapped_func (*args, **kwargs):
+			with self:
+				return func(*args, **kwargs);
+		return wrapped_func;
+
+# get the settings currently in use by this thread, to use them elsewhere (i.e. in other threads)
+#	< returns: (CalcContext)
+def captureContext ():
+	return CalcContext();
+	
+###################################
+# Function Cache
+
+# Least-recently-used cache for the results of PhysNum.calcFunc()
+#
+# Only functions which have been marked as pure (i.e. their results only depend on their
+# arguments - see pure()) are cached. Results are kept for each combination of:
+#	(function, value, uncertainty, units, numeric backend, decimal precision/rounding)
+#
+# The entries are kept in a circular doubly-linked list (in order of use), along with a dict
+# to find them, so that each lookup only needs to hash the key once.
+#	- each entry (link) is a list: [previous link, next link, key, result]
+#	- the list is locked while it is being changed, so the cache can be shared by several threads
+class FuncCache(object):
+	# class stuff ----------------------------------
+	
+	# constructor
+	#	maxSize: (int) maximum number of results to keep - the least recently used ones are dropped first
+	def __init__ (self, maxSize=1024):
+		if maxSize < 1:
+			raise ValueError, "Cache size must be at least 1";
+		
+		self.maxSize= maxSize;
+		self.links= {};		# key : link
+		self.lock= threading.Lock();
+		
+		# the list starts/ends at the root link (least recently used entry comes after the root)
+		self.root= [];
+		self.root[:]= [self.root, self.root, None, None];
+		
+		# statistics
+		self.hits= 0;
+		self.misses= 0;
+		self.evictions= 0;
+		
+	def __repr__ (self):
+		return "<FuncCache - %d/%d entries, %d hits, %d misses, %d evictions>" % \
+			(len(self.links), self.maxSize, self.hits, self.misses, self.evictions);
+			
+	def __len__ (self):
+		return len(self.links);
+		
+	# access ---------------------------------------
+	
+	# get the result stored for the given key (marking it as the most recently used)
+	#	< returns: (PhysNum) the result, or None if it isn't in the cache
+	def lookup (self, key):
+		with self.lock:
+			link= self.links.get(key);
+			if link is None:
+				self.misses += 1;
+				return None;
+			
+			# move to the end of the list (most recently used)
+			prev, next, key, result = link;
+			prev[1]= next;
+			next[0]= prev;
+			
+			root= self.root;
+			last= root[0];
+			last[1]= root[0]= link;
+			link[0]= last;
+			link[1]= root;
+			
+			self.hits += 1;
+			return result;
+		
+	# store the result for the given key, dropping the least recently used result if full
+	def store (self, key, result):
+		with self.lock:
+			if key in self.links:
+				# already stored (i.e. found by some other caller in the meantime)
+				self.links[key][3]= result;
+				return;
+			
+			root= self.root;
+			if len(self.links) >= self.maxSize:
+				# remove the first (least recently used) entry
+				oldest= root[1];
+				root[1]= oldest[1];
+				oldest[1][0]= root;
+				del self.links[oldest[2]];
+				self.evictions += 1;
+			
+			# add to the end of the list
+			last= root[0];
+			link= [last, root, key, result];
+			last[1]= root[0]= self.links[key]= link;
+		
+	# remove all results (and reset the statistics)
+	def clear (self):
+		with self.lock:
+			self.links.clear();
+			self.root[:]= [self.root, self.root, None, None];
+			self.hits= self.misses= self.evictions= 0;
+		
+	# get the statistics for this cache
+	#	< returns: (dict) hits, misses, evictions, size, maxSize, hitRate
+	def getStats (self):
+		lookups= self.hits + self.misses;
+		return {
+			'hits': self.hits,
+			'misses': self.misses,
+			'evictions': self.evictions,
+			'size': len(self.links),
+			'maxSize': self.maxSize,
+			'hitRate': (float(self.hits) / lookups) if lookups else 0.0,
+		};
+		
+# ---
+
+# functions which can have their results cached (see pure())
+_pureFunctions = set([
+	math.sin, math.cos, math.tan, math.asin, math.acos, math.atan,
+	math.sinh, math.cosh, math.tanh,
+	math.exp, math.log, math.log10, math.sqrt,
+	DTools.sin, DTools.cos, DTools.atan,
+	DTools.exp, DTools.ln, DTools.log10, DTools.sqrt,
+]);
+
+# cache used by PhysNum.calcFunc() (None when caching is disabled)
+_funcCache = None;
+
+# decorator - mark the given function as being pure (i.e. the result only depends on its argument,
+# and it has no side-effects), so that its results can be cached by PhysNum.calcFunc()
+#	i.e.
+#		@pure
+#		def calibrate (x):
+#			...
+def pure (func):
+	_pureFunctions.add(func);
+	return func;
+	
+# check if the given function has been marked as being pure
+def _isPure (func):
+	try:
+		return func in _pureFunctions;
+	except TypeError:
+		# unhashable callables can't have been marked
+		return False;
+	
+# enable caching of the results of PhysNum.calcFunc() for pure functions
+#	maxSize: (int) maximum number of results to keep
+#	< returns: (FuncCache) the cache now in use
+def enableFuncCache (maxSize=1024):
+	global _funcCache;
+	_funcCache= FuncCache(maxSize);
+	return _funcCache;
+	
+# disable caching of the results of PhysNum.calcFunc() (dropping any cached results)
+def disableFuncCache ():
+	global _funcCache;
+	_funcCache= None;
+	
+# get the cache used by PhysNum.calcFunc() (or None if caching is disabled)
+def getFuncCache ():
+	return _funcCache;
+	
+###################################
+# Function Derivatives
+
+# ln(10) - for derivative of log10
+_LN10 = D(10).ln();
+
+# known derivatives of functions, so that PhysNum.calcFunc() can propagate uncertainties 
+# analytically (|f'(v)| * e) instead of using the bounds f(v+e) and f(v-e)
+#	func : (derivative func, whole-array version of func, whole-array derivative)
+#	- the array versions (used by PhysNumArray.calcFunc()) are None if they aren't known
+_derivatives = {};
+
+# register the derivative of the given function, so that uncertainties can be calculated analytically
+#	func: (callable) function of a single value
+#	derivative: (callable) function giving the derivative of func at the given value
+#	arrayFunc: (callable) version of func which works on whole NumPy arrays at once (optional)
+#	arrayDerivative: (callable) version of derivative which works on whole NumPy arrays at once (optional, 
+#					 only used along with arrayFunc)
+#	< returns: func
+def registerDerivative (func, derivative, arrayFunc=None, arrayDerivative=None):
+	if (arrayFunc is None) or (arrayDerivative is None):
+		arrayFunc= arrayDerivative= None;
+	_derivatives[func]= (derivative, arrayFunc, arrayDerivative);
+	return func;
+	
+# get the registered entry for the given function (or None if it isn't known)
+def _getDerivatives (func):
+	try:
+		return _derivatives.get(func);
+	except TypeError:
+		# unhashable callables can't have been registered
+		return None;
+	
+# get the derivative of the given function (or None if it isn't known)
+def getDerivative (func):
+	entry= _getDerivatives(func);
+	return entry[0] if entry else None;
+	
+# get the whole-array versions of the given function and its derivative
+#	< returns: (array func, array derivative), or None if they aren't known
+def getArrayFunc (func):
+	entry= _getDerivatives(func);
+	if entry and (entry[1] is not None):
+		return entry[1:];
+	return None;
+	
+for _func, _derivative in {
+	math.sin : math.cos,
+	math.cos : lambda x: -math.sin(x),
+	math.tan : lambda x: 1 / math.cos(x)**2,
+	math.atan : lambda x: 1 / (1 + x*x),
+	math.exp : math.exp,
+	math.log : lambda x: 1 / x,
+	math.log10 : lambda x: 1 / (x * _state.backend.constant(_LN10)),
+	math.sqrt : lambda x: 0.5 / math.sqrt(x),
+	
+	DTools.sin : DTools.cos,
+	DTools.cos : lambda x: -DTools.sin(x),
+	DTools.atan : lambda x: 1 / (1 + x*x),
+	DTools.exp : DTools.exp,
+	DTools.ln : lambda x: 1 / x,
+	DTools.log10 : lambda x: 1 / (x * _state.backend.constant(_LN10)),
+	DTools.sqrt : lambda x: 1 / (2 * DTools.sqrt(x)),
+}.iteritems():
+	registerDerivative(_func, _derivative);
+		
+# ---
+
+# power functions created so far (so there's only one for each exponent, for caching)
+#	n : function
+_powerFuncs = {};
+
+# get the exponent (or factor) to use with the given value
+#	- Decimals and floats can't be mixed directly
+def _exponentFor (n, x):
+	if type(x) is D:
+		return D(str(n)) if (type(n) is float) else n;
+	elif type(n) is D:
+		return float(n);
+	return n;
+	
+# get the function x**n (with a known derivative), for use with calcFunc()
+#	n: (int, float, Decimal) exponent
+def powerFunc (n):
+	try:
+		return _powerFuncs[n];
+	except KeyError:
+		pass;
+	
+	def power (x):
+		return x ** _exponentFor(n, x);
+	def derivative (x):
+		return _exponentFor(n, x) * x ** _exponentFor(n - 1, x);
+	power.__name__= "power_%s" % (n);
+	
+	registerDerivative(power, derivative);
+	pure(power);
+	
+	_powerFuncs[n]= power;
+	return power;
+
+###################################
+# Physics Number
+
+# Special representation of numbers as value + absolute uncertainty + units, 
+# as is required in Physics Calculations. 
+#
+# PhysNums are immutable: operators and conversions always return new numbers 
+# (or the same number, if nothing needed to change), and never modify their operands.
+class PhysNum(object):
+	# only these attributes are stored per-instance (no __dict__)
+	__slots__ = ('v', 'e', 'units');
+	
+	# helper utility functions for class ---------------
+
+	# validate numeric arguments to yield numbers of the type used by the current
+	# numeric backend ('Decimal' objects by default)
+	@staticmethod
+	def _validateNumArg (arg):
+		return _state.backend.number(arg);
+		
 	# validate the other arg given to an arithmetic operator
-	def _validateArithArg (self, arg):
+	#	sameUnits: (bool) plain numbers are assumed to have the same units as us (i.e. for addition),
+	#			   otherwise they are treated as having no units (i.e. for multiplication)
+	def _validateArithArg (self, arg, sameUnits=True):
 		# action to take depends on what the type of the given data is
 		if type(arg) in (int, float, D):
 			# convert to a PhysNum to be able to add normally
-			arg= PhysNum(arg, 0, self.getUnits());
+			arg= PhysNum(arg, 0, (self.units if sameUnits else None));
 		elif isinstance(arg, PhysNum) == False:
-			# error.. cannot add
-			raise TypeError, "Not a numeric type";
+			# cannot handle this here, but other types (i.e. PhysNumArray) may 
+			# be able to handle it from their side, so let Python try that instead
+			return NotImplemented;
 			
 		# return the arg now that we've validated it
 		return arg;
 		
+	# create a new number directly from already validated parts, skipping the checks done by the constructor
+	#	- for internal use, where the parts are known to be the right types already
+	@staticmethod
+	def _create (v, e, units):
+		num= _newObject(PhysNum);
+		_setAttr(num, 'v', v);
+		_setAttr(num, 'e', e);
+		_setAttr(num, 'units', units);
+		return num;
+		
 	# class stuff ----------------------------------
 	
 	# instance variables
-	v= None; 		# Decimal - 'value'
-	e= None;		# Decimal - 'uncertainty'
-	units= None;	# Unit  - 'units'  
+	#	v: Decimal - 'value'
+	#	e: Decimal - 'uncertainty'
+	#	units: Unit - 'units'
 	
 	# constructor 
 	def __init__ (self, value, uncertainty=0, units=None):
 		# store arguments as instance variables after validating them first
-		self.v= PhysNum._validateNumArg(value);
-		self.e= PhysNum._validateNumArg(uncertainty);
-		self.units= units; 
+		_setAttr(self, 'v', PhysNum._validateNumArg(value));
+		_setAttr(self, 'e', PhysNum._validateNumArg(uncertainty));
+		_setAttr(self, 'units', units);
+		
+	# prevent modification of the number after it has been created
+	def __setattr__ (self, name, value):
+		raise AttributeError, "PhysNum is immutable";
+		
+	def __delattr__ (self, name):
+		raise AttributeError, "PhysNum is immutable";
+		
+	# pickling support (needed as __slots__ and __setattr__ prevent the default behaviour)
+	def __reduce__ (self):
+		return (PhysNum, (self.v, self.e, self.units));
+		
+	# equality - numbers are equal if their values, uncertainties and units are equal
+	def __eq__ (self, other):
+		if isinstance(other, PhysNum) == False:
+			return NotImplemented;
+		return (self.v == other.v) and (self.e == other.e) and (self.units == other.units);
+		
+	def __ne__ (self, other):
+		result= self.__eq__(other);
+		if result is NotImplemented:
+			return result;
+		return not result;
+		
+	def __hash__ (self):
+		return hash((self.v, self.e, self.units));
 	
 	# console representation
 	def __repr__ (self):
@@ -400,7 +1263,7 @@ class PhysNum:
 		# sanity check: if our value is 0, simply return zero instead of getting divide by zero
 		if self.v == 0:
 			# for safety, just return 0
-			return D('0');
+			return _state.backend.zero;
 		else:
 			# plus operator here forces rounding...
 			return +(self.e / self.v);
@@ -420,47 +1283,27 @@ class PhysNum:
 	
 	# assorted number ops ---------------------------
 	
-	# change the units of this number to the specified units
-	def changeUnits (self, newUnits):
-		# check if we need to do anything (i.e. not same units?)
-		# 	currently, we just check this by using the representations, which we assume will be different (no typos!)
-		ownUnits = self.getUnits();
-		if not (ownUnits or newUnits):
-			return;
-		if ownUnits.sameMeasurement(newUnits) == False:
-			return;
-		if repr(ownUnits) == repr(newUnits):
-			return;
-			
-		# get the conversion factor (going from own to new, so use new.conversion... )
-		convFac = newUnits.conversionFactor(ownUnits);
-		
-		# apply the conversion to our own values
-		self.v *= convFac;
-		self.e *= convFac;
-		
-		# set the new units
-		self.units= newUnits;
-	
-	# make a copy of this number with the units changed to the specified ones
+	# get this number with the units changed to the specified ones
+	#	- returns this number if no conversion is needed (i.e. same units, or not the same type of measurement)
 	def convertUnits (self, newUnits):
 		# check if we need to do anything (i.e. not same units?)
-		# 	currently, we just check this by using the representations, which we assume will be different (no typos!)
-		ownUnits = self.getUnits();
-		if not (ownUnits or newUnits):
-			return None;
-		if repr(ownUnits) == repr(newUnits):
-			return None;
+		ownUnits = self.units;
+		if not (ownUnits and newUnits):
+			return self;
+		if ownUnits == newUnits:
+			return self;
+		if ownUnits.sameMeasurement(newUnits) == False:
+			return self;
 			
 		# get the conversion factor (going from own to new, so use new.conversion... )
-		convFac = newUnits.conversionFactor(ownUnits);
+		convFac = _state.backend.constant(newUnits.conversionFactor(ownUnits));
 		
-		# apply the conversion to our own values
-		val= self.v * convFac;
-		err= self.e * convFac;
+		# return the new number with the conversion applied
+		return PhysNum._create(self.v * convFac, self.e * convFac, newUnits);
 		
-		# return the new type
-		return PhysNum(val, err, newUnits);
+	# change the units of this number to the specified units
+	#	- as PhysNums are immutable, this returns the converted number instead of modifying this one
+	changeUnits = convertUnits;
 	
 	# unary arithmetic operators -------------------------
 	
@@ -479,9 +1322,8 @@ class PhysNum:
 		
 	# invert the values (i.e. 1/val) - special case of division, with top numbe == 1
 	def __invert__ (self):
-		# final units are combination of these units
-		units= self.getUnits();
-		newUnits = None; # FIXME!!!!
+		# final units are the inverse of these units
+		newUnits = powerUnits(self.units, -1);
 		
 		# simply divide the absolute value
 		if self.getValue() == 0:
@@ -489,14 +1331,14 @@ class PhysNum:
 			#val= Decimal('0');
 			raise ZeroDivisionError;
 		else:
-			val= Decimal('1') / self.getValue();
+			val= _state.backend.one / self.getValue();
 		
 		# the new uncertainty is simply the sum of the fractional uncertainties of the top and bottom,
 		# multiplied by the new value. This simplifies down to being simply the uncertainty * new value
 		err= self.getUncertainty_Fractional() * val;
 		
 		# return a new number
-		return PhysNum(val, err, newUnits);
+		return PhysNum._create(val, err, newUnits);
 		
 	# arithmetic operators (LHS-default) ---------------------------
 	
@@ -504,28 +1346,32 @@ class PhysNum:
 	def __add__ (self, other):
 		# validate given arg
 		other= self._validateArithArg(other);
+		if other is NotImplemented:
+			return other;
 		
 		# change the units of the number we're adding so that they're compatible 
 		# (if same type of measurement, that is)
 		units= self.getUnits();
-		other.changeUnits(units);
+		other= other.convertUnits(units);
 		
 		# simply add the component parts, doing unit conversions on the alternate data
 		val= self.getValue() + other.getValue();
 		err= self.getUncertainty_Absolute() + other.getUncertainty_Absolute();
 		
 		# return the result
-		return PhysNum(val, err, units);
+		return PhysNum._create(val, err, units);
 		
 	# subtraction operator - returns the result as a new PhysNum
 	def __sub__ (self, other):
 		# validate given arg
 		other= self._validateArithArg(other);
+		if other is NotImplemented:
+			return other;
 		
 		# change the units of the number we're subtracting so that they're compatible 
 		# (if same type of measurement, that is)
 		units= self.getUnits();
-		other.changeUnits(units);
+		other= other.convertUnits(units);
 		
 		# subtract the values, but always add the absolute uncertainties
 		# doing unit conversions on the alternate data
@@ -533,84 +1379,82 @@ class PhysNum:
 		err= self.getUncertainty_Absolute() + other.getUncertainty_Absolute();
 		
 		# return the result
-		return PhysNum(val, err, units);
+		return PhysNum._create(val, err, units);
 	
 	# multiplication operator - return the result as a new PhysNum
 	def __mul__ (self, other):
 		# validate given arg
-		other= self._validateArithArg(other);
+		other= self._validateArithArg(other, False);
+		if other is NotImplemented:
+			return other;
 		
 		# final units are combination of these units
-		units= self.getUnits();
-		newUnits = units; # FIXME!!!!
-		
-		# change the units of the number we're multiplying with so that they're compatible 
-		# (if same type of measurement, that is)
-		other.changeUnits(units);
+		# (with a conversion factor if they use different units for the same type of measurement)
+		newUnits, convFac = multiplyUnits(self.units, other.units);
 		
 		# simply multiply the absolute value
 		val= self.getValue() * other.getValue();
+		if convFac is not _ONE:
+			val *= _state.backend.constant(convFac);
 		
 		# to obtain the absolute uncertainty, need to add the percentage/fractional ones,  
 		# then multiply this by the new value to get the new absolute value
 		err= (self.getUncertainty_Fractional() + other.getUncertainty_Fractional()) * val;
 		
 		# return a new number
-		return PhysNum(val, err, newUnits);
-		
-	# power operator - basically same as multiplication, but we can't do fractional values easily...
-	def __pow__ (self, other, modulo=0):
-		# check if other is integer 
-		# FIXME: at some point, it would be good to have this
-		if type(other) is not int:
-			raise NotImplemented, "Only integer powers allowed" 
+		return PhysNum._create(val, err, newUnits);
+		
+	# power operator - raise value to the given (integer or real) power
+	# 	the fractional uncertainty of the result is simply |n| times our fractional uncertainty
+	# 	(i.e. the same as multiplying ourself n times, but without the n steps)
+	def __pow__ (self, other, modulo=None):
+		# real powers which are really whole numbers can use the integer path
+		if type(other) not in (int, long):
+			n= PhysNum._validateNumArg(other);
+			if n == int(n):
+				other= int(n);
+		
+		if type(other) in (int, long):
+			# N^0 is always 1 (and has no units)
+			if other == 0:
+				return PhysNum(1, 0, None);
 			
-		# check if no multiplication needed?
-		if other == 0:
-			# N^0 is always 1
-			return PhysNum(1, 0, self.getUnits());
-		elif other < 0:
-			# we will need to perform a division step at end, but firstly, 
-			# take the absolute value of the int to use
-			other= abs(other);
-			postDiv= True;
+			# both Decimal and float perform integer powers by repeated squaring
+			# (Decimal raises a ZeroDivisionError subclass for 0^-n too)
+			n= other;
+			val= self.v ** n;
 		else:
-			# just multiply...
-			postDiv= False;
-			
-		# perform a little loop, multiplying ourself by our original value multiple times
-		# TODO: could optimise to only do even powers...
-		result= None;
-		for i in xrange(other):	
-			if result:
-				# keep multipling if first one has been set already
-				result *= self;
-			elif other == 1:
-				# there's just one, so just make a copy of self
-				result= eval(repr(self));
-			else:
-				# since this is just a starting point, this is fine...
-				result = self;
+			# only defined for non-negative values
+			if self.v < 0:
+				raise ValueError, "Cannot raise negative value to non-integer power";
+			val= self.v ** n;
 		
-		# if we need to invert the result
-		if postDiv: 
-			result = ~result;
-			
-		# return the resulting new number
-		return result;
+		err= abs(n * self.getUncertainty_Fractional() * val);
+		
+		# return a new number
+		return PhysNum._create(val, err, powerUnits(self.units, other));
+		
+	# square-root - same as raising to the power of 0.5, but uses the more precise 
+	# square-root function for the number type
+	def sqrt (self):
+		if self.v < 0:
+			raise ValueError, "Cannot take the square-root of a negative value";
+		
+		val= _state.backend.sqrt(self.v);
+		err= abs(self.getUncertainty_Fractional() * val) / 2;
+		
+		return PhysNum._create(val, err, powerUnits(self.units, Fraction(1, 2)));
 	
 	# division operator - divide values, but add fractional uncertainties
 	def __div__ (self, other):
 		# validate given arg
-		other= self._validateArithArg(other);
+		other= self._validateArithArg(other, False);
+		if other is NotImplemented:
+			return other;
 		
 		# final units are combination of these units
-		units= self.getUnits();
-		newUnits = units; # FIXME!!!!
-		
-		# change the units of the number we're multiplying with so that they're compatible 
-		# (if same type of measurement, that is)
-		other.changeUnits(units);
+		# (with a conversion factor if they use different units for the same type of measurement)
+		newUnits, convFac = divideUnits(self.units, other.units);
 		
 		# simply divide the absolute value
 		if other.getValue() == 0:
@@ -619,13 +1463,15 @@ class PhysNum:
 			raise ZeroDivisionError
 		else:
 			val= self.getValue() / other.getValue();
+			if convFac is not _ONE:
+				val *= _state.backend.constant(convFac);
 		
 		# to obtain the absolute uncertainty, need to add the percentage/fractional ones,  
 		# then multiply this by the new value to get the new absolute value
 		err= (self.getUncertainty_Fractional() + other.getUncertainty_Fractional()) * val;
 		
 		# return a new number
-		return PhysNum(val, err, newUnits);
+		return PhysNum._create(val, err, newUnits);
 		
 	# truediv is the same as div for now
 	__truediv__ = __div__;
@@ -646,11 +1492,13 @@ class PhysNum:
 	def __rsub__ (self, other):
 		# validate given arg
 		other= self._validateArithArg(other);
+		if other is NotImplemented:
+			return other;
 		
 		# change the units of the number we're subtracting so that they're compatible 
 		# (if same type of measurement, that is)
 		units= self.getUnits();
-		other.changeUnits(units);
+		other= other.convertUnits(units);
 		
 		# subtract the values, but always add the absolute uncertainties
 		# doing unit conversions on the alternate data
@@ -658,21 +1506,19 @@ class PhysNum:
 		err= self.getUncertainty_Absolute() + other.getUncertainty_Absolute();
 		
 		# return the result
-		return PhysNum(val, err, units);
+		return PhysNum._create(val, err, units);
 		
 	# division operator - divide values, but add fractional uncertainties
 	#	order is different, since subtraction is not totally communicative
 	def __rdiv__ (self, other):
 		# validate given arg
-		other= self._validateArithArg(other);
+		other= self._validateArithArg(other, False);
+		if other is NotImplemented:
+			return other;
 		
 		# final units are combination of these units
-		units= self.getUnits();
-		newUnits = units; # FIXME!!!!
-		
-		# change the units of the number we're multiplying with so that they're compatible 
-		# (if same type of measurement, that is)
-		other.changeUnits(units);
+		# (with a conversion factor if they use different units for the same type of measurement)
+		newUnits, convFac = divideUnits(other.units, self.units);
 		
 		# simply divide the absolute value
 		if self.getValue() == 0:
@@ -681,71 +1527,486 @@ class PhysNum:
 			raise ZeroDivisionError
 		else:
 			val= other.getValue() / self.getValue();
+			if convFac is not _ONE:
+				val *= _state.backend.constant(convFac);
 		
 		# to obtain the absolute uncertainty, need to add the percentage/fractional ones,  
 		# then multiply this by the new value to get the new absolute value
 		err= (self.getUncertainty_Fractional() + other.getUncertainty_Fractional()) * val;
 		
 		# return a new number
-		return PhysNum(val, err, newUnits);
+		return PhysNum._create(val, err, newUnits);
 		
 	# brute-force math ------------------------------
 	
 	# apply the given function (requiring single parameter only) 
 	# on this number to yield a new PhysNum
 	# 	- uses brute-force calculation techniques
+	#	- results for pure functions are cached, if the cache is enabled (see enableFuncCache())
 	def calcFunc (self, func):
+		cache= _funcCache;
+		if (cache is not None) and _isPure(func):
+			context= decimal.getcontext();
+			backend= _state.backend;
+			key= (func, backend.cacheKey(self.v), backend.cacheKey(self.e), self.units, backend.name, context.prec, context.rounding);
+			
+			result= cache.lookup(key);
+			if result is None:
+				result= self._calcFunc(func);
+				cache.store(key, result);
+			return result;
+		
+		return self._calcFunc(func);
+		
+	# apply the given function - see calcFunc()
+	def _calcFunc (self, func):
 		# the new value is simply the result of applying the function to it
 		val= func(self.v);
 		
+		# if the derivative of the function is known, the absolute uncertainty is simply |f'(v)| * e
+		derivative= getDerivative(func);
+		if derivative is not None:
+			val= PhysNum._validateNumArg(val);
+			err= abs(PhysNum._validateNumArg(derivative(self.v))) * self.e;
+			return PhysNum._create(val, err, self.units);
+		
 		# the absolute uncertainty is half the magnitude of the difference between the
 		# upper and lower bounds allowable by the absolute uncertainties
 		# WARNING: binary floating point errors are introduced here, as the functions 
 		# 		   called are still essentially binary :/
-		ubound= D(str(func(self.v + self.e)));
-		lbound= D(str(func(self.v - self.e)));
+		ubound= PhysNum._validateNumArg(func(self.v + self.e));
+		lbound= PhysNum._validateNumArg(func(self.v - self.e));
 		err= (ubound - lbound) / 2;
 		
 		# return a new number 
 		# FIXME: what about the units? I guess they're still ok?
 		return PhysNum(val, err, self.units); 
 
+###################################
+# Bulk Unit Conversion
+
+# Plan for converting whole lists (or arrays) of values to the given units
+#
+# The checks done by PhysNum.convertUnits() and finding the conversion factor are only done
+# once for each different set of units the values have, instead of again for every value.
+# Lists can also contain other lists, tuples or dicts (i.e. rows of a table) - anything in them 
+# that isn't a number with units (i.e. labels) is left as it is.
+#
+#	i.e.
+#		toMetres= ConversionPlan(mDim);
+#		lengths= toMetres.convert(lengths);
+#
+#		rows= ConversionPlan().convert(rows);	# everything in SI units (see normalizeToSI())
+class ConversionPlan(object):
+	# class stuff ----------------------------------
+	
+	# constructor
+	#	toUnits: (Unit) units to convert to. If None, values are converted to the SI units for their measurement
+	def __init__ (self, toUnits=None):
+		self.toUnits= toUnits;
+		
+		# conversions worked out so far
+		#	fromUnits : (newUnits, factor) - or None if values with those units are left alone
+		self.steps= {};
+		
+	def __repr__ (self):
+		target= self.toUnits if (self.toUnits is not None) else "SI";
+		return "<ConversionPlan - to %s, %d source units>" % (target, len(self.steps));
+		
+	# getters --------------------------------------
+	
+	# get the conversion needed for values with the given units
+	# (following the same rules as PhysNum.convertUnits(), so mismatched measurement types are left alone)
+	#	< returns: (newUnits, factor) - or None if no conversion is needed
+	def resolve (self, fromUnits):
+		try:
+			return self.steps[fromUnits];
+		except KeyError:
+			pass;
+		
+		if self.toUnits is not None:
+			toUnits= self.toUnits;
+		else:
+			toUnits= siUnits(fromUnits);
+		
+		if not (fromUnits and toUnits):
+			step= None;
+		elif (fromUnits == toUnits) or (fromUnits.sameMeasurement(toUnits) == False):
+			step= None;
+		else:
+			step= (toUnits, toUnits.conversionFactor(fromUnits));
+		
+		self.steps[fromUnits]= step;
+		return step;
+		
+	# get the units which values with the given units end up with
+	def getUnits (self, fromUnits):
+		step= self.resolve(fromUnits);
+		if step is None:
+			return fromUnits;
+		return step[0];
+		
+	# conversion -----------------------------------
+	
+	# convert the given values
+	#	values: (PhysNum, list/tuple/dict of them, or an array of values - i.e. PhysNumArray)
+	#	< returns: the converted values, in the same form (new lists/tuples/dicts are made)
+	def convert (self, values):
+		if isinstance(values, PhysNum):
+			return self._convertList([values])[0];
+		elif isinstance(values, (list, tuple)):
+			return values.__class__(self._convertList(values));
+		elif isinstance(values, dict):
+			keys= values.keys();
+			return dict(zip(keys, self._convertList([values[key] for key in keys])));
+		elif hasattr(values, 'convertUnits'):
+			# arrays are converted as a whole
+			return values.convertUnits(self.getUnits(values.getUnits()));
+		else:
+			return values;
+	
+	# convert a list of values, in one pass
+	def _convertList (self, values):
+		backend= _state.backend;
+		create= PhysNum._create;
+		
+		# conversion factors in the form needed by the current backend
+		#	fromUnits : (newUnits, factor) - or None
+		steps= {};
+		
+		result= [];
+		for value in values:
+			if isinstance(value, PhysNum) == False:
+				result.append(self.convert(value));
+				continue;
+				
+			units= value.units;
+			try:
+				step= steps[units];
+			except KeyError:
+				step= self.resolve(units);
+				if step is not None:
+					step= (step[0], backend.constant(step[1]));
+				steps[units]= step;
+			
+			if step is None:
+				result.append(value);
+			elif type(value) is PhysNum:
+				newUnits, fac = step;
+				result.append(create(value.v * fac, value.e * fac, newUnits));
+			else:
+				# subclasses (i.e. TrackedPhysNum) may need to do more than just scale the values
+				result.append(value.convertUnits(step[0]));
+		
+		return result;
+
+# convert all the given values to the given units (see ConversionPlan.convert())
+def convertAll (values, units):
+	return ConversionPlan(units).convert(values);
+
+# convert all the given values to SI units (see ConversionPlan.convert())
+#	i.e. 
+#		mass, diameter = normalizeToSI([mass, diameter]);
+def normalizeToSI (values):
+	return ConversionPlan().convert(values);
+
 ###################################
 # Commonly-Performed Math API
 # TODO: separate into own file?
 
-# calculate the sum of a given list of values
-def phys_sum (values):
-	# init vars used
-	result= None;
-	tot= len(values);
+# Accumulator for statistics over a stream of values (PhysNums or raw numbers), 
+# which are only looked at once each (so they don't need to be kept around).
+#
+# Tracks: count, (compensated) sums of values and uncertainties, running mean and 
+# variance (Welford's method), and min/max. New values can be added at any time, 
+# and accumulators for separate chunks of data can be merged together.
+#
+# NOTE: phys_sum()/phys_average() don't use this, as they only need the sums
+class PhysAccumulator(object):
+	# class stuff ----------------------------------
 	
-	# loop over values, summing them
-	for val in values:	
-		if result:
-			result += val;
-		elif tot == 1:
-			result = eval(repr(val));
+	# constructor
+	#	values: (iterable) initial values to add
+	#	units: (Unit) units to convert all values to. If not given, the units of the first value are used
+	def __init__ (self, values=None, units=None):
+		zero= _state.backend.zero;
+		
+		self.units= units;
+		
+		self.count= 0;
+		self.sumV= zero;		# sum of values
+		self.compV= zero;		# 	compensation term (i.e. low-order parts lost from sumV)
+		self.sumE= zero;		# sum of absolute uncertainties
+		self.compE= zero;		# 	compensation term (i.e. low-order parts lost from sumE)
+		self.mean= zero;		# running mean of values
+		self.M2= zero;			# sum of squares of differences from the mean
+		self.min= None;			# smallest value
+		self.minE= None;		# 	its uncertainty
+		self.max= None;			# largest value
+		self.maxE= None;		# 	its uncertainty
+		
+		if values is not None:
+			self.extend(values);
+	
+	def __repr__ (self):
+		return "<PhysAccumulator - %d values>" % (self.count);
+		
+	def __len__ (self):
+		return self.count;
+		
+	# updating -------------------------------------
+	
+	# add a single value
+	def add (self, value):
+		# get the value and uncertainty (in our units)
+		if isinstance(value, PhysNum):
+			if self.count == 0 and self.units is None:
+				self.units= value.units;
+			else:
+				value= value.convertUnits(self.units);
+			
+			v= value.v;
+			e= value.e;
+		else:
+			v= _state.backend.number(value);
+			e= _state.backend.zero;
+		
+		self.count += 1;
+		
+		# compensated (Neumaier) summation for values and uncertainties
+		t= self.sumV + v;
+		if abs(self.sumV) >= abs(v):
+			self.compV += (self.sumV - t) + v;
 		else:
-			result = val;
+			self.compV += (v - t) + self.sumV;
+		self.sumV= t;
+		
+		t= self.sumE + e;
+		if abs(self.sumE) >= abs(e):
+			self.compE += (self.sumE - t) + e;
+		else:
+			self.compE += (e - t) + self.sumE;
+		self.sumE= t;
+		
+		# running mean/variance (Welford)
+		delta= v - self.mean;
+		self.mean += delta / self.count;
+		self.M2 += delta * (v - self.mean);
+		
+		# range
+		if (self.min is None) or (v < self.min):
+			self.min= v;
+			self.minE= e;
+		if (self.max is None) or (v > self.max):
+			self.max= v;
+			self.maxE= e;
+			
+	# add all the values from the given iterable (i.e. list, generator)
+	def extend (self, values):
+		add= self.add;
+		for value in values:
+			add(value);
+			
+	# combine the results from another accumulator (i.e. for another chunk of the data) into this one
+	def merge (self, other):
+		if other.count == 0:
+			return self;
+		
+		# get scaling needed to bring the other's values into our units
+		if self.count == 0 and self.units is None:
+			self.units= other.units;
+		
+		if self.units and other.units and (self.units != other.units) and self.units.sameMeasurement(other.units):
+			fac= _state.backend.constant(self.units.conversionFactor(other.units));
+		else:
+			fac= _state.backend.one;
+		
+		# combine the stats (Chan et al. for mean/variance)
+		n= self.count + other.count;
+		otherMean= other.mean * fac;
+		delta= otherMean - self.mean;
+		
+		self.M2 += (other.M2 * fac * fac) + (delta * delta * self.count * other.count / n);
+		self.mean += delta * other.count / n;
+		self.count= n;
+		
+		self.sumV, self.compV = _compensatedAdd(self.sumV, self.compV, (other.sumV + other.compV) * fac);
+		self.sumE, self.compE = _compensatedAdd(self.sumE, self.compE, (other.sumE + other.compE) * fac);
+		
+		for v, e in ((other.min, other.minE), (other.max, other.maxE)):
+			v *= fac;
+			if (self.min is None) or (v < self.min):
+				self.min= v;
+				self.minE= e * fac;
+			if (self.max is None) or (v > self.max):
+				self.max= v;
+				self.maxE= e * fac;
+		
+		return self;
+		
+	# results --------------------------------------
 	
-	# return the sum of the values
-	return result;
+	# get the number of values added so far
+	def getCount (self):
+		return self.count;
+		
+	# get the sum of the values as a PhysNum (uncertainties are added, as for phys_sum())
+	def getSum (self):
+		if self.count == 0:
+			return None;
+		return PhysNum._create(self.sumV + self.compV, self.sumE + self.compE, self.units);
+		
+	# get the average of the values as a PhysNum (uncertainty is the sum of uncertainties / sqrt(N), as for phys_average())
+	def getAverage (self):
+		if self.count == 0:
+			return None;
+		return _meanOfSum(self.getSum(), self.count);
+		
+	# get the (sample) variance of the values
+	def getVariance (self):
+		if self.count < 2:
+			return _state.backend.zero;
+		return self.M2 / (self.count - 1);
+		
+	# get the (sample) standard deviation of the values
+	def getStdDev (self):
+		return _state.backend.sqrt(self.getVariance());
+		
+	# get the standard error of the mean of the values
+	def getStdError (self):
+		if self.count == 0:
+			return _state.backend.zero;
+		return _state.backend.sqrt(self.getVariance() / self.count);
+		
+	# get the mean of the values as a PhysNum, with the standard error (from the scatter of the values) as the uncertainty
+	def getStatisticalMean (self):
+		if self.count == 0:
+			return None;
+		return PhysNum._create(self.mean, self.getStdError(), self.units);
+		
+	# get the smallest/largest of the values (as PhysNums, with the uncertainty that value had)
+	def getMin (self):
+		if self.count == 0:
+			return None;
+		return PhysNum._create(self.min, self.minE, self.units);
+		
+	def getMax (self):
+		if self.count == 0:
+			return None;
+		return PhysNum._create(self.max, self.maxE, self.units);
+
+# add x to a compensated (Neumaier) sum
+#	< returns: (new total, new compensation term)
+def _compensatedAdd (total, comp, x):
+	t= total + x;
+	if abs(total) >= abs(x):
+		comp += (total - t) + x;
+	else:
+		comp += (x - t) + total;
+	return t, comp;
+
+# ---
+
+# get the first item from the given values, along with an iterator for the rest
+#	< returns: (first, rest), or (None, None) if there aren't any values
+def _splitFirst (values):
+	it= iter(values);
+	for first in it:
+		return first, it;
+	return None, None;
+	
+# check if the given value can be used with PhysAccumulator (i.e. it is not an array or a deferred value,
+# or a number which needs its own arithmetic to be used, such as TrackedPhysNum)
+def _isScalar (value):
+	if isinstance(value, PhysNum):
+		return not hasattr(value, '_phys_meanOf');
+	return type(value) in (int, long, float, D);
+
+# sum the given scalar values (see _isScalar()), converting them to the units of the first
+#	< returns: (sum as a PhysNum, number of values)
+def _sumScalars (first, rest):
+	backend= _state.backend;
+	number= backend.number;
 	
-# calculate the average value of a list of values
+	if isinstance(first, PhysNum):
+		units= first.units;
+		sumV= first.v;
+		sumE= first.e;
+	else:
+		units= None;
+		sumV= number(first);
+		sumE= backend.zero;
+	N= 1;
+	
+	# plain sums are enough here - PhysAccumulator is there for anything more
+	for val in rest:
+		if isinstance(val, PhysNum):
+			if val.units is not units:
+				val= val.convertUnits(units);
+			sumV += val.v;
+			sumE += val.e;
+		else:
+			sumV += number(val);
+		N += 1;
+	
+	return PhysNum._create(sumV, sumE, units), N;
+
+# calculate the sum of a given list (or any iterable) of values
+def phys_sum (values):
+	# column-based types (i.e. PhysNumArray) sum themselves in one go
+	if hasattr(values, '_phys_sum'):
+		return values._phys_sum();
+	
+	first, rest = _splitFirst(values);
+	if first is None:
+		return None;
+	
+	if _isScalar(first):
+		# sum in a single pass
+		return _sumScalars(first, rest)[0];
+	elif hasattr(first, '_phys_sumWith'):
+		# numbers which can sum a whole sequence more efficiently than one at a time
+		return first._phys_sumWith(rest)[0];
+	else:
+		# other types (i.e. lists of arrays) - just use their own arithmetic
+		result= first;
+		for val in rest:
+			result += val;
+		return result;
+	
+# calculate the average value of a given list (or any iterable) of values
 def phys_average (values):
-	N = len(values);
+	# column-based types (i.e. PhysNumArray) average themselves in one go
+	if hasattr(values, '_phys_average'):
+		return values._phys_average();
 	
-	# get the sum of these values
-	result= phys_sum(values);
+	first, rest = _splitFirst(values);
+	if first is None:
+		return None;
 	
-	# divide the absolute value by N, but the uncertainty by square-root of N
-	# ..tsk tsk... directly modifying PhysNum like this is bad...
-	result.v /= N;
-	result.e /= D(N).sqrt();	# decimal provides its own precise sqrt func
+	if _isScalar(first):
+		# sum in a single pass
+		result, N = _sumScalars(first, rest);
+		return _meanOfSum(result, N);
+	elif hasattr(first, '_phys_sumWith'):
+		result, N = first._phys_sumWith(rest);
+		return result._phys_meanOf(N);
+	else:
+		# other types (i.e. lists of arrays) - just use their own arithmetic
+		result= first;
+		N= 1;
+		for val in rest:
+			result += val;
+			N += 1;
+		
+		if hasattr(result, '_phys_meanOf'):
+			return result._phys_meanOf(N);
+		return _meanOfSum(result, N);
 	
-	# return the result
-	return result;
+# get the average from the sum of N values (as calculated by phys_sum())
+def _meanOfSum (total, N):
+	# divide the absolute value by N, but the uncertainty by square-root of N
+	return PhysNum._create(total.v / N, total.e / _state.backend.sqrt(N), total.units);
 	
 ###################################
 # Unit Tests